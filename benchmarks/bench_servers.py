@@ -0,0 +1,367 @@
+"""
+Latency and Throughput Benchmark for the Lesson Servers
+
+This script measures how fast each lesson's MCP server answers tool calls
+as its data grows. For every server, store size and tool it:
+
+1. Generates a synthetic data store (notes, research, memories or
+   experiences) with the requested number of entries
+2. Starts the server in a fresh Python process and connects an MCP client
+   to it through in-memory streams (no stdio, no Claude Desktop)
+3. Calls the tool repeatedly and records every call's latency, one call
+   at a time or, with --concurrency N, N calls at once
+4. Reports p50/p95/p99 latency, throughput and the process's peak memory
+
+Each server finds its data folder through an environment variable (for
+example MCP_MEMORY_DIR), which the benchmark points at the synthetic store.
+
+Results are printed (or saved) as JSON so two runs can be compared:
+
+    python benchmarks/bench_servers.py --output before.json
+    ... change some code ...
+    python benchmarks/bench_servers.py --output after.json --compare before.json
+
+Run with --help to see all options.
+"""
+
+import argparse
+import asyncio
+import importlib.util
+import json
+import math
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+try:
+    import resource
+except ImportError:  # Windows: peak memory is not reported
+    resource = None
+
+REPO_DIR = Path(__file__).resolve().parent.parent
+
+# Words used to build synthetic content
+WORDS = (
+    "agent research memory insight source pattern draft writer outline summary "
+    "database python survey approach outcome strategy example reader quality "
+    "evidence study finding structure benchmark latency context lesson"
+).split()
+
+# A case is (label, tool name, arguments). Arguments may be a function of
+# the call number, for tools that should get different input on each call.
+# "data_env" is the environment variable that sets the server's data folder.
+SERVERS = {
+    "note-reader": {
+        "path": "lesson-05/server.py",
+        "data_env": "MCP_NOTES_DIR",
+        "cases": [
+            ("read_note", "read_note", {"filename": "bench_note.txt"}),
+        ],
+    },
+    "collaboration-hub": {
+        "path": "lesson-06/server.py",
+        "data_env": "MCP_HUB_DIR",
+        "cases": [
+            ("save_research", "save_research", lambda i: {"content": f"Finding {i}: " + " ".join(WORDS[:12])}),
+            ("read_research", "read_research", {}),
+            ("save_draft", "save_draft", lambda i: {"content": f"Draft {i}: " + " ".join(WORDS)}),
+        ],
+    },
+    "memory-server": {
+        "path": "lesson-07/server.py",
+        "data_env": "MCP_MEMORY_DIR",
+        "cases": [
+            ("save_memory", "save_memory", lambda i: {"content": f"Benchmark memory {i} about python research"}),
+            ("read_memory", "read_memory", {}),
+            ("search_memory", "search_memory", {"query": "benchmark"}),
+        ],
+    },
+    "learning-agent": {
+        "path": "lesson-08/server.py",
+        "data_env": "MCP_LEARNING_DIR",
+        "cases": [
+            ("record_experience", "record_experience", lambda i: {
+                "agent_id": "researcher", "task_type": "research", "context": f"Benchmark task {i}",
+                "approach": WORDS[i % len(WORDS)], "outcome": "Done", "success": i % 3 != 0,
+            }),
+            ("get_learning_insights", "get_learning_insights", {"agent_id": "researcher"}),
+            ("get_learning_insights[decayed]", "get_learning_insights", {"agent_id": "researcher", "weighting": "decayed"}),
+            ("analyze_learning_patterns", "analyze_learning_patterns", {"time_range_days": 30}),
+            ("analyze_learning_patterns[approximate]", "analyze_learning_patterns", {"time_range_days": 30, "approximate": True}),
+        ],
+    },
+}
+
+
+def sentence(rng, words=12):
+    return " ".join(rng.choice(WORDS) for _ in range(words))
+
+
+def build_store(server_name, data_dir, size):
+    """Write a synthetic data store with `size` entries for one server"""
+    rng = random.Random(size)
+    data_dir = Path(data_dir)
+
+    if server_name == "note-reader":
+        lines = (f"Line {i}: {sentence(rng)}" for i in range(size))
+        (data_dir / "bench_note.txt").write_text("\n".join(lines), encoding="utf-8")
+
+    elif server_name == "collaboration-hub":
+        lines = (f"Finding {i}: {sentence(rng)}" for i in range(size))
+        (data_dir / "research_findings.txt").write_text("\n".join(lines), encoding="utf-8")
+
+    elif server_name == "memory-server":
+        start = datetime.now() - timedelta(days=90)
+        memories = [
+            {
+                "timestamp": (start + timedelta(seconds=i * 7776000 // size)).isoformat(),
+                "content": sentence(rng, 40),
+            }
+            for i in range(size)
+        ]
+        with open(data_dir / "shared_memory.json", "w", encoding="utf-8") as f:
+            json.dump(memories, f, indent=2, ensure_ascii=False)
+
+    elif server_name == "learning-agent":
+        sys.path[:0] = [str(REPO_DIR), str(REPO_DIR / "lesson-08")]
+        from learning_store import LearningStore
+
+        start = datetime.now() - timedelta(days=90)
+        experiences = [
+            {
+                "timestamp": (start + timedelta(seconds=i * 7776000 // size)).isoformat(),
+                "agent_id": rng.choice(["researcher", "writer", "editor"]),
+                "task_type": rng.choice(["research", "writing", "analysis"]),
+                "context": sentence(rng, 8),
+                "approach": rng.choice(WORDS),
+                "outcome": sentence(rng, 6),
+                "success": rng.random() < 0.6,
+                "metrics": {},
+            }
+            for i in range(size)
+        ]
+        LearningStore(data_dir).replace_all(experiences)
+
+
+def load_server(server_name, data_dir):
+    """
+    Import a fresh copy of a lesson server that keeps its data in `data_dir`,
+    set the same way a user would: through the server's environment variable
+    """
+    path = REPO_DIR / SERVERS[server_name]["path"]
+    variable = SERVERS[server_name]["data_env"]
+    sys.path.insert(0, str(path.parent))
+    spec = importlib.util.spec_from_file_location(f"bench_{path.parent.name.replace('-', '_')}", path)
+    module = importlib.util.module_from_spec(spec)
+
+    previous = os.environ.get(variable)
+    os.environ[variable] = str(data_dir)
+    try:
+        spec.loader.exec_module(module)
+    finally:
+        if previous is None:
+            del os.environ[variable]
+        else:
+            os.environ[variable] = previous
+    return module
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list"""
+    index = max(0, math.ceil(fraction * len(sorted_values)) - 1)
+    return sorted_values[index]
+
+
+def peak_rss_mb():
+    """Peak resident memory of this process in MB (None where unsupported)"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS reports bytes
+    return round(peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024, 1)
+
+
+async def run_case(server_name, data_dir, case_index, iterations, max_seconds, concurrency=1):
+    """
+    Drive one tool of one server in-process and measure every call
+
+    With `concurrency` above 1, that many clients call the tool at the same
+    time (each as soon as its previous call returned), so the latencies
+    include waiting for each other and throughput shows how well the
+    server overlaps calls.
+    """
+    from mcp.shared.memory import create_connected_server_and_client_session
+
+    label, tool, arguments = SERVERS[server_name]["cases"][case_index]
+    module = load_server(server_name, data_dir)
+    rss_before = peak_rss_mb()
+
+    def args_for(i):
+        return arguments(i) if callable(arguments) else arguments
+
+    async with create_connected_server_and_client_session(module.server) as client:
+        # The first call pays for cold caches and lazy loading; report it apart
+        start = time.perf_counter()
+        result = await client.call_tool(tool, args_for(0))
+        first_call = time.perf_counter() - start
+        response_bytes = sum(len(c.text.encode("utf-8")) for c in result.content if hasattr(c, "text"))
+
+        latencies = []
+        calls = iter(range(1, iterations + 1))
+        started = time.perf_counter()
+
+        async def caller():
+            for i in calls:
+                start = time.perf_counter()
+                await client.call_tool(tool, args_for(i))
+                latencies.append(time.perf_counter() - start)
+                if time.perf_counter() - started > max_seconds:
+                    break
+
+        await asyncio.gather(*(caller() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "server": server_name,
+        "case": label,
+        "tool": tool,
+        "concurrency": concurrency,
+        "calls": len(latencies),
+        "first_call_ms": round(first_call * 1000, 3),
+        "mean_ms": round(sum(latencies) / len(latencies) * 1000, 3),
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 3),
+        "throughput_per_s": round(len(latencies) / elapsed, 2),
+        "response_bytes": response_bytes,
+        "rss_before_mb": rss_before,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+def run_child(spec_json):
+    """Entry point of the per-case child process"""
+    spec = json.loads(spec_json)
+    result = asyncio.run(run_case(
+        spec["server"], spec["data_dir"], spec["case_index"], spec["iterations"], spec["max_seconds"],
+        spec["concurrency"]
+    ))
+    print(json.dumps(result))
+
+
+def run_benchmarks(servers, sizes, iterations, max_seconds, concurrency=1):
+    """Run every (server, size, tool) case in its own process"""
+    results = []
+    for server_name in servers:
+        for size in sizes:
+            for case_index, (label, _, _) in enumerate(SERVERS[server_name]["cases"]):
+                # Fresh data for every case, since some tools write to the store
+                with tempfile.TemporaryDirectory() as data_dir:
+                    build_store(server_name, data_dir, size)
+                    spec = {
+                        "server": server_name, "data_dir": data_dir, "case_index": case_index,
+                        "iterations": iterations, "max_seconds": max_seconds, "concurrency": concurrency,
+                    }
+                    print(f"  {server_name} / {size:,} entries / {label} ...", file=sys.stderr, flush=True)
+                    child = subprocess.run(
+                        [sys.executable, __file__, "--child", json.dumps(spec)],
+                        capture_output=True, text=True
+                    )
+                if child.returncode != 0:
+                    print(child.stderr, file=sys.stderr)
+                    raise SystemExit(f"Benchmark failed: {server_name} / {label}")
+                result = json.loads(child.stdout.strip().splitlines()[-1])
+                result["store_size"] = size
+                results.append(result)
+    return results
+
+
+def compare(results, baseline, threshold):
+    """Print a p50/p95 comparison against a previous run's JSON file"""
+    def key(r):
+        return r["server"], r["case"], r["store_size"], r.get("concurrency", 1)
+
+    previous = {key(r): r for r in baseline["results"]}
+    print(f"{'case':<62} {'p50 ratio':>10} {'p95 ratio':>10}", file=sys.stderr)
+    for result in results:
+        old = previous.get(key(result))
+        if old is None:
+            continue
+        p50 = result["p50_ms"] / old["p50_ms"] if old["p50_ms"] else float("inf")
+        p95 = result["p95_ms"] / old["p95_ms"] if old["p95_ms"] else float("inf")
+        flag = "  <-- slower" if max(p50, p95) > threshold else ""
+        name = f"{result['server']} / {result['store_size']:,} / {result['case']}"
+        print(f"{name:<62} {p50:>10.2f} {p95:>10.2f}{flag}", file=sys.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the lesson MCP servers in-process")
+    parser.add_argument("--servers", default=",".join(SERVERS),
+                        help=f"Comma-separated servers to run (default: all of {', '.join(SERVERS)})")
+    parser.add_argument("--sizes", default="1000,10000",
+                        help="Comma-separated store sizes, e.g. 1000,100000,1000000 (default: 1000,10000)")
+    parser.add_argument("--iterations", type=int, default=50, help="Timed calls per tool (default: 50)")
+    parser.add_argument("--max-seconds", type=float, default=10.0,
+                        help="Stop a tool's timed calls after this long (default: 10)")
+    parser.add_argument("--concurrency", type=int, default=1, metavar="N",
+                        help="Calls in flight at once (default: 1, one after another)")
+    parser.add_argument("--output", help="Write the JSON report here instead of stdout")
+    parser.add_argument("--compare", metavar="BASELINE", help="Compare against a previous JSON report")
+    parser.add_argument("--threshold", type=float, default=1.2,
+                        help="Ratio above which --compare flags a case as slower (default: 1.2)")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.child)
+        return
+
+    servers = [name.strip() for name in args.servers.split(",") if name.strip()]
+    unknown = [name for name in servers if name not in SERVERS]
+    if unknown:
+        parser.error(f"Unknown server(s): {', '.join(unknown)}")
+    sizes = [int(size) for size in args.sizes.split(",")]
+    if args.concurrency < 1:
+        parser.error("--concurrency must be at least 1")
+
+    print("Running benchmarks:", file=sys.stderr)
+    results = run_benchmarks(servers, sizes, args.iterations, args.max_seconds, args.concurrency)
+
+    try:
+        from importlib.metadata import version
+        mcp_version = version("mcp")
+    except Exception:
+        mcp_version = None
+
+    report = {
+        "meta": {
+            "created": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "mcp_version": mcp_version,
+            "iterations": args.iterations,
+            "concurrency": args.concurrency,
+        },
+        "results": results,
+    }
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        Path(args.output).write_text(text + "\n", encoding="utf-8")
+        print(f"Saved {len(results)} results to {args.output}", file=sys.stderr)
+    else:
+        print(text)
+
+    if args.compare:
+        compare(results, json.loads(Path(args.compare).read_text(encoding="utf-8")), args.threshold)
+
+
+if __name__ == "__main__":
+    main()
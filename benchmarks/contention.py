@@ -0,0 +1,185 @@
+"""
+Multi-Process Write Contention Stress Test
+
+Several Claude Desktop windows can run the same server at once, all writing
+to the same data file. This script checks that concurrent writers don't
+lose each other's records and measures how many records per second they
+can commit together.
+
+It starts N writer processes against one shared store (in a temporary
+folder). Each writer loads the server, then calls its write tool (save_memory
+or record_experience) a fixed number of times, several calls at a time.
+When every writer is done, the store is read back and each acknowledged
+record is looked up. A record that was acknowledged but is missing is a
+lost update.
+
+    python benchmarks/contention.py --server memory-server --writers 8 --records 100
+
+The report is printed as JSON.
+"""
+
+import argparse
+import asyncio
+import json
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from bench_servers import REPO_DIR, load_server
+
+WRITE_TOOLS = {
+    "memory-server": "save_memory",
+    "learning-agent": "record_experience",
+}
+
+
+def record_tag(writer, index):
+    """Unique text stored with each record so it can be found afterwards"""
+    return f"writer-{writer}-record-{index}"
+
+
+def write_arguments(server_name, writer, index):
+    """Tool arguments for one write"""
+    tag = record_tag(writer, index)
+    if server_name == "memory-server":
+        return {"content": tag}
+    return {
+        "agent_id": f"writer-{writer}", "task_type": "stress", "context": tag,
+        "approach": "contention", "outcome": "written", "success": True,
+    }
+
+
+def committed_tags(server_name, data_dir):
+    """Read the store back and return the tag of every record in it"""
+    if server_name == "memory-server":
+        with open(Path(data_dir) / "shared_memory.json", encoding="utf-8") as f:
+            return [memory["content"] for memory in json.load(f)]
+
+    sys.path[:0] = [str(REPO_DIR), str(REPO_DIR / "lesson-08")]
+    from learning_store import LearningStore
+    return [exp["context"] for exp in LearningStore(data_dir).load()]
+
+
+async def run_writer(spec):
+    """Body of one writer process"""
+    server_name = spec["server"]
+    module = load_server(server_name, spec["data_dir"])
+    call_tool = getattr(module, "handle_call_tool", None) or module.call_tool
+    tool = WRITE_TOOLS[server_name]
+    data_dir = Path(spec["data_dir"])
+
+    # Wait for the starting signal so all writers begin together
+    (data_dir / f"ready-{spec['writer']}").touch()
+    while not (data_dir / "go").exists():
+        await asyncio.sleep(0.01)
+
+    acknowledged = []
+    errors = 0
+    queue = list(range(spec["records"]))
+
+    async def worker():
+        nonlocal errors
+        while queue:
+            index = queue.pop(0)
+            arguments = write_arguments(server_name, spec["writer"], index)
+            result = await call_tool(tool, arguments)
+            text = result[0].text
+            if "error" in text.lower():
+                errors += 1
+            else:
+                acknowledged.append(index)
+
+    started = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(spec["concurrency"])])
+    elapsed = time.perf_counter() - started
+
+    writer = module.memory_writer if server_name == "memory-server" else module.experience_writer
+    return {
+        "writer": spec["writer"],
+        "acknowledged": acknowledged,
+        "errors": errors,
+        "elapsed_s": elapsed,
+        "flushes": writer.flushes,
+    }
+
+
+def run(server_name, writers, records, concurrency):
+    """Run the stress test and return the report"""
+    with tempfile.TemporaryDirectory() as data_dir:
+        if server_name == "memory-server":
+            (Path(data_dir) / "shared_memory.json").write_text("[]", encoding="utf-8")
+
+        processes = []
+        for writer in range(writers):
+            spec = {
+                "server": server_name, "data_dir": data_dir, "writer": writer,
+                "records": records, "concurrency": concurrency,
+            }
+            processes.append(subprocess.Popen(
+                [sys.executable, __file__, "--child", json.dumps(spec)],
+                stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True
+            ))
+
+        # Start everyone at once, after all of them have finished importing
+        while len(list(Path(data_dir).glob("ready-*"))) < writers:
+            if any(p.poll() not in (None, 0) for p in processes):
+                break
+            time.sleep(0.01)
+        started = time.perf_counter()
+        (Path(data_dir) / "go").touch()
+
+        results = []
+        for process in processes:
+            stdout, stderr = process.communicate()
+            if process.returncode != 0:
+                print(stderr, file=sys.stderr)
+                raise SystemExit("A writer process failed")
+            results.append(json.loads(stdout.strip().splitlines()[-1]))
+        elapsed = time.perf_counter() - started
+
+        stored = committed_tags(server_name, data_dir)
+
+    found = set(stored)
+    acknowledged = [record_tag(r["writer"], index) for r in results for index in r["acknowledged"]]
+    lost = [tag for tag in acknowledged if tag not in found]
+    flushes = sum(r["flushes"] for r in results)
+
+    return {
+        "server": server_name,
+        "writers": writers,
+        "records_per_writer": records,
+        "concurrency_per_writer": concurrency,
+        "acknowledged": len(acknowledged),
+        "errors": sum(r["errors"] for r in results),
+        "stored_records": len(stored),
+        "duplicate_records": len(stored) - len(found),
+        "lost_updates": len(lost),
+        "elapsed_s": round(elapsed, 3),
+        "committed_per_s": round((len(acknowledged) - len(lost)) / elapsed, 1),
+        "flushes": flushes,
+        "avg_batch_size": round(len(acknowledged) / flushes, 2) if flushes else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stress shared data files with concurrent writer processes")
+    parser.add_argument("--server", choices=sorted(WRITE_TOOLS), default="memory-server",
+                        help="Server whose write tool is stressed (default: memory-server)")
+    parser.add_argument("--writers", type=int, default=4, help="Writer processes (default: 4)")
+    parser.add_argument("--records", type=int, default=100, help="Records written by each writer (default: 100)")
+    parser.add_argument("--concurrency", type=int, default=4,
+                        help="Calls each writer keeps in flight at once (default: 4)")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(asyncio.run(run_writer(json.loads(args.child)))))
+        return
+
+    print(json.dumps(run(args.server, args.writers, args.records, args.concurrency), indent=2))
+
+
+if __name__ == "__main__":
+    main()
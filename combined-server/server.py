@@ -0,0 +1,209 @@
+"""
+Combined MCP Server: every lesson server in one process
+
+Running note-reader, collaboration-hub, memory-server and learning-agent as
+four separate servers means four Python processes, each importing the MCP
+SDK and holding its own copy of everything. This server loads all four
+lesson servers into one process instead and offers their tools side by
+side, with the tool names prefixed by the server they came from:
+
+    notes__read_note, hub__save_research, memory__search_memory,
+    learning__get_learning_insights, ...
+
+The four servers share one thread pool, one budget for the entries they
+keep in memory (the notes listing, the parsed memories, the learning
+history with its samples and cached insights) and one statistics registry (reported by a single server_stats tool). They
+read and write the same files as when they run on their own, and each
+lesson's server.py still works standalone exactly as before.
+"""
+
+import argparse
+import asyncio
+import importlib.util
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import AsyncExitStack
+from pathlib import Path
+
+from mcp.server import Server
+from mcp.server.stdio import stdio_server
+from mcp.types import TextContent, Tool
+
+REPO_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_DIR))
+from mcp_shared.cache_budget import CacheBudget
+from mcp_shared.tool_stats import ServerStats
+from mcp_shared.transport import add_transport_arguments, serve_http
+
+# Tool names are "<prefix>__<tool>"; MCP clients don't allow dots in names
+NAMESPACE_SEPARATOR = "__"
+
+# (prefix, lesson folder, list_tools function, call_tool function)
+MOUNTS = [
+    ("notes", "lesson-05", "handle_list_tools", "handle_call_tool"),
+    ("hub", "lesson-06", "handle_list_tools", "handle_call_tool"),
+    ("memory", "lesson-07", "handle_list_tools", "handle_call_tool"),
+    ("learning", "lesson-08", "list_tools", "call_tool"),
+]
+
+# Threads shared by every mounted server for blocking work such as parsing
+# or rewriting data files (asyncio.to_thread uses the event loop's default
+# executor). Waits for file locks don't take these threads: they run on the
+# lock-wait threads of mcp_shared/file_lock.py.
+SHARED_THREADS = 4
+
+# Entries all mounted servers may keep in memory together (see
+# mcp_shared/cache_budget.py). An entry is one listed note file, one parsed
+# memory, one recorded or sampled experience, or one cached insight answer.
+# Any one cache may grow as far as the whole budget; when they hold more
+# together, the caches of the server used least recently are dropped first.
+CACHE_BUDGET_ENTRIES = 1_000_000
+
+class MountedServer:
+    """One lesson server loaded into this process"""
+
+    def __init__(self, prefix, folder, list_tools_name, call_tool_name):
+        self.prefix = prefix
+        self.module = load_lesson_server(folder)
+        self.list_tools = getattr(self.module, list_tools_name)
+        self.call_tool = getattr(self.module, call_tool_name)
+
+    async def namespaced_tools(self):
+        """This server's tools, renamed with the prefix (minus its own server_stats)"""
+        tools = []
+        for tool in await self.list_tools():
+            if tool.name == "server_stats":
+                continue
+            tools.append(tool.model_copy(update={
+                "name": f"{self.prefix}{NAMESPACE_SEPARATOR}{tool.name}",
+                "description": f"[{self.module.server.name}] {tool.description}",
+            }))
+        return tools
+
+    def bounded_caches(self):
+        """Caches that hold at most `max_entries` entries, by module variable name"""
+        return {
+            name: value for name, value in vars(self.module).items()
+            if hasattr(value, "max_entries") and hasattr(value, "hits")
+        }
+
+    def budgeted_entries(self):
+        """(name, count entries, drop them or None) for everything this server keeps in memory"""
+        entries = [(name, cache.entry_count, cache.drop) for name, cache in self.bounded_caches().items()]
+        for name, (count, drop) in getattr(self.module, "resident_entries", {}).items():
+            entries.append((name, count, drop))
+        return entries
+
+
+def load_lesson_server(folder):
+    """Import a lesson's server.py under a unique module name"""
+    path = REPO_DIR / folder / "server.py"
+    # Lets the server import the helper modules next to it
+    sys.path.insert(0, str(path.parent))
+    spec = importlib.util.spec_from_file_location(f"{folder.replace('-', '_')}_server", path)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[spec.name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+def share_cache_budget(mounts, total_entries):
+    """Put every mounted server's caches under one CacheBudget of `total_entries`"""
+    budget = CacheBudget(total_entries)
+    for mount in mounts:
+        for cache in mount.bounded_caches().values():
+            cache.max_entries = total_entries
+        for name, count, drop in mount.budgeted_entries():
+            budget.track(mount.prefix, name, count, drop)
+    return budget
+
+
+mounts = {prefix: MountedServer(prefix, *rest) for prefix, *rest in MOUNTS}
+cache_budget = share_cache_budget(mounts.values(), CACHE_BUDGET_ENTRIES)
+
+# One statistics registry: the host's server_stats reports every mounted server
+stats = ServerStats("combined-server")
+for mount in mounts.values():
+    stats.include(mount.module.stats)
+stats.watch_counters(cache_budget.counters)
+
+# Background maintenance of the servers that have any (see
+# mcp_shared/maintenance.py). A job waits for quiet across the whole
+# process, not just for its own server's tools.
+maintenance = [mount.module.maintenance for mount in mounts.values() if hasattr(mount.module, "maintenance")]
+for background in maintenance:
+    for mount in mounts.values():
+        background.watch_activity(mount.module.stats)
+
+# Saves the hub keeps in memory (see mcp_shared/write_behind.py), written
+# to disk when the combined server stops
+write_buffers = [mount.module.write_buffer for mount in mounts.values() if hasattr(mount.module, "write_buffer")]
+
+# Worker processes the learning agent starts for very large analyses (see
+# lesson-08/analysis_workers.py), stopped with the combined server
+analysis_workers = [
+    mount.module.analysis_workers for mount in mounts.values() if hasattr(mount.module, "analysis_workers")
+]
+
+server = Server("combined-server")
+mounted_tools = None
+
+
+@server.list_tools()
+async def list_tools() -> list[Tool]:
+    """Every mounted server's tools under their namespaced names"""
+    global mounted_tools
+    if mounted_tools is None:
+        mounted_tools = []
+        for mount in mounts.values():
+            mounted_tools.extend(await mount.namespaced_tools())
+        mounted_tools.append(stats.tool_definition())
+    return mounted_tools
+
+
+@server.call_tool()
+async def call_tool(name: str, arguments: dict) -> list[TextContent]:
+    """Route a namespaced tool call to the server it belongs to"""
+    if name == "server_stats":
+        return stats.tool_result()
+
+    prefix, _, tool_name = name.partition(NAMESPACE_SEPARATOR)
+    mount = mounts.get(prefix)
+    if mount is None or not tool_name or tool_name == "server_stats":
+        raise ValueError(f"Unknown tool: {name}")
+    cache_budget.touch(prefix)
+    try:
+        return await mount.call_tool(tool_name, arguments)
+    finally:
+        # Back on the event loop, where dropping a server's caches is safe
+        cache_budget.enforce()
+
+
+async def main(transport="stdio", host="127.0.0.1", port=8100):
+    """Run the combined server"""
+    asyncio.get_running_loop().set_default_executor(
+        ThreadPoolExecutor(max_workers=SHARED_THREADS, thread_name_prefix="combined-server")
+    )
+    stats.start_prometheus_export()
+
+    async with AsyncExitStack() as stack:
+        for background in maintenance:
+            await stack.enter_async_context(background.running())
+        for buffer in write_buffers:
+            await stack.enter_async_context(buffer.running())
+        for workers in analysis_workers:
+            await stack.enter_async_context(workers.running())
+
+        if transport != "stdio":
+            await serve_http(server, server.create_initialization_options(), transport, host, port)
+            return
+
+        async with stdio_server() as (read_stream, write_stream):
+            await server.run(read_stream, write_stream, server.create_initialization_options())
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="All lesson MCP servers in one process")
+    add_transport_arguments(parser, default_port=8100)
+    args = parser.parse_args()
+    asyncio.run(main(args.transport, args.host, args.port))
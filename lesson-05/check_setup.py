@@ -8,8 +8,14 @@ If you see errors, make sure you:
 1. Activated the virtual environment
 2. Ran 'pip install -r requirements.txt'
 3. Are using Python 3.10 or higher
+
+Run with --perf to also measure this machine's import time, disk sync
+latency and JSON parse speed, and get a storage recommendation.
 """
 
+import sys
+from pathlib import Path
+
 try:
     # Try to import the core MCP components we'll use in this lesson
     from mcp.server import Server
@@ -27,12 +33,11 @@ except ImportError as e:
     print("  1. Activated the virtual environment")
     print("  2. Ran: pip install -r requirements.txt")
     print("  3. Are using Python 3.10 or higher")
-```
-
----
-
-## **File 5: requirements.txt (Python Dependencies)**
 
-This simple file lists all the Python packages needed for the lesson.
-```
-mcp>=1.0.0
+else:
+    if "--perf" in sys.argv:
+        # The check itself lives in the repository's mcp_shared folder
+        LESSON_DIR = Path(__file__).resolve().parent
+        sys.path.insert(0, str(LESSON_DIR.parent))
+        from mcp_shared.perf_check import run_perf_check
+        run_perf_check(LESSON_DIR)
@@ -0,0 +1,176 @@
+"""
+Directory index for the note-reader's list_notes tool
+
+Listing a folder means asking the operating system about every file in
+it, which gets slow once a folder holds many thousands of notes. This
+index lists the folder once with os.scandir, keeps each note's name, size
+and modification time in memory, and answers list_notes calls from that
+copy.
+
+Only note files are listed: names ending in one of NOTE_SUFFIXES (any
+case), minus names the server asks to leave out, such as the lesson's
+own README.md when the notes live next to server.py. Hidden files, folders
+and everything else in the folder (server.py, config examples) are skipped.
+
+Creating, deleting or renaming a file changes the folder's own
+modification time, so before answering, the index checks that one value
+(a single stat call) and only lists the folder again when it changed.
+Editing a file in place doesn't touch the folder, so a note rewritten
+that way shows its old size and time until the next file is created,
+deleted or renamed.
+
+Sorted copies of the listing (by name, size and time) are made on first
+use and kept with it, so repeated calls never sort the folder again, and
+an unfiltered page of results is just a slice of one of them.
+
+A folder holding more than `max_entries` files is not kept at all: it is
+listed again on every call, so the index never holds more than that many
+entries. In the combined server the listing also counts against the
+shared cache budget (see mcp_shared/cache_budget.py), which may drop it to
+make room for another server's caches.
+"""
+
+import fnmatch
+import os
+import re
+import threading
+from collections import namedtuple
+
+# One file in the folder; mtime is seconds since the epoch
+NoteEntry = namedtuple("NoteEntry", ["name", "size", "mtime"])
+
+SORT_KEYS = ("name", "size", "mtime")
+
+# File name endings that make a file a note
+NOTE_SUFFIXES = (".txt", ".md")
+
+# Files kept in the listing before the index stops keeping it
+MAX_INDEXED_FILES = 1_000_000
+
+
+class DirectoryIndex:
+    """In-memory listing of one folder's note files, refreshed when the folder changes"""
+
+    def __init__(self, max_entries=MAX_INDEXED_FILES, suffixes=NOTE_SUFFIXES, exclude=()):
+        self.max_entries = max_entries
+        self.suffixes = tuple(suffix.lower() for suffix in suffixes)
+        self.exclude = frozenset(exclude)
+        self.directory = None
+        self.hits = 0
+        self.misses = 0
+        self._signature = None
+        self._entries = ()
+        self._sorted = {}
+        self._lock = threading.Lock()
+
+    def entries(self, directory):
+        """
+        Every note file in `directory` (names starting with a dot are
+        skipped), listing the folder again only if it changed
+        """
+        directory = os.fspath(directory)
+        signature = _folder_signature(directory)
+        with self._lock:
+            if directory == self.directory and signature == self._signature:
+                self.hits += 1
+                return self._entries
+            self.misses += 1
+            entries = []
+            with os.scandir(directory) as scan:
+                for entry in scan:
+                    if entry.name.startswith(".") or entry.name in self.exclude \
+                            or not entry.name.lower().endswith(self.suffixes):
+                        continue
+                    try:
+                        if not entry.is_file():
+                            continue
+                        info = entry.stat()
+                    except OSError:
+                        # Deleted while we were listing
+                        continue
+                    entries.append(NoteEntry(entry.name, info.st_size, info.st_mtime))
+            entries.sort()
+            if len(entries) > self.max_entries:
+                # Too large to keep: forget the old listing too
+                self.directory = self._signature = None
+                self._entries = ()
+                self._sorted = {}
+                return tuple(entries)
+            self.directory = directory
+            self._signature = signature
+            self._entries = tuple(entries)
+            self._sorted = {"name": self._entries}
+            return self._entries
+
+    def entry_count(self):
+        """Files held in the listing right now"""
+        return len(self._entries)
+
+    def drop(self):
+        """
+        Forget the listing (the next call lists the folder again), unless
+        a call is listing the folder right now: then that call's fresh
+        listing is kept
+        """
+        if not self._lock.acquire(blocking=False):
+            return
+        try:
+            self.directory = self._signature = None
+            self._entries = ()
+            self._sorted = {}
+        finally:
+            self._lock.release()
+
+    def query(self, directory, pattern=None, min_size=None, max_size=None,
+              modified_after=None, modified_before=None, sort="name", descending=False, limit=None):
+        """
+        Files in `directory` matching every given filter, in `sort` order
+        ("name", "size" or "mtime"). Returns (total matches, first `limit`
+        matches). `pattern` is a glob such as "*.txt" (case-sensitive),
+        and the modified_* bounds are timestamps.
+        """
+        if sort not in SORT_KEYS:
+            raise ValueError(f"Unknown sort order {sort!r}; use one of {', '.join(SORT_KEYS)}")
+        ordered = self._sorted_by(sort, self.entries(directory))
+        if descending:
+            ordered = ordered[::-1]
+        if pattern is None and min_size is None and max_size is None \
+                and modified_after is None and modified_before is None:
+            return len(ordered), list(ordered[:limit])
+
+        match_name = re.compile(fnmatch.translate(pattern)).match if pattern else None
+        total = 0
+        page = []
+        for entry in ordered:
+            if match_name is not None and not match_name(entry.name):
+                continue
+            if min_size is not None and entry.size < min_size:
+                continue
+            if max_size is not None and entry.size > max_size:
+                continue
+            if modified_after is not None and entry.mtime < modified_after:
+                continue
+            if modified_before is not None and entry.mtime > modified_before:
+                continue
+            total += 1
+            if limit is None or len(page) < limit:
+                page.append(entry)
+        return total, page
+
+    def _sorted_by(self, key, entries):
+        """`entries` in `key` order, kept with the listing if it is the one the index holds"""
+        if key == "name":
+            return entries
+        with self._lock:
+            kept = entries is self._entries
+            ordered = self._sorted.get(key) if kept else None
+            if ordered is None:
+                ordered = tuple(sorted(entries, key=lambda entry: (getattr(entry, key), entry.name)))
+                if kept:
+                    self._sorted[key] = ordered
+            return ordered
+
+
+def _folder_signature(directory):
+    info = os.stat(directory)
+    return info.st_ino, info.st_mtime_ns
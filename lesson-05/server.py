@@ -7,21 +7,80 @@ This server demonstrates the core patterns of MCP server development:
 - Handling tool execution requests
 - Communicating with MCP clients through stdio
 
-The server exposes a single tool called 'read_note' that reads text files
-from the local filesystem and returns their content.
+The server exposes a tool called 'read_note' that reads text files
+from the local filesystem and returns their content, 'list_notes' that
+shows which files there are to read, plus a 'server_stats' tool that
+reports how long calls take.
 """
 
+import time
+
+# Taken before the other imports, so the startup timing includes them
+STARTED = time.perf_counter()
+
+import argparse
 import asyncio
+import functools
+import os
+import sys
+from datetime import datetime
 from pathlib import Path
 from mcp.server.models import InitializationOptions
 from mcp.server import NotificationOptions, Server
 from mcp.server.stdio import stdio_server
 from mcp.types import TextContent, Tool
 
+# Shared helpers live in the repository's mcp_shared folder
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from mcp_shared.output import (
+    NOTE_RESERVE_CHARS,
+    OutputBuilder,
+    output_schema_properties,
+    read_output_arguments,
+    write_json,
+    write_omitted_note,
+    write_table,
+)
+from mcp_shared.profiling import profile_tool_calls
+from mcp_shared.scheduler import ToolScheduler
+from mcp_shared.startup import StartupTimer
+from mcp_shared.tool_stats import ServerStats
+from mcp_shared.transport import add_transport_arguments, serve_http
+
+from note_index import SORT_KEYS, DirectoryIndex
+
 # Create the server instance with a unique name
 # This name identifies your server to MCP clients like Claude Desktop
 server = Server("note-reader")
 
+# Folder the notes are read from: the folder containing this server.py file,
+# unless the MCP_NOTES_DIR environment variable names another one
+NOTES_DIR_ENV = "MCP_NOTES_DIR"
+NOTES_DIR = Path(os.environ.get(NOTES_DIR_ENV) or Path(__file__).parent)
+
+# Call counts, latencies and bytes read, reported by the server_stats tool
+stats = ServerStats("note-reader")
+
+# Reads run in a thread pool so a large file doesn't stall other requests;
+# the scheduler also limits how many may queue up and how long one may take
+scheduler = ToolScheduler()
+stats.watch_counters(scheduler.counters)
+TOOL_TIMEOUT_SECONDS = 30
+
+# How long starting up took (imports, setup and the handshake)
+startup = StartupTimer("note-reader", STARTED)
+stats.watch_counters(startup.counters)
+
+# list_notes answers from an in-memory listing of the note files (.txt and
+# .md) in NOTES_DIR, which is only refreshed when a file is added, removed
+# or renamed (see note_index.py). When the notes are the ones next to this
+# file, the lesson's own text files aren't listed as notes.
+LESSON_FILES = ("README.md", "requirements.txt")
+note_index = DirectoryIndex(exclude=LESSON_FILES if NOTES_DIR == Path(__file__).parent else ())
+stats.watch_cache("note_index", lambda: (note_index.hits, note_index.misses))
+LIST_NOTES_DEFAULT_LIMIT = 100
+LIST_NOTES_MAX_LIMIT = 10_000
+
 
 @server.list_tools()
 async def handle_list_tools() -> list[Tool]:
@@ -50,11 +109,63 @@ async def handle_list_tools() -> list[Tool]:
                 },
                 "required": ["filename"]
             }
-        )
+        ),
+        Tool(
+            name="list_notes",
+            description="List the notes (.txt and .md files) read_note can read, with their sizes and "
+                        "modification times. Filter by name pattern, size or date, and sort the results.",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "pattern": {
+                        "type": "string",
+                        "description": "Only names matching this pattern, e.g. '*.txt' or 'meeting-*'"
+                    },
+                    "min_size": {
+                        "type": "integer",
+                        "minimum": 0,
+                        "description": "Only files of at least this many bytes"
+                    },
+                    "max_size": {
+                        "type": "integer",
+                        "minimum": 0,
+                        "description": "Only files of at most this many bytes"
+                    },
+                    "modified_after": {
+                        "type": "string",
+                        "description": "Only files modified at or after this date/time, e.g. '2025-01-15' or '2025-01-15T09:00'"
+                    },
+                    "modified_before": {
+                        "type": "string",
+                        "description": "Only files modified at or before this date/time"
+                    },
+                    "sort": {
+                        "type": "string",
+                        "enum": list(SORT_KEYS),
+                        "description": "Order by name (default), size or mtime (modification time)"
+                    },
+                    "descending": {
+                        "type": "boolean",
+                        "description": "Largest or newest first (default: false)"
+                    },
+                    "limit": {
+                        "type": "integer",
+                        "minimum": 1,
+                        "maximum": LIST_NOTES_MAX_LIMIT,
+                        "description": f"Most files to list (default: {LIST_NOTES_DEFAULT_LIMIT})"
+                    },
+                    **output_schema_properties()
+                },
+                "required": []
+            }
+        ),
+        stats.tool_definition()
     ]
 
 
 @server.call_tool()
+@stats.instrument
+@profile_tool_calls("note-reader")
 async def handle_call_tool(name: str, arguments: dict) -> list[TextContent]:
     """
     Execute a tool when the AI model requests it.
@@ -73,6 +184,12 @@ async def handle_call_tool(name: str, arguments: dict) -> list[TextContent]:
     MCP standardizes communication between servers and clients.
     """
     
+    if name == "server_stats":
+        return stats.tool_result()
+    
+    if name == "list_notes":
+        return await list_notes_handler(arguments)
+    
     # Verify we recognize this tool name
     if name != "read_note":
         raise ValueError(f"Unknown tool: {name}")
@@ -84,22 +201,24 @@ async def handle_call_tool(name: str, arguments: dict) -> list[TextContent]:
         raise ValueError("Missing required argument: filename")
     
     # Build the file path
-    # __file__ is the path to this server.py file
-    # .parent gets the directory containing it (the lesson-05 folder)
+    # NOTES_DIR is the directory containing this server.py file (the lesson-05 folder)
     # / filename adds the requested filename to that path
-    file_path = Path(__file__).parent / filename
+    file_path = NOTES_DIR / filename
     
     # Check if the file actually exists
     # It's better to give a clear error message than to crash
     if not file_path.exists():
         return [TextContent(
             type="text",
-            text=f"Error: File '{filename}' not found in the server directory."
+            text=f"Error: File '{filename}' not found in the server directory. "
+                 "Use list_notes to see which files are available."
         )]
     
     # Read and return the file content
     try:
-        content = file_path.read_text(encoding="utf-8")
+        data = await scheduler.run(file_path.read_bytes, reads=[file_path], timeout=TOOL_TIMEOUT_SECONDS)
+        stats.count("bytes_read", len(data))
+        content = data.decode("utf-8")
         return [TextContent(
             type="text",
             text=content
@@ -113,7 +232,71 @@ async def handle_call_tool(name: str, arguments: dict) -> list[TextContent]:
         )]
 
 
-async def main():
+async def list_notes_handler(arguments: dict) -> list[TextContent]:
+    """
+    List the notes in NOTES_DIR that match the caller's filters.
+    
+    The listing itself comes from note_index, so a folder with many
+    thousands of files is only read from disk when it has changed.
+    """
+    try:
+        modified_after = parse_time_argument(arguments.get("modified_after"))
+        modified_before = parse_time_argument(arguments.get("modified_before"))
+        query = functools.partial(
+            note_index.query, NOTES_DIR,
+            pattern=arguments.get("pattern") or None,
+            min_size=arguments.get("min_size"),
+            max_size=arguments.get("max_size"),
+            modified_after=modified_after,
+            modified_before=modified_before,
+            sort=arguments.get("sort") or "name",
+            descending=bool(arguments.get("descending")),
+            limit=arguments.get("limit") or LIST_NOTES_DEFAULT_LIMIT
+        )
+        total, notes = await scheduler.run(query, timeout=TOOL_TIMEOUT_SECONDS)
+    except ValueError as e:
+        return [TextContent(type="text", text=f"Error: {e}")]
+    
+    if not notes:
+        return [TextContent(type="text", text="No notes match those filters.")]
+    
+    # Write the listing in the format and size limit the caller asked for
+    output_format, max_chars = read_output_arguments(arguments)
+    builder = OutputBuilder(max_chars)
+    rows = [
+        {"name": note.name, "size": note.size,
+         "modified": datetime.fromtimestamp(note.mtime).isoformat(timespec="seconds")}
+        for note in notes
+    ]
+    if output_format == "json":
+        write_json(builder, {"total": total, "notes": rows}, "notes")
+    elif output_format == "table":
+        write_table(builder, {"total": total, "notes": rows})
+    else:
+        shown = f" (showing {len(rows)})" if len(rows) < total else ""
+        builder.write(f"Found {total} notes{shown}:\n\n")
+        for i, row in enumerate(rows):
+            line = row["name"] if output_format == "summary" else \
+                f"{row['name']}  {row['size']} bytes  modified {row['modified']}"
+            if not builder.add_item(line + "\n", reserve=NOTE_RESERVE_CHARS):
+                builder.omit(len(rows) - i - 1)
+                break
+        write_omitted_note(builder, "more notes")
+    
+    return [TextContent(type="text", text=builder.getvalue())]
+
+
+def parse_time_argument(value):
+    """A date or date/time argument such as '2025-01-15' as a timestamp (None if not given)"""
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value).timestamp()
+    except ValueError:
+        raise ValueError(f"Can't read the date '{value}'; use a form like 2025-01-15 or 2025-01-15T09:00")
+
+
+async def main(transport="stdio", host="127.0.0.1", port=8105):
     """
     Start the MCP server and run it indefinitely.
     
@@ -123,43 +306,43 @@ async def main():
     
     The server runs until the client disconnects or the process is terminated.
     """
+    # Time the handshake too (see mcp_shared/startup.py)
+    startup.watch(server)
+    
+    # Optionally write the statistics to a Prometheus file (see MCP_STATS_FILE)
+    stats.start_prometheus_export()
+    
+    # The initialization options tell clients the server's name and version,
+    # and which MCP features (capabilities) it supports
+    options = InitializationOptions(
+        server_name="note-reader",
+        server_version="1.0.0",
+        capabilities=server.get_capabilities(
+            notification_options=NotificationOptions(),
+            experimental_capabilities={},
+        )
+    )
+    
+    # With --transport http or sse, one process serves many local clients
+    # over HTTP instead (see mcp_shared/transport.py)
+    startup.serving()
+    if transport != "stdio":
+        await serve_http(server, options, transport, host, port)
+        return
+    
     # stdio_server() creates the communication channel
     # It returns read and write streams that the server uses to communicate
     async with stdio_server() as (read_stream, write_stream):
         # Start the server with those streams and initialization options
-        await server.run(
-            read_stream,
-            write_stream,
-            InitializationOptions(
-                server_name="note-reader",
-                server_version="1.0.0",
-                capabilities=server.get_capabilities(
-                    notification_options=NotificationOptions(),
-                    experimental_capabilities={},
-                )
-            )
-        )
+        await server.run(read_stream, write_stream, options)
 
 
 # This is the entry point when the script is run
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Note reader MCP server")
+    add_transport_arguments(parser, default_port=8105)
+    args = parser.parse_args()
+    
     # Run the async main function
     # The server will keep running until stopped with Ctrl+C or by the client disconnecting
-    asyncio.run(main())
-```
-
----
-
-## **File 3: sample_note.txt (Example Data)**
-
-This is the text file that the MCP tool will read. It should contain content that makes sense when Claude reads and responds to it.
-```
-This is my first MCP server.
-
-MCP lets Claude Desktop connect to tools I create.
-Those tools can read data, write data, or trigger actions.
-
-Now Claude can use my custom tools to help me get work done.
-This opens up endless possibilities for automation and AI assistance.
-
-The patterns I'm learning in this lesson will scale to much more complex systems.
+    asyncio.run(main(args.transport, args.host, args.port))
@@ -10,18 +10,71 @@ create a collaboration pipeline:
 3. save_draft: Lets a Writer agent save the final document
 
 This is the same pattern as Lesson 5, just with multiple tools instead of one.
+A fourth tool, server_stats, reports how long calls take, and flush writes
+saves that are still waiting in memory to disk.
 """
 
+import time
+
+# Taken before the other imports, so the startup timing includes them
+STARTED = time.perf_counter()
+
+import argparse
 import asyncio
+import os
+import sys
 from pathlib import Path
 from mcp.server.models import InitializationOptions
 from mcp.server import NotificationOptions, Server
 from mcp.server.stdio import stdio_server
 from mcp.types import TextContent, Tool
 
+# Shared helpers live in the repository's mcp_shared folder
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from mcp_shared.profiling import profile_tool_calls
+from mcp_shared.scheduler import ToolScheduler
+from mcp_shared.startup import StartupTimer
+from mcp_shared.tool_stats import ServerStats
+from mcp_shared.transport import add_transport_arguments, serve_http
+from mcp_shared.write_behind import (
+    DEFAULT_DURABILITY,
+    FLUSH_DELAY_SECONDS,
+    WriteBehindBuffer,
+    add_write_behind_arguments,
+)
+
 # Create the server instance with a descriptive name
 server = Server("collaboration-hub")
 
+# Folder where agents' shared files are stored: the folder containing this
+# file, unless the MCP_HUB_DIR environment variable names another one
+BASE_DIR_ENV = "MCP_HUB_DIR"
+BASE_DIR = Path(os.environ.get(BASE_DIR_ENV) or Path(__file__).parent)
+
+# Call counts, latencies and bytes read/written, reported by server_stats
+stats = ServerStats("collaboration-hub")
+
+# File reads and writes run in a thread pool. Each call names the file it
+# touches, so a read waits for a save of the same file to finish (and never
+# sees it half-written) while calls on different files run side by side.
+scheduler = ToolScheduler()
+stats.watch_counters(scheduler.counters)
+TOOL_TIMEOUT_SECONDS = 30
+
+# With the default durability a save returns once the file is on disk, and
+# saves to the same file made while it is being written become one write.
+# With --durability none a save returns at once and is written a moment later.
+# Each write goes to a temporary file that is then renamed over the old one,
+# so a crash never leaves a file cut short, and reads see the newest save
+# even before it reaches the disk. The flush tool writes everything right
+# away (see mcp_shared/write_behind.py).
+write_buffer = WriteBehindBuffer(scheduler, stats, timeout=TOOL_TIMEOUT_SECONDS)
+stats.watch_counters(write_buffer.counters)
+
+# How long starting up took (imports, setup and the handshake)
+startup = StartupTimer("collaboration-hub", STARTED)
+stats.watch_counters(startup.counters)
+
 
 @server.list_tools()
 async def handle_list_tools() -> list[Tool]:
@@ -69,11 +122,24 @@ async def handle_list_tools() -> list[Tool]:
                 },
                 "required": ["content"]
             }
-        )
+        ),
+        Tool(
+            name="flush",
+            description="Write every save still waiting in memory to disk now. Saves are written "
+                        "within a second anyway; use this before another program reads the files.",
+            inputSchema={
+                "type": "object",
+                "properties": {},
+                "required": []
+            }
+        ),
+        stats.tool_definition()
     ]
 
 
 @server.call_tool()
+@stats.instrument
+@profile_tool_calls("collaboration-hub")
 async def handle_call_tool(name: str, arguments: dict) -> list[TextContent]:
     """
     Execute the requested tool.
@@ -82,8 +148,8 @@ async def handle_call_tool(name: str, arguments: dict) -> list[TextContent]:
     tool name. Each tool follows the same pattern: validate, execute, return.
     """
     
-    # Get the base directory where this server lives
-    base_dir = Path(__file__).parent
+    # Get the base directory where shared files live
+    base_dir = BASE_DIR
     
     # Route to the appropriate tool handler
     if name == "save_research":
@@ -92,6 +158,10 @@ async def handle_call_tool(name: str, arguments: dict) -> list[TextContent]:
         return await read_research_handler(base_dir)
     elif name == "save_draft":
         return await save_draft_handler(arguments, base_dir)
+    elif name == "flush":
+        return await flush_handler()
+    elif name == "server_stats":
+        return stats.tool_result()
     else:
         raise ValueError(f"Unknown tool: {name}")
 
@@ -114,10 +184,10 @@ async def save_research_handler(arguments: dict, base_dir: Path) -> list[TextCon
     file_path = base_dir / "research_findings.txt"
     
     try:
-        file_path.write_text(content, encoding="utf-8")
+        on_disk = await write_buffer.save(file_path, content.encode("utf-8"))
         return [TextContent(
             type="text",
-            text=f"Research findings saved successfully to {file_path.name}"
+            text=save_message("Research findings", file_path, on_disk)
         )]
     except Exception as e:
         return [TextContent(
@@ -135,6 +205,14 @@ async def read_research_handler(base_dir: Path) -> list[TextContent]:
     """
     file_path = base_dir / "research_findings.txt"
     
+    # A save that hasn't reached the disk yet is the newest version
+    staged = write_buffer.read(file_path)
+    if staged is not None:
+        return [TextContent(
+            type="text",
+            text=staged.decode("utf-8")
+        )]
+    
     if not file_path.exists():
         return [TextContent(
             type="text",
@@ -142,7 +220,9 @@ async def read_research_handler(base_dir: Path) -> list[TextContent]:
         )]
     
     try:
-        content = file_path.read_text(encoding="utf-8")
+        data = await scheduler.run(file_path.read_bytes, reads=[file_path], timeout=TOOL_TIMEOUT_SECONDS)
+        stats.count("bytes_read", len(data))
+        content = data.decode("utf-8")
         return [TextContent(
             type="text",
             text=content
@@ -171,10 +251,10 @@ async def save_draft_handler(arguments: dict, base_dir: Path) -> list[TextConten
     file_path = base_dir / "final_draft.txt"
     
     try:
-        file_path.write_text(content, encoding="utf-8")
+        on_disk = await write_buffer.save(file_path, content.encode("utf-8"))
         return [TextContent(
             type="text",
-            text=f"Final draft saved successfully to {file_path.name}"
+            text=save_message("Final draft", file_path, on_disk)
         )]
     except Exception as e:
         return [TextContent(
@@ -183,26 +263,79 @@ async def save_draft_handler(arguments: dict, base_dir: Path) -> list[TextConten
         )]
 
 
-async def main():
+def save_message(what, file_path, on_disk):
+    """Tell the agent whether its save is on disk yet, or only staged"""
+    if on_disk:
+        return f"{what} saved successfully to {file_path.name}"
+    return (
+        f"{what} staged for {file_path.name}: it will be written to disk within "
+        f"{write_buffer.delay:g} s (durability: none). Use the flush tool to write it now"
+    )
+
+
+async def flush_handler() -> list[TextContent]:
+    """
+    Write every staged save to disk now.
+    
+    Useful before another program (or another agent's server process)
+    reads the shared files.
+    """
+    try:
+        files, written = await write_buffer.flush()
+    except Exception as e:
+        return [TextContent(
+            type="text",
+            text=f"Error writing saved files: {str(e)} (they stay in memory and will be retried)"
+        )]
+    if not files:
+        return [TextContent(
+            type="text",
+            text="Nothing to flush: every save is already on disk"
+        )]
+    return [TextContent(
+        type="text",
+        text=f"Flushed {files} file(s), {written:,} bytes, to disk (durability: {write_buffer.durability})"
+    )]
+
+
+async def main(transport="stdio", host="127.0.0.1", port=8106, durability=DEFAULT_DURABILITY,
+               flush_delay=FLUSH_DELAY_SECONDS):
     """
     Start the MCP server and run it indefinitely.
     
     This is identical to Lesson 5. The only difference is we have more tools.
+    durability and flush_delay control how saves are written (see
+    mcp_shared/write_behind.py); anything still in memory is written when
+    the server stops.
     """
-    async with stdio_server() as (read_stream, write_stream):
-        await server.run(
-            read_stream,
-            write_stream,
-            InitializationOptions(
-                server_name="collaboration-hub",
-                server_version="1.0.0",
-                capabilities=server.get_capabilities(
-                    notification_options=NotificationOptions(),
-                    experimental_capabilities={},
-                )
-            )
+    write_buffer.durability = durability
+    write_buffer.delay = flush_delay
+    startup.watch(server)
+    stats.start_prometheus_export()
+    
+    options = InitializationOptions(
+        server_name="collaboration-hub",
+        server_version="1.0.0",
+        capabilities=server.get_capabilities(
+            notification_options=NotificationOptions(),
+            experimental_capabilities={},
         )
+    )
+    
+    async with write_buffer.running():
+        # One process can serve several agents at once over HTTP (--transport http)
+        startup.serving()
+        if transport != "stdio":
+            await serve_http(server, options, transport, host, port)
+            return
+        
+        async with stdio_server() as (read_stream, write_stream):
+            await server.run(read_stream, write_stream, options)
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Collaboration hub MCP server")
+    add_transport_arguments(parser, default_port=8106)
+    add_write_behind_arguments(parser)
+    args = parser.parse_args()
+    asyncio.run(main(args.transport, args.host, args.port, args.durability, args.flush_delay))
\ No newline at end of file
@@ -2,8 +2,15 @@
 Environment Setup Verification for Lesson 7
 
 Checks that all required MCP components are installed correctly.
+
+Run with --perf to also measure this machine's import time, disk sync
+latency and JSON parse speed, and get a storage recommendation.
 """
 
+import os
+import sys
+from pathlib import Path
+
 try:
     from mcp.server import Server
     from mcp.server.stdio import stdio_server
@@ -23,10 +30,12 @@ except ImportError as e:
     print("  1. Activated the virtual environment")
     print("  2. Ran: pip install -r requirements.txt")
     print("  3. Are using Python 3.10 or higher")
-```
-
----
 
-## **File 4: requirements.txt**
-```
-mcp>=1.0.0
\ No newline at end of file
+else:
+    if "--perf" in sys.argv:
+        # The check itself lives in the repository's mcp_shared folder
+        LESSON_DIR = Path(__file__).resolve().parent
+        sys.path.insert(0, str(LESSON_DIR.parent))
+        from mcp_shared.perf_check import run_perf_check
+        DATA_DIR = Path(os.environ.get("MCP_MEMORY_DIR") or LESSON_DIR)
+        run_perf_check(LESSON_DIR, DATA_DIR / "shared_memory.json")
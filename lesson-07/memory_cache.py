@@ -0,0 +1,52 @@
+"""
+Parsed-file cache for the memory server
+
+Parsing shared_memory.json is the slowest part of every read once the
+file is large. This cache keeps the parsed memories together with the
+file's identity, size and modification time at the moment they were read
+(or written), and hands them back until the file changes.
+
+A file holding more than `max_entries` memories is not kept: it is parsed
+again on every read, so the cache never holds more than that many
+memories. In the combined server the cache also counts against the shared
+cache budget (see mcp_shared/cache_budget.py), which may drop the memories
+to make room for another server's caches.
+"""
+
+# Memories kept in memory before the cache stops keeping the file
+MAX_CACHED_MEMORIES = 1_000_000
+
+
+class MemoryCache:
+    """The memories last read from (or written to) the memory file"""
+
+    def __init__(self, max_entries=MAX_CACHED_MEMORIES):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        # Signature of the file as last read or written, kept even when the
+        # memories themselves were too many to keep
+        self.signature = None
+        self.memories = None
+
+    def get(self, signature):
+        """The parsed memories if the file still has `signature`, else None"""
+        if self.memories is not None and self.signature == signature:
+            self.hits += 1
+            return self.memories
+        self.misses += 1
+        return None
+
+    def put(self, signature, memories):
+        """Remember `memories` as the content of the file with `signature`"""
+        self.signature = signature
+        self.memories = memories if len(memories) <= self.max_entries else None
+
+    def entry_count(self):
+        """Memories held in memory right now"""
+        memories = self.memories
+        return 0 if memories is None else len(memories)
+
+    def drop(self):
+        """Forget the memories (the next read parses the file again)"""
+        self.memories = None
@@ -0,0 +1,121 @@
+"""
+Tag and agent index for the memory server
+
+Memories can carry an `agent` (who saved it) and `tags` (topics such as
+"api" or "retry"). Without an index, "memories tagged api saved by the
+researcher" means checking every memory in the file. This index keeps,
+for every agent and every tag, a postings list: the positions of the
+memories that have it, in ascending order, packed into an array of
+4-byte integers.
+
+A filtered read intersects the postings lists of the requested tag(s) and
+agent, starting from the shortest one and looking the others up by binary
+search. Only the memories that pass every filter are ever looked at, so a
+filtered read costs time in proportion to the smallest matching list,
+not to the size of the memory file.
+
+Memories are only ever appended, so saving new ones just extends the
+lists; the index is rebuilt from scratch only when another process
+rewrote the memory file. It is tied to the file's signature (identity,
+size and modification time), not to one parsed copy of it, so a file too
+large for the parsed-file cache is indexed once, not on every read.
+"""
+
+from array import array
+from bisect import bisect_left
+
+
+def normalize_tags(tags):
+    """Lowercased, de-duplicated tags without surrounding spaces, in the given order"""
+    if isinstance(tags, str):
+        tags = [tags]
+    seen = []
+    for tag in tags or []:
+        tag = str(tag).strip().lower()
+        if tag and tag not in seen:
+            seen.append(tag)
+    return seen
+
+
+def normalize_agent(agent):
+    """Agent names match case-insensitively; an empty name means no agent"""
+    agent = str(agent or "").strip().lower()
+    return agent or None
+
+
+def memory_keys(memory):
+    """The index keys one memory is listed under"""
+    keys = [("tag", tag) for tag in normalize_tags(memory.get("tags"))]
+    agent = normalize_agent(memory.get("agent"))
+    if agent is not None:
+        keys.append(("agent", agent))
+    return keys
+
+
+class MemoryIndex:
+    """
+    Postings lists for the memories in one list, by position.
+
+    `source` is the list the index was built for, and `signature` the
+    signature of the memory file it was parsed from (None if unknown); the
+    memory server updates both when saved memories are added with add().
+    The positions stay valid for any later parse of the same file, so the
+    index can outlive the parsed list.
+    """
+
+    def __init__(self, memories, signature=None):
+        self.source = memories
+        self.signature = signature
+        self.count = 0
+        self._postings = {}
+        self.add(memories)
+
+    def describes(self, memories, signature=None):
+        """True if the index was built for `memories`, or for the unchanged file they were parsed from"""
+        return memories is self.source or (signature is not None and signature == self.signature)
+
+    def add(self, memories):
+        """Index memories appended after the ones already indexed"""
+        for position, memory in enumerate(memories, self.count):
+            for key in memory_keys(memory):
+                postings = self._postings.get(key)
+                if postings is None:
+                    postings = self._postings[key] = array("I")
+                postings.append(position)
+        self.count += len(memories)
+
+    def lookup(self, tags=(), agent=None, limit=None):
+        """
+        Positions of the memories that have every one of `tags` and were
+        saved by `agent`, in ascending order. Positions at or past `limit`
+        (the length of the caller's copy of the list) are left out.
+        """
+        keys = [("tag", tag) for tag in normalize_tags(tags)]
+        agent = normalize_agent(agent)
+        if agent is not None:
+            keys.append(("agent", agent))
+        if not keys:
+            raise ValueError("lookup() needs at least one tag or an agent")
+
+        postings = []
+        for key in keys:
+            found = self._postings.get(key)
+            if not found:
+                return []
+            postings.append(found)
+        postings.sort(key=len)
+
+        limit = self.count if limit is None else min(limit, self.count)
+        shortest, others = postings[0], postings[1:]
+        matches = []
+        for position in shortest:
+            if position >= limit:
+                break
+            if all(_contains(other, position) for other in others):
+                matches.append(position)
+        return matches
+
+
+def _contains(postings, position):
+    i = bisect_left(postings, position)
+    return i < len(postings) and postings[i] == position
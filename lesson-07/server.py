@@ -7,11 +7,25 @@ Three new tools enable agents to:
 - read_memory: Retrieve all past memories
 - search_memory: Find specific relevant memories
 
+A fourth tool, server_stats, reports call latencies and file I/O, and
+maintenance_status reports the background upkeep jobs. With --ship-log or
+--replica-of, replication_status reports log shipping to read replicas.
+
 Memory is stored in a simple JSON file that all agents can access.
 """
 
+import time
+
+# Taken before the other imports, so the startup timing includes them
+STARTED = time.perf_counter()
+
+import argparse
 import asyncio
 import json
+import os
+import sys
+import threading
+from contextlib import nullcontext
 from pathlib import Path
 from datetime import datetime
 from typing import Optional
@@ -21,41 +35,399 @@ from mcp.server import NotificationOptions, Server
 from mcp.server.stdio import stdio_server
 from mcp.types import TextContent, Tool
 
+# Shared helpers live in the repository's mcp_shared folder
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from mcp_shared.file_lock import FileLock
+from mcp_shared.group_commit import GroupCommitter
+from mcp_shared.maintenance import MaintenanceScheduler
+from mcp_shared.output import (
+    NOTE_RESERVE_CHARS,
+    OutputBuilder,
+    output_schema_properties,
+    read_output_arguments,
+    write_json,
+    write_omitted_note,
+    write_table,
+)
+from mcp_shared.profiling import profile_tool_calls
+from mcp_shared.progress import ProgressReporter
+from mcp_shared.replication import LogReplica, LogShipper, add_replication_arguments
+from mcp_shared.scheduler import ToolScheduler
+from mcp_shared.startup import StartupTimer
+from mcp_shared.tool_stats import ServerStats
+from mcp_shared.transport import add_transport_arguments, serve_http
+
+from memory_cache import MemoryCache
+from memory_index import MemoryIndex, normalize_agent, normalize_tags
+
 # Create the server instance
 server = Server("memory-server")
 
-# Path to the memory storage file
-MEMORY_FILE = Path(__file__).parent / "shared_memory.json"
+# Path to the memory storage file, kept next to this file unless the
+# MCP_MEMORY_DIR environment variable names another folder
+MEMORY_DIR_ENV = "MCP_MEMORY_DIR"
+MEMORY_FILE = Path(os.environ.get(MEMORY_DIR_ENV) or Path(__file__).parent) / "shared_memory.json"
+
+# Call counts, latencies, bytes read/written and JSON parse time,
+# reported by the server_stats tool
+stats = ServerStats("memory-server")
+
+# How long starting up took (imports, setup, handshake, first file load)
+startup = StartupTimer("memory-server", STARTED)
+stats.watch_counters(startup.counters)
+
+# Loading (and parsing) the memory file runs in a thread pool, so a large
+# file doesn't stall other requests. Saves are atomic file swaps, so reads
+# never need to wait for them.
+scheduler = ToolScheduler()
+stats.watch_counters(scheduler.counters)
+TOOL_TIMEOUT_SECONDS = 30
+
+# read_memory formats this many memories at a time, reporting progress
+# between pages (so a client can show it, or cancel) when the store is large
+READ_PAGE_SIZE = 1000
+PROGRESS_PREVIEW_CHARS = 120
+
+# Length of each memory's one-line preview in the summary format
+SUMMARY_LINE_CHARS = 100
+
+# The memories as last read from (or written to) MEMORY_FILE, together with
+# the file's identity, size and modification time at that moment (see
+# memory_cache.py)
+memory_cache = MemoryCache()
+stats.watch_cache("memory_cache", lambda: (memory_cache.hits, memory_cache.misses))
+
+# Postings lists of the tags and agents of the memories in MEMORY_FILE (see
+# memory_index.py), built by the first filtered read and kept until the
+# file changes, even while memory_cache doesn't keep the memories themselves
+memory_index = None
+memory_index_lock = threading.Lock()
+
+# Log shipping to read replicas (see mcp_shared/replication.py). A primary
+# started with --ship-log publishes every save as a log segment; a replica
+# started with --replica-of serves reads from the segments it has applied
+# instead of MEMORY_FILE, and refuses saves. Both stay None otherwise.
+log_shipper = None
+replica = None
+
+
+def replication_role():
+    """The LogShipper or LogReplica this server runs with, or None"""
+    return replica if replica is not None else log_shipper
+
+
+def file_signature(path: Path):
+    """Identity, size and modification time of a file, or None if it's missing"""
+    try:
+        info = path.stat()
+    except FileNotFoundError:
+        return None
+    return info.st_ino, info.st_size, info.st_mtime_ns
 
 
 def load_memories() -> list:
     """
     Load all memories from the JSON storage file.
     Returns empty list if file doesn't exist yet.
+    
+    The parsed memories are kept until the file changes, so a long-running
+    server (see --transport http) doesn't re-parse the whole file on every
+    call. Each call returns a new list that the caller may add to.
+    """
+    return list(cached_memories())
+
+
+def cached_memories() -> list:
     """
-    if not MEMORY_FILE.exists():
-        return []
+    Like load_memories(), but returns the parsed list itself, which is
+    shared with every other caller: read it, never change it.
+    """
+    return signed_memories()[1]
+
+
+def signed_memories():
+    """
+    cached_memories() together with the signature of the file they were
+    parsed from: (signature, memories). The signature is None on a read
+    replica and when there is no memory file yet.
+    """
+    if replica is not None:
+        return None, replica.records
+    signature = file_signature(MEMORY_FILE)
+    if signature is None:
+        return None, []
+    memories = memory_cache.get(signature)
+    if memories is not None:
+        return signature, memories
     
     try:
-        with open(MEMORY_FILE, 'r', encoding='utf-8') as f:
-            return json.load(f)
+        with startup.first("store_load"):
+            with open(MEMORY_FILE, 'rb') as f:
+                data = f.read()
+            stats.count("bytes_read", len(data))
+            with stats.timer("json_parse_seconds"):
+                memories = json.loads(data)
     except json.JSONDecodeError:
         # If file is corrupted, return empty list
-        return []
+        return signature, []
+    
+    memory_cache.put(signature, memories)
+    return signature, memories
 
 
 def save_memories(memories: list) -> bool:
     """
     Save all memories to the JSON storage file.
     Returns True if successful, False otherwise.
+    
+    The file is written to a temporary file first and then swapped in, so
+    other processes reading it never see a half-written file.
     """
+    temp_file = MEMORY_FILE.with_suffix(".json.tmp")
     try:
-        with open(MEMORY_FILE, 'w', encoding='utf-8') as f:
-            json.dump(memories, f, indent=2, ensure_ascii=False)
+        data = json.dumps(memories, indent=2, ensure_ascii=False).encode("utf-8")
+        with open(temp_file, 'wb') as f:
+            f.write(data)
+        os.replace(temp_file, MEMORY_FILE)
+        stats.count("bytes_written", len(data))
+        memory_cache.put(file_signature(MEMORY_FILE), list(memories))
         return True
     except Exception as e:
-        print(f"Error saving memories: {e}")
+        print(f"Error saving memories: {e}", file=sys.stderr)
+        return False
+
+
+def append_memories(new_memories: list) -> list:
+    """
+    Add a batch of memories with one read-modify-write of the storage file.
+    Returns, for each new memory, the total memory count right after it was
+    added (or None if saving failed).
+    
+    Called by the group committer below in a worker thread with the file
+    lock held, so the file is re-read fresh, no other process can write in
+    between, and the event loop keeps serving reads during the rewrite.
+    """
+    signature, loaded = signed_memories()
+    memories = list(loaded)
+    first_total = len(memories) + 1
+    memories.extend(new_memories)
+    
+    if not save_memories(memories):
+        return [None] * len(new_memories)
+    
+    # The file only grew, so the tag and agent index just needs the new
+    # memories added rather than a rebuild
+    # (under memory_index_lock, as filtered reads use it from other threads)
+    with memory_index_lock:
+        index = memory_index
+        if index is not None and index.describes(loaded, signature):
+            index.add(new_memories)
+            index.source = memory_cache.memories
+            index.signature = memory_cache.signature
+    
+    # Read replicas pick the new memories up from the shipped log
+    if log_shipper is not None:
+        log_shipper.ship(memories, len(new_memories))
+    return [first_total + i for i in range(len(new_memories))]
+
+
+def current_memory_index(memories: list, signature=None) -> MemoryIndex:
+    """
+    The tag and agent index of `memories` (a list from cached_memories(),
+    parsed from the file with `signature` if known)
+    
+    The index is kept with the file's signature, not just with the parsed
+    list, so it stays valid when the list itself isn't kept (a file with
+    more than memory_cache.max_entries memories, or one the combined
+    server's cache budget dropped) and the file is parsed again unchanged.
+    """
+    global memory_index
+    with memory_index_lock:
+        index = memory_index
+        if index is None or not index.describes(memories, signature):
+            with stats.timer("memory_index_build_seconds"):
+                index = MemoryIndex(memories, signature)
+            memory_index = index
+        else:
+            index.source = memories
+            if index.count < len(memories):
+                # A read replica's list grows in place as segments are applied
+                index.add(memories[index.count:])
+    return index
+
+
+def load_filtered_memories(tags: list, agent: Optional[str]) -> list:
+    """
+    The memories that have every one of `tags` and were saved by `agent`,
+    oldest first. Found through the index, so the content of memories
+    that don't match is never looked at.
+    """
+    signature, memories = signed_memories()
+    positions = current_memory_index(memories, signature).lookup(tags, agent, limit=len(memories))
+    return [memories[position] for position in positions]
+
+
+def describe_filters(tags: list, agent: Optional[str]) -> str:
+    """How a filtered read is described in responses, e.g. " tagged 'api' by 'researcher'" """
+    text = ""
+    if tags:
+        text += " tagged " + ", ".join(f"'{tag}'" for tag in tags)
+    if agent:
+        text += f" by '{agent}'"
+    return text
+
+
+# Concurrent save_memory calls from this process are queued and written
+# together: one locked rewrite per batch instead of one per memory
+memory_writer = GroupCommitter(FileLock(MEMORY_FILE), append_memories)
+
+
+def memory_file_changed() -> bool:
+    """True when the memory file differs from the parsed copy in memory_cache"""
+    if replica is not None:
+        return False
+    signature = file_signature(MEMORY_FILE)
+    return signature is not None and memory_cache.signature != signature
+
+
+async def reload_memories():
+    """Parse the memory file in a worker thread, ready for the next read"""
+    memories = await scheduler.run(cached_memories, reads=[MEMORY_FILE], timeout=TOOL_TIMEOUT_SECONDS)
+    return f"parsed {len(memories)} memories"
+
+
+def memory_index_stale() -> bool:
+    """True when filtered reads have used the index and it no longer matches the parsed memories"""
+    if replica is not None:
+        signature, memories = None, replica.records
+    elif memory_cache.memories is not None:
+        signature, memories = memory_cache.signature, memory_cache.memories
+    else:
         return False
+    index = memory_index
+    return index is not None and (not index.describes(memories, signature) or index.count < len(memories))
+
+
+def index_memories() -> int:
+    signature, memories = signed_memories()
+    return current_memory_index(memories, signature).count
+
+
+async def rebuild_memory_index():
+    """Rebuild the tag and agent index in a worker thread, ready for the next filtered read"""
+    count = await scheduler.run(index_memories, reads=[MEMORY_FILE], timeout=TOOL_TIMEOUT_SECONDS)
+    return f"indexed {count} memories"
+
+
+def shipped_log_due() -> bool:
+    return log_shipper is not None and log_shipper.maintenance_due()
+
+
+def maintain_log() -> int:
+    """Sync or compact the shipped log, holding the lock so no save slips in between"""
+    with memory_writer.lock:
+        memories = cached_memories()
+        log_shipper.maintain(memories)
+    return len(memories)
+
+
+async def maintain_shipped_log():
+    """Publish the memory file as a new base segment in a worker thread"""
+    count = await scheduler.run(maintain_log, reads=[MEMORY_FILE], timeout=TOOL_TIMEOUT_SECONDS)
+    return f"shipped a base of {count} memories"
+
+
+# Background upkeep while no tool call is running: when the memory file was
+# changed by another process (or not read yet), parse it ahead of time so
+# the next read_memory or search_memory doesn't have to, then rebuild the
+# tag and agent index if filtered reads have been using it. With --ship-log,
+# the shipped log also gets a base segment after startup and when it needs
+# compacting.
+maintenance = MaintenanceScheduler(stats, MEMORY_FILE.with_name("memory_maintenance.json"))
+stats.watch_counters(maintenance.counters)
+maintenance.add_job(
+    "reload_memories", reload_memories,
+    due=memory_file_changed,
+    description="Re-parse the memory file after another process changed it",
+    min_interval=5,
+)
+maintenance.add_job(
+    "rebuild_memory_index", rebuild_memory_index,
+    due=memory_index_stale,
+    description="Rebuild the tag and agent index after the memory file was replaced",
+    min_interval=5,
+)
+maintenance.add_job(
+    "maintain_shipped_log", maintain_shipped_log,
+    due=shipped_log_due,
+    description="Ship the memory file as a base segment after startup, and compact the shipped log",
+    min_interval=5,
+)
+
+
+async def render_memories(memories: list, arguments: dict, heading: str, omitted: str,
+                          progress: Optional[ProgressReporter] = None) -> str:
+    """
+    Write memories, already in display order, in the format and size
+    limit the caller asked for (see mcp_shared/output.py).
+    
+    `heading` starts the text and summary formats, and `omitted` names
+    what was left out when the size limit is reached.
+    """
+    output_format, max_chars = read_output_arguments(arguments)
+    builder = OutputBuilder(max_chars)
+    
+    if output_format == "json":
+        write_json(builder, {"total": len(memories), "memories": memories}, "memories")
+        return builder.getvalue()
+    if output_format == "table":
+        write_table(builder, {"total": len(memories), "memories": memories})
+        return builder.getvalue()
+    
+    builder.write(heading)
+    for i, memory in enumerate(memories, 1):
+        timestamp = memory.get("timestamp", "Unknown time") + memory_labels(memory)
+        content = memory.get("content", "")
+        if output_format == "summary":
+            line = " ".join(content.split())
+            if len(line) > SUMMARY_LINE_CHARS:
+                line = line[:SUMMARY_LINE_CHARS - 3] + "..."
+            entry = f"[{i}] {timestamp}: {line}\n"
+        else:
+            # Entries are separated by a blank line
+            entry = f"[{i}] {timestamp}\n{content}\n" if i == 1 else f"\n[{i}] {timestamp}\n{content}\n"
+        if not builder.add_item(entry, reserve=NOTE_RESERVE_CHARS):
+            builder.omit(len(memories) - i)
+            break
+        if progress is not None and i % READ_PAGE_SIZE == 0:
+            await progress.report(i, f"Formatted memories 1-{i}")
+    write_omitted_note(builder, omitted)
+    return builder.getvalue()
+
+
+def memory_labels(memory: dict) -> str:
+    """Who saved a memory and its tags, e.g. " [agent: researcher] [tags: api, retry]" """
+    labels = ""
+    if memory.get("agent"):
+        labels += f" [agent: {memory['agent']}]"
+    if memory.get("tags"):
+        labels += f" [tags: {', '.join(memory['tags'])}]"
+    return labels
+
+
+# Filters accepted by read_memory and search_memory, answered from the
+# tag and agent index
+FILTER_PROPERTIES = {
+    "tags": {
+        "type": "array",
+        "items": {"type": "string"},
+        "description": "Only memories that have all of these tags (case-insensitive)"
+    },
+    "agent": {
+        "type": "string",
+        "description": "Only memories saved by this agent (case-insensitive)"
+    }
+}
 
 
 @server.list_tools()
@@ -64,7 +436,7 @@ async def handle_list_tools() -> list[Tool]:
     Define the tools this server provides.
     All three tools work with the shared memory storage.
     """
-    return [
+    tools = [
         Tool(
             name="save_memory",
             description="Store an insight, learning, or outcome in shared memory. "
@@ -76,6 +448,15 @@ async def handle_list_tools() -> list[Tool]:
                         "type": "string",
                         "description": "The memory to save. Include key insights, successful "
                                      "patterns, mistakes to avoid, or valuable sources discovered."
+                    },
+                    "tags": {
+                        "type": "array",
+                        "items": {"type": "string"},
+                        "description": "Optional topics for finding this memory later, e.g. [\"api\", \"retry\"]"
+                    },
+                    "agent": {
+                        "type": "string",
+                        "description": "Optional name of the agent saving it, e.g. \"researcher\""
                     }
                 },
                 "required": ["content"]
@@ -83,11 +464,15 @@ async def handle_list_tools() -> list[Tool]:
         ),
         Tool(
             name="read_memory",
-            description="Read all stored memories. Use this before starting work to see "
-                       "what you already know about a topic and build on past learnings.",
+            description="Read all stored memories (or only those with given tags or from one agent). "
+                       "Use this before starting work to see what you already know about a topic "
+                       "and build on past learnings.",
             inputSchema={
                 "type": "object",
-                "properties": {},
+                "properties": {
+                    **FILTER_PROPERTIES,
+                    **output_schema_properties()
+                },
             }
         ),
         Tool(
@@ -100,15 +485,24 @@ async def handle_list_tools() -> list[Tool]:
                     "query": {
                         "type": "string",
                         "description": "Search term to find in memories (case-insensitive)"
-                    }
+                    },
+                    **FILTER_PROPERTIES,
+                    **output_schema_properties()
                 },
                 "required": ["query"]
             }
-        )
+        ),
+        stats.tool_definition(),
+        maintenance.tool_definition()
     ]
+    if replication_role() is not None:
+        tools.append(replication_role().tool_definition())
+    return tools
 
 
 @server.call_tool()
+@stats.instrument
+@profile_tool_calls("memory-server")
 async def handle_call_tool(name: str, arguments: dict) -> list[TextContent]:
     """
     Execute the requested memory tool.
@@ -124,22 +518,32 @@ async def handle_call_tool(name: str, arguments: dict) -> list[TextContent]:
                 text="Error: Cannot save empty memory. Please provide content to remember."
             )]
         
-        # Load existing memories
-        memories = load_memories()
+        if replica is not None:
+            return [TextContent(
+                type="text",
+                text="Error: This server is a read-only replica. Save memories through the primary server."
+            )]
         
-        # Create new memory entry with timestamp
+        # Create new memory entry with timestamp, plus who saved it and its
+        # tags when given
         new_memory = {
             "timestamp": datetime.now().isoformat(),
             "content": content
         }
+        agent = str(arguments.get("agent") or "").strip()
+        if agent:
+            new_memory["agent"] = agent
+        tags = normalize_tags(arguments.get("tags"))
+        if tags:
+            new_memory["tags"] = tags
         
-        # Add to memories and save
-        memories.append(new_memory)
+        # Add to memories and save (together with any other pending saves)
+        total_memories = await memory_writer.submit(new_memory)
         
-        if save_memories(memories):
+        if total_memories is not None:
             return [TextContent(
                 type="text",
-                text=f"Memory saved successfully. Total memories: {len(memories)}"
+                text=f"Memory saved successfully. Total memories: {total_memories}"
             )]
         else:
             return [TextContent(
@@ -148,8 +552,22 @@ async def handle_call_tool(name: str, arguments: dict) -> list[TextContent]:
             )]
     
     elif name == "read_memory":
-        # Load all memories
-        memories = load_memories()
+        # Load all memories, telling the client how far along we are if it
+        # asked for progress notifications
+        progress = ProgressReporter(server)
+        await progress.report(0, "Loading memories", force=True)
+        tags, agent = normalize_tags(arguments.get("tags")), normalize_agent(arguments.get("agent"))
+        if tags or agent:
+            memories = await scheduler.run(
+                load_filtered_memories, tags, agent, reads=[MEMORY_FILE], timeout=TOOL_TIMEOUT_SECONDS
+            )
+            if not memories:
+                return [TextContent(
+                    type="text",
+                    text=f"No memories found{describe_filters(tags, agent)}."
+                )]
+        else:
+            memories = await scheduler.run(load_memories, reads=[MEMORY_FILE], timeout=TOOL_TIMEOUT_SECONDS)
         
         if not memories:
             return [TextContent(
@@ -157,14 +575,18 @@ async def handle_call_tool(name: str, arguments: dict) -> list[TextContent]:
                 text="No memories stored yet. Memory is empty."
             )]
         
-        # Format memories for reading (most recent first)
-        formatted_memories = []
-        for i, memory in enumerate(reversed(memories), 1):
-            timestamp = memory.get("timestamp", "Unknown time")
-            content = memory.get("content", "")
-            formatted_memories.append(f"[{i}] {timestamp}\n{content}\n")
-        
-        result = f"Found {len(memories)} memories:\n\n" + "\n".join(formatted_memories)
+        # Format memories for reading (most recent first), a page at a time
+        # The first report already carries the newest memory, in short
+        newest = memories[-1]
+        preview = " ".join(newest.get("content", "").split())[:PROGRESS_PREVIEW_CHARS]
+        await progress.report(
+            0, f"Loaded {len(memories)} memories. Newest ({newest.get('timestamp', 'Unknown time')}): {preview}",
+            total=len(memories), force=True
+        )
+        result = await render_memories(
+            memories[::-1], arguments, f"Found {len(memories)} memories{describe_filters(tags, agent)}:\n\n",
+            "older memories", progress
+        )
         
         return [TextContent(
             type="text",
@@ -181,13 +603,21 @@ async def handle_call_tool(name: str, arguments: dict) -> list[TextContent]:
                 text="Error: Please provide a search term."
             )]
         
-        # Load memories and search
-        memories = load_memories()
+        # Load memories and search. With tag or agent filters, only the
+        # memories the index says pass them are searched.
+        tags, agent = normalize_tags(arguments.get("tags")), normalize_agent(arguments.get("agent"))
+        filters = describe_filters(tags, agent)
+        if tags or agent:
+            memories = await scheduler.run(
+                load_filtered_memories, tags, agent, reads=[MEMORY_FILE], timeout=TOOL_TIMEOUT_SECONDS
+            )
+        else:
+            memories = await scheduler.run(cached_memories, reads=[MEMORY_FILE], timeout=TOOL_TIMEOUT_SECONDS)
         
         if not memories:
             return [TextContent(
                 type="text",
-                text="No memories to search. Memory is empty."
+                text=f"No memories found{filters}." if filters else "No memories to search. Memory is empty."
             )]
         
         # Find matching memories (case-insensitive)
@@ -200,49 +630,98 @@ async def handle_call_tool(name: str, arguments: dict) -> list[TextContent]:
         if not matches:
             return [TextContent(
                 type="text",
-                text=f"No memories found matching '{query}'. Try a different search term."
+                text=f"No memories{filters} found matching '{query}'. Try a different search term."
             )]
         
-        # Format matching memories
-        formatted_matches = []
-        for i, memory in enumerate(matches, 1):
-            timestamp = memory.get("timestamp", "Unknown time")
-            content = memory.get("content", "")
-            formatted_matches.append(f"[{i}] {timestamp}\n{content}\n")
+        # With a size limit, the best matches go first: the most mentions of
+        # the search term, then the newest
+        if arguments.get("max_chars") is not None or arguments.get("max_tokens") is not None:
+            ranked = sorted(
+                enumerate(matches),
+                key=lambda match: (match[1].get("content", "").lower().count(query), match[0]),
+                reverse=True
+            )
+            matches = [memory for _, memory in ranked]
         
-        result = f"Found {len(matches)} memories matching '{query}':\n\n" + "\n".join(formatted_matches)
+        result = await render_memories(
+            matches, arguments, f"Found {len(matches)} memories{filters} matching '{query}':\n\n",
+            "less relevant matches"
+        )
         
         return [TextContent(
             type="text",
             text=result
         )]
     
+    elif name == "server_stats":
+        return stats.tool_result()
+    
+    elif name == "maintenance_status":
+        return maintenance.tool_result()
+    
+    elif name == "replication_status" and replication_role() is not None:
+        return replication_role().tool_result()
+    
     else:
         raise ValueError(f"Unknown tool: {name}")
 
 
-async def main():
+async def main(transport="stdio", host="127.0.0.1", port=8107, warm_up=False,
+               ship_log=None, replica_of=None):
     """
     Start the MCP server with memory capabilities.
+    
+    Over stdio each Claude client gets its own server process. With
+    --transport http (or sse) one process serves every client, so they share
+    the parsed memories and their saves are batched together.
+    
+    The memory file isn't touched until a tool needs it (the first save
+    creates it), so the server answers the handshake straight away. With
+    warm_up it is parsed in the background right after the handshake.
+    
+    With ship_log, every save is also published to that folder for read
+    replicas. With replica_of, this server is one of those replicas: it
+    follows the segments in that folder and serves reads from them.
     """
-    # Ensure memory file exists (create empty if needed)
-    if not MEMORY_FILE.exists():
-        save_memories([])
-    
-    async with stdio_server() as (read_stream, write_stream):
-        await server.run(
-            read_stream,
-            write_stream,
-            InitializationOptions(
-                server_name="memory-server",
-                server_version="1.0.0",
-                capabilities=server.get_capabilities(
-                    notification_options=NotificationOptions(),
-                    experimental_capabilities={},
-                )
-            )
+    global log_shipper, replica
+    if ship_log:
+        log_shipper = LogShipper(ship_log)
+        stats.watch_counters(log_shipper.counters)
+    elif replica_of:
+        replica = LogReplica(replica_of)
+        stats.watch_counters(replica.counters)
+    
+    startup.watch(server, warm_up=reload_memories if warm_up else None)
+    
+    # Optionally write the statistics to a Prometheus file (see MCP_STATS_FILE)
+    stats.start_prometheus_export()
+    
+    options = InitializationOptions(
+        server_name="memory-server",
+        server_version="1.0.0",
+        capabilities=server.get_capabilities(
+            notification_options=NotificationOptions(),
+            experimental_capabilities={},
         )
+    )
+    
+    # Background upkeep (and following the primary's log, on a replica)
+    # runs for as long as the server does
+    async with maintenance.running(), (replica.running() if replica is not None else nullcontext()):
+        startup.serving()
+        if transport != "stdio":
+            await serve_http(server, options, transport, host, port)
+            return
+        
+        async with stdio_server() as (read_stream, write_stream):
+            await server.run(read_stream, write_stream, options)
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Shared memory MCP server")
+    add_transport_arguments(parser, default_port=8107)
+    parser.add_argument("--warm-up", action="store_true",
+                        help="Parse the memory file in the background right after the handshake")
+    add_replication_arguments(parser)
+    args = parser.parse_args()
+    asyncio.run(main(args.transport, args.host, args.port, args.warm_up, args.ship_log, args.replica_of))
\ No newline at end of file
@@ -0,0 +1,66 @@
+"""
+Worker processes for analyze_learning_patterns on very large histories
+
+Starting a pool of processes takes longer than many analyses do, so the
+pool is started by the first analysis that needs it and then kept until
+the server stops. Shards are sent to the workers as AnalysisColumns
+slices (see learning_stats.py), since they share no memory with the
+server.
+
+Workers are started with the "forkserver" method where the platform has
+it, and "spawn" elsewhere, never by forking the server itself. The server
+runs threads (the scheduler's lanes, group commits, background
+maintenance), and a fork copies whatever lock one of them held at that
+moment into the child, still locked, where nothing will ever release it.
+"""
+
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import asynccontextmanager
+
+
+def start_method():
+    """The multiprocessing start method analysis workers use on this platform"""
+    return "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+
+
+class AnalysisWorkers:
+    """A process pool started on first use and kept for the server's lifetime"""
+
+    def __init__(self, max_workers):
+        self.max_workers = max_workers
+        self.pools_started = 0
+        self.shards_analyzed = 0
+        self._pool = None
+
+    def pool(self):
+        """The running pool, started now if there isn't one yet"""
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context(start_method())
+            )
+            self.pools_started += 1
+        return self._pool
+
+    def shutdown(self):
+        """Stop the workers; the next analysis that needs them starts new ones"""
+        pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=True, cancel_futures=True)
+
+    @asynccontextmanager
+    async def running(self):
+        """Stop the workers when the with-block ends"""
+        try:
+            yield self
+        finally:
+            await asyncio.to_thread(self.shutdown)
+
+    def counters(self):
+        """Totals, in the form ServerStats.watch_counters() expects"""
+        return {
+            "analysis_worker_pools_started": self.pools_started,
+            "analysis_shards": self.shards_analyzed,
+        }
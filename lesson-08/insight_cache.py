@@ -0,0 +1,100 @@
+"""
+Result cache for get_learning_insights
+
+Agents tend to ask for the same insights (same agent, task type and
+confidence threshold) over and over between recordings. This cache keeps
+each answer until a new experience could change it.
+
+Every cached answer is tagged with the generation number of the slice of
+history it was computed from: all experiences, one agent's, one task
+type's, or one agent's experiences of one task type. Recording an
+experience only bumps the generations of the slices it belongs to, so
+answers about other agents and task types stay cached.
+"""
+
+from collections import OrderedDict
+
+# Cached answers kept before the least recently used ones are dropped
+MAX_CACHED_INSIGHTS = 1024
+
+
+class InsightCache:
+    """Generation-tagged LRU cache of get_learning_insights answers"""
+
+    def __init__(self, max_entries=MAX_CACHED_INSIGHTS):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._generations = {}
+        self._epoch = 0
+
+    @staticmethod
+    def make_key(agent_id=None, task_type=None, min_confidence=0.7, weighting="all", window_size=None):
+        """Normalize tool arguments so equivalent calls share one entry"""
+        return (
+            agent_id or None,
+            task_type or None,
+            round(float(min_confidence), 4),
+            weighting,
+            window_size if weighting == "window" else None,
+        )
+
+    def get(self, key):
+        """Return the cached answer for `key`, or None if missing or stale"""
+        entry = self._entries.get(key)
+        if entry is not None:
+            generation, value = entry
+            if generation == self.generation(key):
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return value
+            del self._entries[key]
+        self.misses += 1
+        return None
+
+    def put(self, key, value, generation=None):
+        """
+        Cache an answer
+
+        Pass the generation() read before computing `value` so that an answer
+        computed while the history changed is never stored as current.
+        """
+        if generation is None:
+            generation = self.generation(key)
+        self._entries[key] = (generation, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def generation(self, key):
+        """Current generation of the history slice an answer for `key` reads"""
+        return self._epoch, self._generations.get(_scope(key), 0)
+
+    def invalidate(self, agent_id, task_type):
+        """Mark every slice containing an (agent_id, task_type) experience as changed"""
+        for scope in (
+            (None, None),
+            (agent_id, None),
+            (None, task_type),
+            (agent_id, task_type),
+        ):
+            self._generations[scope] = self._generations.get(scope, 0) + 1
+
+    def entry_count(self):
+        """Answers held right now"""
+        return len(self._entries)
+
+    def drop(self):
+        """Forget every answer to save memory (they are computed again on their next call)"""
+        self._entries.clear()
+
+    def clear(self):
+        """Drop every cached answer (for example after another process wrote data)"""
+        self._entries.clear()
+        self._epoch += 1
+
+
+def _scope(key):
+    """The (agent filter, task type filter) slice of history a key reads"""
+    return key[0], key[1]
@@ -0,0 +1,615 @@
+"""
+Online learning statistics for the learning-agent server
+
+The original insight tools recompute every success rate from the full
+experience history, and they treat a year-old failure exactly like
+yesterday's success. The tracker in this module keeps running summaries
+instead, updated once per recorded experience:
+
+- Exponentially decayed success rates: every outcome loses half of its
+  weight each DECAY_HALF_LIFE_DAYS (or the number of days set in the
+  MCP_LEARNING_HALF_LIFE_DAYS environment variable), so recent results
+  dominate.
+- Sliding windows: the success rate over the last N outcomes of each
+  approach, for each size in SLIDING_WINDOW_SIZES.
+
+Queries read these summaries directly, so no history scan happens at
+query time.
+
+It also holds the counting helpers behind analyze_learning_patterns. They
+work on shards of the history so very large histories can be counted in
+several worker processes and the partial counts merged afterwards, and
+the stratified samples that answer approximate analyses in bounded time.
+"""
+
+import heapq
+import math
+import os
+import random
+import threading
+import time
+from array import array
+from collections import deque
+from datetime import datetime
+
+# How quickly old experiences fade. After this many days an outcome counts
+# half as much as a fresh one, after twice as many days a quarter, and so on.
+DECAY_HALF_LIFE_DAYS = 14.0
+HALF_LIFE_ENV = "MCP_LEARNING_HALF_LIFE_DAYS"
+
+# Window sizes (number of most recent outcomes) tracked for every approach
+SLIDING_WINDOW_SIZES = (10, 50)
+
+# Same rule the full-history analysis uses: 5 attempts give full confidence
+ATTEMPTS_FOR_FULL_CONFIDENCE = 5
+
+
+def half_life_days_setting():
+    """The decay half-life in days: MCP_LEARNING_HALF_LIFE_DAYS if set, else DECAY_HALF_LIFE_DAYS"""
+    value = os.environ.get(HALF_LIFE_ENV, "").strip()
+    if not value:
+        return DECAY_HALF_LIFE_DAYS
+    try:
+        days = float(value)
+    except ValueError:
+        days = 0.0
+    if not days > 0 or math.isinf(days):
+        raise ValueError(f"{HALF_LIFE_ENV} must be a positive number of days, not {value!r}")
+    return days
+
+
+def experience_time(experience):
+    """Return an experience's timestamp as epoch seconds (now if missing or invalid)"""
+    try:
+        return datetime.fromisoformat(experience.get("timestamp", "")).timestamp()
+    except (ValueError, TypeError):
+        return time.time()
+
+
+class ApproachStats:
+    """
+    Running outcome summary for one (agent, task type, approach) combination.
+
+    The decayed sums are stored as of `updated_at`; they are decayed forward
+    to the query time whenever they are read. `recent` holds the (timestamp,
+    success) pairs of the latest outcomes, enough for the largest window.
+    """
+
+    __slots__ = ("attempts", "weight", "success_weight", "updated_at", "recent")
+
+    def __init__(self, window_sizes):
+        self.attempts = 0
+        self.weight = 0.0
+        self.success_weight = 0.0
+        self.updated_at = None
+        self.recent = deque(maxlen=max(window_sizes))
+
+    def observe(self, success, timestamp, half_life_seconds):
+        """Fold one outcome into the decayed sums and the sliding windows"""
+        self.attempts += 1
+
+        if self.updated_at is None:
+            self.updated_at = timestamp
+            new_weight = 1.0
+        elif timestamp >= self.updated_at:
+            # Age the existing sums to the new timestamp, then add the outcome
+            factor = _decay_factor(timestamp - self.updated_at, half_life_seconds)
+            self.weight *= factor
+            self.success_weight *= factor
+            self.updated_at = timestamp
+            new_weight = 1.0
+        else:
+            # Out-of-order outcome: age the outcome itself instead of the sums
+            new_weight = _decay_factor(self.updated_at - timestamp, half_life_seconds)
+
+        self.weight += new_weight
+        if success:
+            self.success_weight += new_weight
+
+        # The deque drops the oldest outcome once it is full
+        self.recent.append((timestamp, bool(success)))
+
+    def decayed(self, now, half_life_seconds):
+        """Return (weight, success_weight) aged to `now`"""
+        if self.updated_at is None:
+            return 0.0, 0.0
+        factor = _decay_factor(max(0.0, now - self.updated_at), half_life_seconds)
+        return self.weight * factor, self.success_weight * factor
+
+def latest_outcomes(stats_list, size):
+    """
+    Return (attempts, successes) over the last `size` outcomes of several
+    ApproachStats together, newest by timestamp first
+
+    An approach used by several agents (or for several task types) has one
+    ApproachStats each; their recent outcomes are merged, so the window
+    holds at most `size` outcomes however many of them match.
+    """
+    if len(stats_list) == 1:
+        latest = list(stats_list[0].recent)[-size:]
+    else:
+        latest = heapq.nlargest(
+            size,
+            (outcome for stats in stats_list for outcome in list(stats.recent)[-size:]),
+            key=lambda outcome: outcome[0],
+        )
+    return len(latest), sum(1 for _, success in latest if success)
+
+
+def _decay_factor(elapsed_seconds, half_life_seconds):
+    return math.pow(0.5, elapsed_seconds / half_life_seconds)
+
+
+class OnlineSuccessTracker:
+    """
+    Decayed and sliding-window success rates for every approach.
+
+    Call observe() once per recorded experience. insights() then answers
+    get_learning_insights queries from the running summaries alone.
+    """
+
+    def __init__(self, half_life_days=DECAY_HALF_LIFE_DAYS, window_sizes=SLIDING_WINDOW_SIZES):
+        self.half_life_days = half_life_days
+        self.half_life_seconds = half_life_days * 86400
+        self.window_sizes = tuple(window_sizes)
+        self.total_experiences = 0
+        self._stats = {}
+
+    @classmethod
+    def from_experiences(cls, experiences, **kwargs):
+        """Build a tracker by replaying an existing history once"""
+        tracker = cls(**kwargs)
+        for exp in experiences:
+            tracker.observe(exp)
+        return tracker
+
+    def observe(self, experience):
+        """Update the running summaries with one new experience"""
+        key = (
+            experience.get("agent_id"),
+            experience.get("task_type"),
+            experience.get("approach", "unknown"),
+        )
+        stats = self._stats.get(key)
+        if stats is None:
+            stats = self._stats[key] = ApproachStats(self.window_sizes)
+        stats.observe(experience.get("success", False), experience_time(experience), self.half_life_seconds)
+        self.total_experiences += 1
+
+    def insights(self, agent_id=None, task_type=None, min_confidence=0.7, weighting="decayed", window_size=None):
+        """
+        Identify patterns from the running summaries
+
+        Mirrors identify_patterns() in server.py, but success rates are either
+        decayed (weighting="decayed") or limited to the last `window_size`
+        outcomes of each approach among the experiences matching the agent
+        and task type filters (weighting="window").
+        """
+        if weighting == "window":
+            window_size = window_size or self.window_sizes[0]
+            if window_size not in self.window_sizes:
+                raise ValueError(f"window_size must be one of {list(self.window_sizes)}")
+
+        now = time.time()
+        approaches = {}
+        matched = 0
+
+        for (agent, task, approach), stats in self._stats.items():
+            if agent_id and agent != agent_id:
+                continue
+            if task_type and task != task_type:
+                continue
+            matched += stats.attempts
+
+            totals = approaches.setdefault(approach, [0, 0.0, 0.0, []])
+            totals[0] += stats.attempts
+            if weighting == "window":
+                totals[3].append(stats)
+            else:
+                weight, success_weight = stats.decayed(now, self.half_life_seconds)
+                totals[1] += weight
+                totals[2] += success_weight
+
+        if weighting == "window":
+            for totals in approaches.values():
+                totals[1], totals[2] = latest_outcomes(totals[3], window_size)
+
+        if matched < 3:
+            return {
+                "insights": [],
+                "message": "Need at least 3 experiences to identify patterns",
+                "total_experiences": matched
+            }
+
+        insights = []
+        for approach, (attempts, weight, success_weight, _) in approaches.items():
+            if attempts < 2 or weight <= 0:
+                continue  # Need multiple attempts to establish pattern
+
+            success_rate = success_weight / weight
+            confidence = min(1.0, weight / ATTEMPTS_FOR_FULL_CONFIDENCE)
+
+            if confidence >= min_confidence:
+                insight = {
+                    "approach": approach,
+                    "success_rate": round(success_rate, 2),
+                    "attempts": attempts,
+                    "confidence": round(confidence, 2),
+                    "recommendation": "use" if success_rate > 0.7 else "avoid"
+                }
+                if weighting == "window":
+                    insight["window_attempts"] = int(weight)
+                else:
+                    insight["effective_attempts"] = round(weight, 2)
+                insights.append(insight)
+
+        insights.sort(key=lambda x: x['success_rate'], reverse=True)
+
+        return {
+            "insights": insights,
+            "total_experiences": matched
+        }
+
+
+def insights_from_counts(approach_counts, total_experiences, min_confidence=0.7):
+    """
+    Turn per-approach [attempts, successes] counts into pattern insights
+
+    This is the core of identify_patterns(), split out so sharded analyses
+    can merge counts first and then score them once.
+    """
+    if total_experiences < 3:
+        return {
+            "insights": [],
+            "message": "Need at least 3 experiences to identify patterns",
+            "total_experiences": total_experiences
+        }
+
+    insights = []
+
+    for approach, (attempts, successes) in approach_counts.items():
+        if attempts < 2:
+            continue  # Need multiple attempts to establish pattern
+
+        success_rate = successes / attempts
+        confidence = min(1.0, attempts / ATTEMPTS_FOR_FULL_CONFIDENCE)
+
+        if confidence >= min_confidence:
+            insight = {
+                "approach": approach,
+                "success_rate": round(success_rate, 2),
+                "attempts": attempts,
+                "confidence": round(confidence, 2),
+                "recommendation": "use" if success_rate > 0.7 else "avoid"
+            }
+            insights.append(insight)
+
+    # Sort by success rate
+    insights.sort(key=lambda x: x['success_rate'], reverse=True)
+
+    return {
+        "insights": insights,
+        "total_experiences": total_experiences
+    }
+
+
+def aggregate_experiences(experiences, cutoff_date, agent_id=None, start=0, stop=None):
+    """
+    Count outcomes for analyze_learning_patterns over experiences[start:stop]
+
+    Only experiences at or after `cutoff_date` (and for `agent_id`, when given)
+    are counted. Returns a partial aggregate that merge_aggregates() can
+    combine with the aggregates of other shards.
+    """
+    total = 0
+    successes = 0
+    task_types = {}
+    approaches = {}
+
+    for index in range(start, len(experiences) if stop is None else stop):
+        exp = experiences[index]
+        if agent_id and exp.get("agent_id") != agent_id:
+            continue
+        try:
+            if datetime.fromisoformat(exp.get("timestamp", "")) < cutoff_date:
+                continue
+        except (ValueError, TypeError):
+            continue
+
+        success = 1 if exp.get("success", False) else 0
+        total += 1
+        successes += success
+
+        counts = task_types.setdefault(exp.get("task_type", "unknown"), [0, 0])
+        counts[0] += 1
+        counts[1] += success
+
+        counts = approaches.setdefault(exp.get("approach", "unknown"), [0, 0])
+        counts[0] += 1
+        counts[1] += success
+
+    return {
+        "total": total,
+        "successes": successes,
+        "task_types": task_types,
+        "approaches": approaches
+    }
+
+
+def merge_aggregates(parts):
+    """Combine shard aggregates, in shard order, into one aggregate"""
+    merged = {"total": 0, "successes": 0, "task_types": {}, "approaches": {}}
+    for part in parts:
+        merged["total"] += part["total"]
+        merged["successes"] += part["successes"]
+        for field in ("task_types", "approaches"):
+            for key, (attempts, successes) in part[field].items():
+                counts = merged[field].setdefault(key, [0, 0])
+                counts[0] += attempts
+                counts[1] += successes
+    return merged
+
+
+# Timestamps in AnalysisColumns are seconds since this moment, in the same
+# local time as the naive timestamps experiences are recorded with
+_COLUMN_EPOCH = datetime(1970, 1, 1)
+
+
+def _column_seconds(moment):
+    return (moment - _COLUMN_EPOCH).total_seconds()
+
+
+class AnalysisColumns:
+    """
+    The fields aggregate_experiences() counts, for every experience of a
+    history, as compact arrays
+
+    Analysis worker processes don't share the server's memory, so every
+    shard has to be sent to them. Pickling a shard of experience dicts
+    takes longer than counting it; pickling a slice of these arrays is
+    little more than a memory copy. The columns are filled in once and then
+    only extended with the experiences appended since (see catch_up()).
+
+    Agents, task types and approaches are stored as ids into a table of
+    labels. A timestamp that can't be parsed, or that carries a time zone
+    (so it can't be compared with a local-time cutoff), is stored as NaN,
+    which no cutoff matches: aggregate_experiences() skips those too.
+    """
+
+    def __init__(self, experiences):
+        self.experiences = experiences
+        self.timestamps = array("d")
+        self.agents = array("I")
+        self.task_types = array("I")
+        self.approaches = array("I")
+        self.success = bytearray()
+        self._label_ids = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.success)
+
+    def catch_up(self):
+        """Add the experiences appended to the history since the last call; returns the count covered"""
+        with self._lock:
+            label_id = self._label_ids.setdefault
+            stop = len(self.experiences)
+            for index in range(len(self.success), stop):
+                exp = self.experiences[index]
+                try:
+                    moment = datetime.fromisoformat(exp.get("timestamp", ""))
+                    seconds = _column_seconds(moment) if moment.tzinfo is None else math.nan
+                except (ValueError, TypeError):
+                    seconds = math.nan
+                self.timestamps.append(seconds)
+                self.agents.append(label_id(exp.get("agent_id"), len(self._label_ids)))
+                self.task_types.append(label_id(exp.get("task_type", "unknown"), len(self._label_ids)))
+                self.approaches.append(label_id(exp.get("approach", "unknown"), len(self._label_ids)))
+                self.success.append(1 if exp.get("success", False) else 0)
+            return stop
+
+    def shard(self, start, stop):
+        """Experiences [start:stop] in the form aggregate_columns() takes"""
+        with self._lock:
+            return (
+                list(self._label_ids),
+                self.timestamps[start:stop],
+                self.agents[start:stop],
+                self.task_types[start:stop],
+                self.approaches[start:stop],
+                self.success[start:stop],
+            )
+
+
+def aggregate_columns(shard, cutoff_date, agent_id=None):
+    """
+    Worker entry point for sharded analysis: aggregate_experiences() over
+    a shard from AnalysisColumns.shard()
+    """
+    labels, timestamps, agents, task_types, approaches, success = shard
+    cutoff = _column_seconds(cutoff_date)
+    agent = None
+    if agent_id:
+        if agent_id not in labels:
+            return merge_aggregates([])
+        agent = labels.index(agent_id)
+
+    total = 0
+    successes = 0
+    task_type_counts = {}
+    approach_counts = {}
+
+    for seconds, experience_agent, task_type, approach, succeeded in zip(
+        timestamps, agents, task_types, approaches, success
+    ):
+        if agent is not None and experience_agent != agent:
+            continue
+        if not seconds >= cutoff:  # also skips NaN
+            continue
+
+        total += 1
+        successes += succeeded
+
+        counts = task_type_counts.setdefault(task_type, [0, 0])
+        counts[0] += 1
+        counts[1] += succeeded
+
+        counts = approach_counts.setdefault(approach, [0, 0])
+        counts[0] += 1
+        counts[1] += succeeded
+
+    return {
+        "total": total,
+        "successes": successes,
+        "task_types": {labels[key]: counts for key, counts in task_type_counts.items()},
+        "approaches": {labels[key]: counts for key, counts in approach_counts.items()}
+    }
+
+
+# Experiences kept per (agent, task type, week) stratum for approximate analysis
+RESERVOIR_SIZE = 512
+
+# Strata are also split by time, so a query over the last few weeks finds
+# a full sample for each of those weeks however long the history is
+STRATUM_SECONDS = 7 * 86400
+
+# z-score for the 95% confidence intervals reported in approximate mode
+CONFIDENCE_Z = 1.96
+
+
+class StratifiedReservoir:
+    """
+    Uniform random samples of the history, one per (agent, task type, week).
+
+    Each stratum keeps at most RESERVOIR_SIZE experiences using reservoir
+    sampling (Algorithm R), so every experience in it has the same chance
+    of being in the sample. Approximate analyses read only the samples of
+    the weeks they cover, which keeps their cost independent of the history
+    size, and a recent time range is estimated from as many samples as an
+    old one.
+    """
+
+    def __init__(self, size=RESERVOIR_SIZE, seed=None, stratum_seconds=STRATUM_SECONDS):
+        self.size = size
+        self.stratum_seconds = stratum_seconds
+        self._random = random.Random(seed)
+        self._strata = {}
+        self._sampled = 0
+
+    @classmethod
+    def from_experiences(cls, experiences, **kwargs):
+        """Build the samples by replaying an existing history once"""
+        reservoir = cls(**kwargs)
+        for exp in experiences:
+            reservoir.observe(exp)
+        return reservoir
+
+    def observe(self, experience):
+        """Offer one new experience to its stratum's sample"""
+        try:
+            moment = datetime.fromisoformat(experience.get("timestamp", ""))
+        except (ValueError, TypeError):
+            moment = None
+        # Never inside a time range, as in exact analysis: an unreadable
+        # timestamp, or one with a time zone (which can't be compared with
+        # the local-time cutoff, so aggregate_experiences() skips it too)
+        timestamp = None if moment is None or moment.tzinfo is not None else moment.timestamp()
+
+        period = None if timestamp is None else int(timestamp // self.stratum_seconds)
+        key = (experience.get("agent_id"), experience.get("task_type", "unknown"), period)
+        stratum = self._strata.get(key)
+        if stratum is None:
+            stratum = self._strata[key] = [0, []]
+        stratum[0] += 1
+
+        item = (
+            timestamp,
+            experience.get("approach", "unknown"),
+            bool(experience.get("success", False)),
+        )
+        sample = stratum[1]
+        if len(sample) < self.size:
+            sample.append(item)
+            self._sampled += 1
+        else:
+            slot = self._random.randrange(stratum[0])
+            if slot < self.size:
+                sample[slot] = item
+
+    def entry_count(self):
+        """Sampled experiences held across all strata"""
+        return self._sampled
+
+    def estimate(self, cutoff_date, agent_id=None):
+        """
+        Estimate analyze_learning_patterns counts from the samples
+
+        Returns an aggregate shaped like aggregate_experiences() (with
+        estimated, possibly fractional counts) plus a "confidence_intervals"
+        entry holding 95% intervals for the overall, per task type and per
+        approach success rates.
+        """
+        cutoff = cutoff_date.timestamp()
+        first_period = int(cutoff // self.stratum_seconds)
+        groups = {"overall": {None: [0.0, 0.0, 0.0]}, "task_types": {}, "approaches": {}}
+        exact = True
+        sampled = 0
+
+        for (agent, task_type, period), (seen, sample) in self._strata.items():
+            if agent_id and agent != agent_id:
+                continue
+            if period is None or period < first_period:
+                continue  # Entirely before the time range
+            weight = seen / len(sample)
+            if seen > len(sample):
+                exact = False
+
+            for timestamp, approach, success in sample:
+                if timestamp is None or timestamp < cutoff:
+                    continue
+                sampled += 1
+                for field, key in (("overall", None), ("task_types", task_type), ("approaches", approach)):
+                    # [estimated attempts, estimated successes, sum of squared weights]
+                    totals = groups[field].setdefault(key, [0.0, 0.0, 0.0])
+                    totals[0] += weight
+                    totals[1] += weight if success else 0.0
+                    totals[2] += weight * weight
+
+        overall = groups["overall"][None]
+        intervals = {
+            field: {
+                key: _interval(attempts, successes, squares, exact)
+                for key, (attempts, successes, squares) in groups[field].items()
+            }
+            for field in ("task_types", "approaches")
+        }
+        intervals["overall"] = _interval(*overall, exact) if overall[0] else None
+
+        return {
+            "total": overall[0],
+            "successes": overall[1],
+            "task_types": {key: totals[:2] for key, totals in groups["task_types"].items()},
+            "approaches": {key: totals[:2] for key, totals in groups["approaches"].items()},
+            "confidence_intervals": intervals,
+            "sample_size": sampled,
+            "exact": exact
+        }
+
+
+def _interval(attempts, successes, squared_weights, exact):
+    """
+    95% confidence interval for an estimated success rate
+
+    Uses the Wilson score interval with the Kish effective sample size, which
+    accounts for strata being sampled at different rates. When every stratum
+    was small enough to be kept in full the estimate is exact.
+    """
+    rate = successes / attempts
+    if exact:
+        return [round(rate, 3), round(rate, 3)]
+
+    n = attempts * attempts / squared_weights
+    z2 = CONFIDENCE_Z * CONFIDENCE_Z
+    center = (rate + z2 / (2 * n)) / (1 + z2 / n)
+    margin = CONFIDENCE_Z * math.sqrt(rate * (1 - rate) / n + z2 / (4 * n * n)) / (1 + z2 / n)
+    return [round(max(0.0, center - margin), 3), round(min(1.0, center + margin), 3)]
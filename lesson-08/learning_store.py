@@ -0,0 +1,582 @@
+"""
+Experience storage for the learning-agent server
+
+Rewriting and re-parsing one pretty-printed JSON file on every call gets
+slow once the history is large. This store splits the data in two:
+
+- learning_data.snapshot: a compact binary snapshot. Every distinct string
+  is stored once in a string table, and each experience field is a packed
+  column of string ids, so the whole file loads with a single read.
+- learning_data.wal: an append-only write-ahead log holding one compact
+  JSON line per experience recorded since the last snapshot.
+
+checkpoint() folds the log into a fresh snapshot; BackgroundCheckpoint does
+the same in steps, for a server that must keep answering meanwhile. The
+original JSON format is still available through import_json() and
+export_json(). Writers hold a cross-process file lock, so several server
+processes can share the files.
+
+A read replica has no files of its own: ReplicaStore serves the history a
+LogReplica (mcp_shared/replication.py) has copied from the primary.
+"""
+
+import gc
+import json
+import os
+import struct
+import threading
+import time
+from array import array
+from itertools import accumulate
+from pathlib import Path
+
+from mcp_shared.file_lock import FileLock
+
+SNAPSHOT_MAGIC = b"LRNSNAP1"
+
+# magic, checkpoint number, record count, string count, string blob length
+SNAPSHOT_HEADER = struct.Struct("<8sQQQQ")
+
+# Fields stored as string-id columns, in file order. Anything else found on
+# a record (or a field with an unexpected type) is kept as JSON in the
+# "extra" column, so every record round-trips exactly.
+STRING_FIELDS = ("timestamp", "agent_id", "task_type", "context", "approach", "outcome")
+COLUMN_FIELDS = STRING_FIELDS + ("success", "metrics")
+MISSING_KEY = "__missing__"
+
+# Fold the write-ahead log into the snapshot after this many records
+CHECKPOINT_EVERY = 10_000
+
+
+class LearningStore:
+    """
+    Snapshot-plus-log storage for recorded experiences.
+
+    load() keeps the experiences in memory and only re-reads what changed
+    on disk: records appended to the log by another process are tailed,
+    anything else triggers a full reload. Tailed records are appended to
+    the same list; only a full reload (or replace_all()) returns a new one,
+    so callers can tell the two apart. Returned lists must be treated as
+    read-only.
+    """
+
+    def __init__(self, directory, name="learning_data", checkpoint_every=CHECKPOINT_EVERY):
+        directory = Path(directory)
+        self.snapshot_path = directory / f"{name}.snapshot"
+        self.wal_path = directory / f"{name}.wal"
+        self.legacy_json_path = directory / f"{name}.json"
+        self.checkpoint_every = checkpoint_every
+
+        # Held while writing, so several server processes can share the files
+        self.lock = FileLock(self.wal_path)
+
+        # Held while the in-memory state changes, so load() on the event loop
+        # and append_many() in a worker thread never update it at once
+        self._state_lock = threading.RLock()
+
+        self._experiences = None
+        self._checkpoint = 0
+        self._wal_records = 0
+        self._wal_offset = 0
+        self._snapshot_signature = None
+        self._wal_signature = None
+        self._migrate_legacy_json = False
+
+        # Bumped whenever load() picks up data this store did not write
+        self.disk_changes = 0
+
+        # I/O totals, reported by the server_stats tool
+        self.bytes_read = 0
+        self.bytes_written = 0
+        self.parse_seconds = 0.0
+
+    @property
+    def wal_records(self):
+        """Number of experiences in the log that are not in the snapshot yet"""
+        return self._wal_records
+
+    @property
+    def loaded_experiences(self):
+        """The experiences as last loaded, without checking the files (None before the first load)"""
+        return self._experiences
+
+    def load(self):
+        """Return all experiences, refreshing from disk only if the files changed"""
+        with self._state_lock:
+            return self._load()
+
+    def _load(self):
+        snapshot_signature = _signature(self.snapshot_path)
+        wal_signature = _signature(self.wal_path)
+
+        if self._experiences is not None and snapshot_signature == self._snapshot_signature:
+            if wal_signature == self._wal_signature:
+                return self._experiences
+            if (wal_signature is not None and self._wal_signature is not None
+                    and wal_signature[0] == self._wal_signature[0]
+                    and wal_signature[1] > self._wal_offset):
+                # Same log file, only longer: read just the new records
+                self._read_wal(self._wal_offset)
+                self._wal_signature = _signature(self.wal_path)
+                self.disk_changes += 1
+                return self._experiences
+
+        self._reload()
+        self.disk_changes += 1
+        return self._experiences
+
+    def append(self, experience):
+        """Append one experience to the log and return the new total count"""
+        with self.lock:
+            return self.append_many([experience])[0]
+
+    def append_many(self, experiences):
+        """
+        Append a batch of experiences with a single write
+
+        The caller must hold `self.lock`. Returns, for each experience, the
+        total count right after it was added. Safe to call from a worker
+        thread while other threads call load().
+        """
+        data = "".join(
+            json.dumps(exp, ensure_ascii=False, separators=(",", ":")) + "\n"
+            for exp in experiences
+        ).encode("utf-8")
+
+        with self._state_lock:
+            # Pick up whatever other processes appended before writing after it
+            stored = self._load()
+            if self._migrate_legacy_json:
+                # The old JSON file's experiences go into a snapshot before
+                # anything is logged after them (once, on the first write)
+                self._write_checkpoint(stored)
+            if self._wal_signature is None:
+                self._start_wal()
+
+            with open(self.wal_path, "ab") as f:
+                f.write(data)
+            self.bytes_written += len(data)
+
+            first_total = len(stored) + 1
+            stored.extend(experiences)
+            self._wal_records += len(experiences)
+            self._wal_offset += len(data)
+            self._wal_signature = _signature(self.wal_path)
+            checkpoint_due = self._wal_records >= self.checkpoint_every
+
+        # Encoded outside the state lock: nothing else can write while
+        # `self.lock` is held, so load() keeps answering from memory meanwhile
+        if checkpoint_due:
+            self._write_checkpoint(stored)
+        return [first_total + i for i in range(len(experiences))]
+
+    def replace_all(self, experiences):
+        """Replace the stored history with `experiences` and checkpoint it"""
+        with self.lock:
+            with self._state_lock:
+                self._experiences = list(experiences)
+            self._write_checkpoint(self._experiences)
+
+    def checkpoint(self):
+        """Write a new snapshot containing every experience and empty the log"""
+        with self.lock:
+            self._write_checkpoint(self.load())
+
+    def _write_checkpoint(self, experiences):
+        """Snapshot `experiences` and start a new, empty log"""
+        checkpoint = self._checkpoint + 1
+
+        # A temporary name of this process's own, so no other process can
+        # be writing the same file at the same time
+        temp_path = self.snapshot_path.with_name(f".{self.snapshot_path.name}.{os.getpid()}.tmp")
+        data = _encode_snapshot(experiences, checkpoint)
+        _write_file_durably(temp_path, data)
+        self._install_snapshot(temp_path, len(data), checkpoint)
+
+    def _install_snapshot(self, temp_path, size, checkpoint):
+        """Replace the snapshot with a fully written temporary file"""
+        with self._state_lock:
+            os.replace(temp_path, self.snapshot_path)
+            self.bytes_written += size
+
+            # The new log names the checkpoint it continues from, so a crash
+            # between these two steps cannot replay already-folded records
+            self._checkpoint = checkpoint
+            self._start_wal()
+            self._wal_records = 0
+            self._migrate_legacy_json = False
+            self._snapshot_signature = _signature(self.snapshot_path)
+
+    def import_json(self, path):
+        """Replace the stored history with the experiences in a JSON file"""
+        with open(path, "r", encoding="utf-8") as f:
+            self.replace_all(json.load(f))
+        return len(self._experiences)
+
+    def export_json(self, path):
+        """Write the full history to a JSON file in the original format"""
+        experiences = self.load()
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(experiences, f, indent=2)
+        return len(experiences)
+
+    def _reload(self):
+        """Load the snapshot and replay the log from scratch"""
+        self._experiences = []
+        self._checkpoint = 0
+        self._migrate_legacy_json = False
+        self._snapshot_signature = _signature(self.snapshot_path)
+
+        if self._snapshot_signature is not None:
+            data = self.snapshot_path.read_bytes()
+            self.bytes_read += len(data)
+            started = time.perf_counter()
+            self._experiences, self._checkpoint = _decode_snapshot(data)
+            self.parse_seconds += time.perf_counter() - started
+        elif not self.wal_path.exists() and self.legacy_json_path.exists():
+            # First run after upgrading: serve the old JSON file as it is.
+            # Writing the snapshot needs `self.lock`, which this thread may
+            # or may not hold, so the first write (or checkpoint) migrates it
+            try:
+                with open(self.legacy_json_path, "r") as f:
+                    self._experiences = json.load(f)
+            except (json.JSONDecodeError, IOError):
+                self._experiences = []
+            self._migrate_legacy_json = bool(self._experiences)
+            # None of them is in a snapshot yet
+            self._wal_records = len(self._experiences)
+            self._wal_offset = 0
+            self._wal_signature = None
+            return
+
+        self._wal_records = 0
+        self._wal_offset = 0
+        self._wal_signature = _signature(self.wal_path)
+        if self._wal_signature is not None:
+            self._read_wal(0)
+            self._wal_signature = _signature(self.wal_path)
+
+    def _read_wal(self, offset):
+        """Apply complete log lines from `offset` onwards"""
+        with open(self.wal_path, "rb") as f:
+            f.seek(offset)
+            data = f.read()
+        self.bytes_read += len(data)
+        started = time.perf_counter()
+
+        # A crash mid-append can leave a partial last line; it is skipped
+        # until (unless) the rest of it arrives
+        end = data.rfind(b"\n") + 1
+        lines = data[:end].splitlines()
+
+        if offset == 0 and lines:
+            header = json.loads(lines[0])
+            lines = lines[1:]
+            if header.get("checkpoint", 0) < self._checkpoint:
+                # Log from before the current snapshot: already folded in
+                lines = []
+
+        for line in lines:
+            if line.strip():
+                self._experiences.append(json.loads(line))
+                self._wal_records += 1
+        self._wal_offset = offset + end
+        self.parse_seconds += time.perf_counter() - started
+
+    def _start_wal(self):
+        """Atomically replace the log with an empty one for the current checkpoint"""
+        header = json.dumps({"checkpoint": self._checkpoint}) + "\n"
+        temp_path = self.wal_path.with_suffix(".wal.tmp")
+        with open(temp_path, "w", encoding="utf-8") as f:
+            f.write(header)
+        os.replace(temp_path, self.wal_path)
+        self._wal_offset = len(header.encode("utf-8"))
+        self.bytes_written += self._wal_offset
+        self._wal_signature = _signature(self.wal_path)
+
+
+class BackgroundCheckpoint:
+    """
+    A checkpoint split into steps, so a running server neither blocks its
+    event loop nor holds the lock while the bulk of the snapshot is encoded:
+
+    1. prepare(), in a worker thread without the lock: encode every
+       experience loaded so far. Returns False if the log is already empty.
+    2. Take `store.lock` and call store.load() on the event loop.
+    3. write(), in a worker thread with the lock held: add the experiences
+       recorded since step 1 and write the temporary snapshot file. Returns
+       False if the history was replaced meanwhile; start again later.
+    4. install(), on the event loop with the lock still held: swap the new
+       snapshot in and start an empty log.
+    """
+
+    def __init__(self, store):
+        self.store = store
+        self.experiences = None
+        self.checkpoint = None
+        self.temp_path = store.snapshot_path.with_suffix(".snapshot.next")
+        self.size = 0
+        self._encoder = _SnapshotEncoder()
+
+    @property
+    def count(self):
+        """Experiences in the new snapshot"""
+        return self._encoder.count
+
+    def prepare(self):
+        store = self.store
+        self.experiences = store.loaded_experiences
+        self.checkpoint = store._checkpoint + 1
+        if self.experiences is None or not store.wal_records:
+            return False
+        # Experiences appended while this runs are picked up by write()
+        self._encoder.add(self.experiences[:])
+        return True
+
+    def write(self):
+        store = self.store
+        if store.loaded_experiences is not self.experiences or store._checkpoint != self.checkpoint - 1:
+            return False
+        self._encoder.add(self.experiences[self._encoder.count:])
+        data = self._encoder.encode(self.checkpoint)
+        _write_file_durably(self.temp_path, data)
+        self.size = len(data)
+        return True
+
+    def install(self):
+        self.store._install_snapshot(self.temp_path, self.size, self.checkpoint)
+
+
+class ReplicaStore:
+    """
+    Read-only stand-in for LearningStore on a read replica.
+
+    The history is the list the LogReplica keeps up to date from the
+    primary's shipped log: it grows in place as segments are applied, and
+    is replaced by a new list (counted in disk_changes, like a reload) when
+    the replica starts again from a base segment.
+    """
+
+    def __init__(self, replica):
+        self.replica = replica
+        self.bytes_written = 0
+        self.parse_seconds = 0.0
+
+    @property
+    def bytes_read(self):
+        return self.replica.bytes_read
+
+    @property
+    def disk_changes(self):
+        return self.replica.resets
+
+    @property
+    def wal_records(self):
+        # Nothing to checkpoint: the primary owns the files
+        return 0
+
+    @property
+    def loaded_experiences(self):
+        return self.replica.records
+
+    def load(self):
+        return self.replica.records
+
+
+def _signature(path):
+    """Cheap change detector for a file: (inode, size, mtime), or None if missing"""
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (stat.st_ino, stat.st_size, stat.st_mtime_ns)
+
+
+def _write_file_durably(path, data):
+    """Write `data` to `path` and wait until it is on disk"""
+    with open(path, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def _encode_snapshot(experiences, checkpoint):
+    """Pack experiences into the binary snapshot format"""
+    encoder = _SnapshotEncoder()
+    encoder.add(experiences)
+    return encoder.encode(checkpoint)
+
+
+class _SnapshotEncoder:
+    """
+    Builds a snapshot a batch of experiences at a time. Adding records is
+    the slow part; encode() only joins the finished columns, so records
+    appended after most of the work was done are cheap to fold in.
+    """
+
+    def __init__(self):
+        # Dicts keep insertion order, so each new string's id is the table size
+        self.string_ids = {"": 0}
+        self.columns = {field: array("I") for field in STRING_FIELDS + ("metrics", "extra")}
+        self.success = bytearray()
+        self.count = 0
+
+    def add(self, experiences):
+        string_ids = self.string_ids
+        intern = string_ids.setdefault
+        columns = self.columns
+        string_columns = [(field, columns[field].append) for field in STRING_FIELDS]
+        append_metrics = columns["metrics"].append
+        append_extra = columns["extra"].append
+        success = self.success
+
+        for exp in experiences:
+            extra = None
+            for field, append in string_columns:
+                value = exp.get(field)
+                if type(value) is str:
+                    append(intern(value, len(string_ids)))
+                else:
+                    append(0)
+                    extra = _extra_field(extra, exp, field)
+
+            value = exp.get("success")
+            success.append(1 if value is True else 0)
+            if type(value) is not bool:
+                extra = _extra_field(extra, exp, "success")
+
+            if "metrics" in exp:
+                metrics = exp["metrics"]
+                if type(metrics) is dict and not metrics:
+                    append_metrics(intern("{}", len(string_ids)))
+                else:
+                    append_metrics(intern(json.dumps(metrics, separators=(",", ":")), len(string_ids)))
+            else:
+                append_metrics(0)
+                extra = _extra_field(extra, exp, "metrics")
+
+            if len(exp) > len(COLUMN_FIELDS) or extra is not None:
+                for key, value in exp.items():
+                    if key not in COLUMN_FIELDS:
+                        extra = _extra_field(extra, exp, key)
+            append_extra(intern(json.dumps(extra, separators=(",", ":")), len(string_ids)) if extra else 0)
+            self.count += 1
+
+    def encode(self, checkpoint):
+        strings = list(self.string_ids)
+
+        # Strings are NUL-separated so they can be decoded in one go; the byte
+        # offsets are a fallback for the rare string that itself contains NUL
+        encoded = [s.encode("utf-8") for s in strings]
+        offsets = array("Q", accumulate((len(value) + 1 for value in encoded), initial=0))
+        blob = b"\0".join(encoded)
+
+        parts = [
+            SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, checkpoint, self.count, len(strings), len(blob)),
+            _to_little_endian(offsets).tobytes(),
+            blob,
+        ]
+        for field in STRING_FIELDS + ("metrics", "extra"):
+            # Copied before any byte swap, so the encoder can still be added to
+            parts.append(_to_little_endian(self.columns[field][:]).tobytes())
+        parts.append(bytes(self.success))
+        return b"".join(parts)
+
+
+def _extra_field(extra, exp, field):
+    """Record a field that does not fit its column in the record's extra JSON"""
+    if extra is None:
+        extra = {}
+    if field in exp:
+        extra[field] = exp[field]
+    else:
+        extra.setdefault(MISSING_KEY, []).append(field)
+    return extra
+
+
+def _decode_snapshot(data):
+    """Unpack a binary snapshot into (experiences, checkpoint number)"""
+    magic, checkpoint, count, string_count, blob_length = SNAPSHOT_HEADER.unpack_from(data, 0)
+    if magic != SNAPSHOT_MAGIC:
+        raise ValueError("Not a learning data snapshot")
+
+    view = memoryview(data)
+    position = SNAPSHOT_HEADER.size
+
+    offsets = _read_array("Q", view, position, string_count + 1)
+    position += offsets.itemsize * len(offsets)
+    blob = bytes(view[position:position + blob_length])
+    position += blob_length
+
+    strings = blob.decode("utf-8").split("\0") if string_count else []
+    if len(strings) != string_count:
+        strings = [
+            blob[offsets[i]:offsets[i + 1] - 1].decode("utf-8")
+            for i in range(string_count)
+        ]
+
+    columns = []
+    for _ in STRING_FIELDS + ("metrics", "extra"):
+        column = _read_array("I", view, position, count)
+        position += column.itemsize * count
+        columns.append(column)
+    success = bytes(view[position:position + count])
+
+    # Decode each distinct metrics value once, and give every record its
+    # own copy of it, so changing one record's metrics never changes another's
+    timestamps, agents, task_types, contexts, approaches, outcomes, metrics, extras = columns
+    metrics_values = {
+        string_id: json.loads(strings[string_id]) if strings[string_id] else {}
+        for string_id in set(metrics)
+    }
+
+    # Building a million small dicts would otherwise trigger many pointless
+    # cyclic garbage collections, which more than doubles the load time
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        experiences = [
+            {
+                "timestamp": strings[t],
+                "agent_id": strings[a],
+                "task_type": strings[k],
+                "context": strings[c],
+                "approach": strings[p],
+                "outcome": strings[o],
+                "success": s == 1,
+                "metrics": metrics_values[m].copy(),
+            }
+            for t, a, k, c, p, o, s, m in zip(
+                timestamps, agents, task_types, contexts, approaches, outcomes, success, metrics
+            )
+        ]
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+
+    # Restore unusual fields (rare, so handled in a second pass)
+    if any(extras):
+        for index, extra_id in enumerate(extras):
+            if extra_id:
+                record = experiences[index]
+                for key, value in json.loads(strings[extra_id]).items():
+                    if key == MISSING_KEY:
+                        for field in value:
+                            del record[field]
+                    else:
+                        record[key] = value
+
+    return experiences, checkpoint
+
+
+def _read_array(typecode, view, position, count):
+    values = array(typecode)
+    values.frombytes(view[position:position + values.itemsize * count])
+    return _to_little_endian(values)
+
+
+def _to_little_endian(values):
+    """Snapshots are little-endian; swap in place on big-endian hosts"""
+    if struct.pack("=I", 1) != struct.pack("<I", 1):
+        values.byteswap()
+    return values
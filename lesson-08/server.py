@@ -8,50 +8,254 @@ Tools provided:
 1. record_experience - Track outcomes from agent actions
 2. get_learning_insights - Retrieve patterns and recommendations
 3. analyze_learning_patterns - Deep analysis of learning trends
+4. server_stats - Call latencies, storage I/O and cache hit rates
+5. maintenance_status - Background checkpoint and summary rebuild jobs
+6. replication_status - Log shipping to read replicas (with --ship-log or --replica-of)
 
 Lesson 8 of the MCP Masterclass
 """
 
+import time
+
+# Taken before the other imports, so the startup timing includes them
+STARTED = time.perf_counter()
+
+import argparse
+import asyncio
 import json
 import os
+import sys
+from concurrent.futures.process import BrokenProcessPool
 from datetime import datetime, timedelta
+from pathlib import Path
 from typing import Optional
 from collections import defaultdict
+from contextlib import nullcontext
 
 from mcp.server import Server
 from mcp.server.stdio import stdio_server
 from mcp.types import Tool, TextContent
 
-# Storage file for experiences
-LEARNING_DATA_FILE = "learning_data.json"
+# Shared helpers live in the repository's mcp_shared folder
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from mcp_shared import profiling
+from mcp_shared.group_commit import GroupCommitter
+from mcp_shared.maintenance import MaintenanceScheduler
+from mcp_shared.output import (
+    NOTE_RESERVE_CHARS,
+    OutputBuilder,
+    output_schema_properties,
+    read_output_arguments,
+    write_json,
+    write_omitted_note,
+    write_table,
+)
+from mcp_shared.profiling import profile_tool_calls
+from mcp_shared.progress import ProgressReporter
+from mcp_shared.replication import LogReplica, LogShipper, add_replication_arguments
+from mcp_shared.scheduler import SchedulerError, ToolScheduler
+from mcp_shared.startup import StartupTimer
+from mcp_shared.tool_stats import ServerStats
+from mcp_shared.transport import add_transport_arguments, serve_http
+
+from analysis_workers import AnalysisWorkers
+from insight_cache import InsightCache
+from learning_store import BackgroundCheckpoint, LearningStore, ReplicaStore
+from learning_stats import (
+    AnalysisColumns,
+    OnlineSuccessTracker,
+    SLIDING_WINDOW_SIZES,
+    StratifiedReservoir,
+    aggregate_columns,
+    aggregate_experiences,
+    half_life_days_setting,
+    insights_from_counts,
+    merge_aggregates,
+)
+
+# How long starting up took (imports, setup, handshake, first history load)
+startup = StartupTimer("learning-agent", STARTED)
+
+# Storage for experiences: a compact binary snapshot plus an append-only log,
+# both kept next to this file unless the MCP_LEARNING_DIR environment variable
+# names another folder. An existing learning_data.json is read as it is and
+# converted by the first write, and --export-json writes one back out.
+DATA_DIR_ENV = "MCP_LEARNING_DIR"
+DATA_DIR = Path(os.environ.get(DATA_DIR_ENV) or Path(__file__).parent)
+store = LearningStore(DATA_DIR)
+
+# Log shipping to read replicas (see mcp_shared/replication.py). A primary
+# started with --ship-log publishes every recorded batch as a log segment; a
+# replica started with --replica-of swaps `store` for a ReplicaStore that
+# serves the history it follows, and refuses record_experience. Both stay
+# None otherwise.
+log_shipper = None
+replica = None
+
+def replication_role():
+    """The LogShipper or LogReplica this server runs with, or None"""
+    return replica if replica is not None else log_shipper
+
+def catch_up_summaries():
+    """
+    Feed the experiences loaded since the last call to the running
+    summaries (if they were built yet)
+
+    Experiences are appended to the loaded history by a worker thread (see
+    commit_experiences), and the summaries are only touched here, on the
+    event loop. Counting how far they got, rather than observing each
+    batch, means a summary never misses or double-counts an experience,
+    whichever of the two happens first.
+
+    Records another process appended are tailed onto the same list, so
+    they are fed in here like our own. Only a full reload (or a replica
+    starting again from a base) replaces the list; then the summaries are
+    dropped, to be rebuilt in the background or on their next use.
+    """
+    global summarized_count, summarized_experiences, success_tracker, reservoir
+    experiences = store.loaded_experiences
+    if experiences is None:
+        return
+    if experiences is not summarized_experiences:
+        if summarized_experiences is not None:
+            success_tracker = None
+            reservoir = None
+        summarized_experiences = experiences
+        summarized_count = 0
+    stop = len(experiences)
+    for experience in experiences[summarized_count:stop]:
+        if success_tracker is not None:
+            success_tracker.observe(experience)
+        if reservoir is not None:
+            reservoir.observe(experience)
+    summarized_count = stop
+
+def commit_experiences(experiences):
+    """
+    Append a batch of experiences to storage. Runs in a worker thread with
+    the lock held, so a checkpoint or a large log doesn't stall other calls.
+    """
+    totals = store.append_many(experiences)
+    # Read replicas pick the new experiences up from the shipped log
+    if log_shipper is not None:
+        log_shipper.ship(store.loaded_experiences, len(experiences))
+    return totals
+
+def committed_experiences(experiences, totals):
+    """Back on the event loop after a batch was appended: update the summaries"""
+    catch_up_summaries()
+
+def apply_replicated_experiences(experiences):
+    """
+    On a read replica, experiences applied from the primary's log update
+    the summaries and cached insights the way record_experience would
+    """
+    catch_up_summaries()
+    for experience in experiences:
+        insight_cache.invalidate(experience.get("agent_id"), experience.get("task_type"))
+
+def reset_replicated_experiences(experiences):
+    """
+    On a read replica, a base segment replaces the whole history (the
+    primary imported a file, or the replica fell behind a pruned log), so
+    the summaries and cached insights built on the old one are dropped
+    """
+    insight_cache.clear()
+    catch_up_summaries()
+
+# Concurrent record_experience calls are queued and appended together, one
+# locked write per batch instead of one per experience
+experience_writer = GroupCommitter(store.lock, commit_experiences, committed_experiences)
+
+# Histories at least this large are analyzed in parallel worker processes.
+# The workers are started by the first such analysis and kept until the
+# server stops (see analysis_workers.py); shards are sent to them as
+# compact columns, which are kept here between analyses.
+PARALLEL_ANALYSIS_THRESHOLD = 200_000
+MAX_ANALYSIS_WORKERS = 8
+analysis_workers = AnalysisWorkers(min(os.cpu_count() or 1, MAX_ANALYSIS_WORKERS))
+analysis_columns = None
+
+# Smaller histories are scanned in a thread a chunk at a time, reporting
+# progress (and the counts so far) between chunks; a cancelled analysis
+# stops after the current chunk. The first chunk is small so the first
+# partial result arrives quickly, and each later one is twice as big.
+FIRST_ANALYSIS_CHUNK = 10_000
+MAX_ANALYSIS_CHUNK = 160_000
+
+# History scans run off the event loop, so recording experiences and cached
+# insights stay fast while an analysis runs. Full analyses get their own
+# lane: one at a time, a few queued, and any more are turned away at once.
+scheduler = ToolScheduler()
+TOOL_TIMEOUT_SECONDS = 30
+ANALYSIS_TIMEOUT_SECONDS = 120
+
+# Decayed and sliding-window success rates, built from the stored history on
+# first use and then updated incrementally by record_experience. Outcomes
+# lose half their weight every HALF_LIFE_DAYS (set MCP_LEARNING_HALF_LIFE_DAYS
+# to change it).
+HALF_LIFE_DAYS = half_life_days_setting()
+success_tracker = None
+
+# Answers to repeated get_learning_insights calls, kept until a recorded
+# experience (or a change on disk) could alter them
+insight_cache = InsightCache()
+disk_changes_seen = None
+
+# Per-(agent, task type) random samples answering approximate analyses, also
+# built on first use and updated by record_experience
+reservoir = None
+
+# The loaded history the summaries above follow, and how many of its
+# experiences they have seen
+summarized_experiences = None
+summarized_count = 0
+
+def drop_analysis_columns():
+    global analysis_columns
+    analysis_columns = None
+
+def drop_reservoir():
+    global reservoir
+    reservoir = None
+
+# What this server holds in memory besides insight_cache, for the combined
+# server's cache budget (see mcp_shared/cache_budget.py): name -> (function
+# counting the entries held now, function dropping them). The loaded
+# history is the storage itself and can't be dropped; the analysis columns
+# and the samples are rebuilt from it when next needed.
+resident_entries = {
+    "history": (lambda: len(store.loaded_experiences or ()), None),
+    "analysis_columns": (lambda: len(analysis_columns or ()), drop_analysis_columns),
+    "reservoir": (lambda: reservoir.entry_count() if reservoir is not None else 0, drop_reservoir),
+}
 
 def load_experiences():
-    """Load all recorded experiences from storage"""
-    if not os.path.exists(LEARNING_DATA_FILE):
-        return []
-    
+    """Load all recorded experiences from storage (treat the list as read-only)"""
     try:
-        with open(LEARNING_DATA_FILE, 'r') as f:
-            return json.load(f)
-    except (json.JSONDecodeError, IOError):
+        with startup.first("store_load"):
+            return store.load()
+    except (ValueError, OSError):
         return []
 
-def save_experiences(experiences):
-    """Save experiences to storage"""
+async def append_experience(experience):
+    """Append one experience to storage; returns the new total or None on failure"""
     try:
-        with open(LEARNING_DATA_FILE, 'w') as f:
-            json.dump(experiences, f, indent=2)
-        return True
-    except IOError:
-        return False
-
-def calculate_success_rate(experiences):
-    """Calculate success rate from a list of experiences"""
-    if not experiences:
-        return 0.0
+        return await experience_writer.submit(experience)
+    except (ValueError, OSError):
+        return None
+
+def filter_and_identify_patterns(experiences, agent_id=None, task_type=None, min_confidence=0.7):
+    """Apply the agent and task type filters, then identify patterns"""
+    filtered = experiences
+    
+    if agent_id:
+        filtered = [e for e in filtered if e.get('agent_id') == agent_id]
+    
+    if task_type:
+        filtered = [e for e in filtered if e.get('task_type') == task_type]
     
-    successful = sum(1 for exp in experiences if exp.get('success', False))
-    return successful / len(experiences)
+    return identify_patterns(filtered, min_confidence)
 
 def identify_patterns(experiences, min_confidence=0.7):
     """
@@ -59,52 +263,317 @@ def identify_patterns(experiences, min_confidence=0.7):
     
     Returns insights about which approaches work and which don't
     """
-    if len(experiences) < 3:
-        return {
-            "insights": [],
-            "message": "Need at least 3 experiences to identify patterns"
-        }
-    
-    # Group by approach
-    approach_outcomes = defaultdict(list)
+    # Group by approach, counting [attempts, successes]
+    approach_counts = defaultdict(lambda: [0, 0])
     for exp in experiences:
-        approach = exp.get('approach', 'unknown')
-        approach_outcomes[approach].append(exp)
+        counts = approach_counts[exp.get('approach', 'unknown')]
+        counts[0] += 1
+        if exp.get('success', False):
+            counts[1] += 1
     
-    insights = []
+    return insights_from_counts(approach_counts, len(experiences), min_confidence)
+
+async def aggregate_learning_history(experiences, cutoff_date, agent_id=None, progress=None):
+    """
+    Count outcomes for analyze_learning_patterns
     
-    for approach, exps in approach_outcomes.items():
-        if len(exps) < 2:
-            continue  # Need multiple attempts to establish pattern
-        
-        success_rate = calculate_success_rate(exps)
-        confidence = min(1.0, len(exps) / 5)  # Confidence increases with more data
-        
-        if confidence >= min_confidence:
-            insight = {
-                "approach": approach,
-                "success_rate": round(success_rate, 2),
-                "attempts": len(exps),
-                "confidence": round(confidence, 2),
-                "recommendation": "use" if success_rate > 0.7 else "avoid"
-            }
-            insights.append(insight)
+    Small histories are counted in a worker thread. Very large ones are
+    split into contiguous time shards that are counted in parallel worker
+    processes. Either way the event loop stays free for other tool calls
+    while they run, and both go through the scheduler's analysis lane.
+    Progress is sent to `progress` (a ProgressReporter) as parts finish.
+    """
+    progress = progress or ProgressReporter(server)
+    await progress.report(0, f"Queued to scan {len(experiences):,} experiences", total=len(experiences), force=True)
     
-    # Sort by success rate
-    insights.sort(key=lambda x: x['success_rate'], reverse=True)
+    workers = analysis_workers.max_workers
+    if len(experiences) < PARALLEL_ANALYSIS_THRESHOLD or workers < 2:
+        return await scheduler.run_async(
+            aggregate_in_chunks, experiences, cutoff_date, agent_id, progress,
+            lane="analysis", timeout=ANALYSIS_TIMEOUT_SECONDS
+        )
+    
+    return await scheduler.run_async(
+        aggregate_in_workers, experiences, cutoff_date, agent_id, workers, progress,
+        lane="analysis", timeout=ANALYSIS_TIMEOUT_SECONDS
+    )
+
+async def aggregate_in_chunks(experiences, cutoff_date, agent_id, progress):
+    """Count outcomes in a worker thread, one growing chunk at a time"""
+    # Experiences recorded meanwhile are appended past `stop`, so the scan
+    # sees a fixed slice of the history
+    stop = len(experiences)
+    parts = []
+    start = 0
+    chunk = FIRST_ANALYSIS_CHUNK
+    while start < stop:
+        end = min(start + chunk, stop)
+        parts.append(await asyncio.to_thread(
+            profiling.profile_in_worker(aggregate_experiences), experiences, cutoff_date, agent_id, start, end
+        ))
+        await report_partial_aggregate(progress, parts, end, stop)
+        start = end
+        chunk = min(chunk * 2, MAX_ANALYSIS_CHUNK)
+    return merge_aggregates(parts)
+
+def get_analysis_columns(experiences):
+    """Return the analysis columns of `experiences`, starting over when the history was reloaded"""
+    global analysis_columns
+    if analysis_columns is None or analysis_columns.experiences is not experiences:
+        analysis_columns = AnalysisColumns(experiences)
+    return analysis_columns
+
+async def aggregate_in_workers(experiences, cutoff_date, agent_id, workers, progress):
+    """Count outcomes in contiguous shards, one worker process per shard"""
+    total = len(experiences)
+    columns = get_analysis_columns(experiences)
+    # Only the experiences added since the last analysis are converted
+    await asyncio.to_thread(profiling.profile_in_worker(columns.catch_up))
+    
+    shard_size = -(-total // workers)
+    bounds = [
+        (start, min(start + shard_size, total))
+        for start in range(0, total, shard_size)
+    ]
+    
+    pool = analysis_workers.pool()
+    loop = asyncio.get_running_loop()
+    futures = [
+        loop.run_in_executor(pool, aggregate_columns, columns.shard(start, stop), cutoff_date, agent_id)
+        for start, stop in bounds
+    ]
+    try:
+        # Report each shard as it finishes; merge in shard order at the end
+        for finished in asyncio.as_completed(futures):
+            await finished
+            done = [(future.result(), stop - start) for future, (start, stop) in zip(futures, bounds) if future.done()]
+            await report_partial_aggregate(
+                progress, [part for part, _ in done], sum(size for _, size in done), total
+            )
+        parts = [future.result() for future in futures]
+    except BrokenProcessPool:
+        # A worker died (killed, out of memory); the next analysis starts new ones
+        await asyncio.to_thread(analysis_workers.shutdown)
+        raise
+    finally:
+        # Shards still queued when the analysis is cancelled or times out
+        for future in futures:
+            future.cancel()
+    
+    analysis_workers.shards_analyzed += len(bounds)
+    return merge_aggregates(parts)
+
+async def report_partial_aggregate(progress, parts, scanned, total):
+    """Send the outcome counts over the experiences scanned so far"""
+    matched = sum(part["total"] for part in parts)
+    message = f"Scanned {scanned:,} of {total:,} experiences: {matched:,} in range"
+    if matched:
+        successes = sum(part["successes"] for part in parts)
+        message += f", {successes / matched:.0%} successful so far"
+    await progress.report(scanned, message, force=len(parts) == 1 or scanned >= total)
+
+def get_success_tracker():
+    """Return the online success tracker, replaying stored history on first use"""
+    global success_tracker
+    catch_up_summaries()
+    if success_tracker is None:
+        success_tracker = OnlineSuccessTracker.from_experiences(
+            summarized_experiences[:summarized_count], half_life_days=HALF_LIFE_DAYS
+        )
+    return success_tracker
+
+def sync_with_disk():
+    """
+    Pick up experiences written by other processes
+    
+    Cached insights are only invalidated for experiences recorded through
+    this process, so they are all dropped when the stored history changed
+    underneath them. The running summaries read the new experiences
+    instead (see catch_up_summaries).
+    """
+    global disk_changes_seen
+    load_experiences()
+    if store.disk_changes != disk_changes_seen:
+        insight_cache.clear()
+        disk_changes_seen = store.disk_changes
+    catch_up_summaries()
+
+def get_reservoir():
+    """Return the stratified samples, replaying stored history on first use"""
+    global reservoir
+    catch_up_summaries()
+    if reservoir is None:
+        reservoir = StratifiedReservoir.from_experiences(summarized_experiences[:summarized_count])
+    return reservoir
+
+def render_result(result, arguments, list_key, summarize):
+    """
+    Write a tool's result dictionary in the format and size limit the
+    caller asked for (see mcp_shared/output.py)
     
-    return {
-        "insights": insights,
-        "total_experiences": len(experiences)
-    }
+    The default "text" format is the indented JSON this server has always
+    returned. Under a size limit the entries of result[list_key] are cut
+    short, and summarize(result) yields the lines of the summary format.
+    """
+    output_format, max_chars = read_output_arguments(arguments)
+    builder = OutputBuilder(max_chars)
+    if output_format == "table":
+        write_table(builder, result)
+    elif output_format == "summary":
+        lines = summarize(result)
+        builder.write(next(lines))
+        for line in lines:
+            if not builder.add_item(line, NOTE_RESERVE_CHARS):
+                builder.omit(sum(1 for _ in lines))
+                break
+        write_omitted_note(builder, "more lines")
+    else:
+        write_json(builder, result, list_key, indent=2 if output_format == "text" else None)
+    return builder.getvalue()
+
+def summarize_insights(result):
+    """Summary lines for get_learning_insights, best approaches first"""
+    if result["status"] != "success":
+        yield f"{result['message']} ({result['total_experiences_analyzed']} experiences). {result['suggestion']}\n"
+        return
+    yield (
+        f"{result['patterns_found']} patterns in {result['total_experiences_analyzed']} experiences "
+        f"({result['weighting']} weighting):\n"
+    )
+    for insight in result["insights"]:
+        yield (
+            f"- {insight['recommendation']} '{insight['approach']}': {insight['success_rate']:.0%} success, "
+            f"{insight['attempts']} attempts, confidence {insight['confidence']}\n"
+        )
+
+def summarize_analysis(result):
+    """Summary lines for analyze_learning_patterns"""
+    if result["status"] != "success":
+        yield f"{result['message']}\n"
+        return
+    estimate = " (estimated)" if result.get("approximate") else ""
+    yield (
+        f"{result['total_experiences']} experiences in the last {result['time_range_days']} days, "
+        f"{result['overall_success_rate']:.0%} successful{estimate}\n"
+    )
+    for label, key in (("Best", "best_approaches"), ("Worst", "worst_approaches")):
+        if result[key]:
+            approaches = ", ".join(f"'{p['approach']}' ({p['success_rate']:.0%})" for p in result[key])
+            yield f"{label}: {approaches}\n"
+    for task_type, task_stats in result["task_type_breakdown"].items():
+        yield f"- {task_type}: {task_stats['success_rate']:.0%} of {task_stats['attempts']} attempts\n"
 
 # Initialize MCP server
 server = Server("learning-agent")
 
+# Call counts and latencies, plus the store's I/O totals and the insight
+# cache's hit rate, reported by the server_stats tool
+stats = ServerStats("learning-agent")
+stats.watch_counters(lambda: {
+    "bytes_read": store.bytes_read,
+    "bytes_written": store.bytes_written,
+    "parse_seconds": store.parse_seconds,
+})
+stats.watch_cache("insight_cache", lambda: (insight_cache.hits, insight_cache.misses))
+stats.watch_counters(scheduler.counters)
+stats.watch_counters(analysis_workers.counters)
+stats.watch_counters(startup.counters)
+
+# Upkeep done in the background while no tool call is running, instead of
+# inside record_experience or the first insight call: folding the log into
+# the snapshot well before CHECKPOINT_EVERY forces it, and rebuilding the
+# running summaries after they were reset. Job history is kept next to the data.
+IDLE_CHECKPOINT_RECORDS = 1_000
+maintenance = MaintenanceScheduler(stats, DATA_DIR / "learning_maintenance.json")
+stats.watch_counters(maintenance.counters)
+
+async def checkpoint_in_background():
+    """Checkpoint without blocking the event loop (see BackgroundCheckpoint)"""
+    checkpoint = BackgroundCheckpoint(store)
+    if not await asyncio.to_thread(checkpoint.prepare):
+        return "log already empty"
+    await store.lock.acquire_async()
+    try:
+        load_experiences()
+        if not await asyncio.to_thread(checkpoint.write):
+            return "history was replaced while encoding; will retry"
+        checkpoint.install()
+    finally:
+        store.lock.release()
+    return f"checkpointed {checkpoint.count} experiences"
+
+def summaries_missing():
+    return bool(store.loaded_experiences) and (success_tracker is None or reservoir is None)
+
+def build_summaries(experiences):
+    return (
+        OnlineSuccessTracker.from_experiences(experiences, half_life_days=HALF_LIFE_DAYS),
+        StratifiedReservoir.from_experiences(experiences),
+    )
+
+async def rebuild_summaries():
+    """Replay the loaded history into fresh summaries in a worker thread"""
+    global success_tracker, reservoir
+    experiences = store.loaded_experiences
+    count = len(experiences)
+    tracker, samples = await asyncio.to_thread(build_summaries, experiences[:count])
+    
+    # A full reload would drop these summaries anyway: try again later
+    if store.loaded_experiences is not experiences:
+        return "history changed while rebuilding; will retry"
+    
+    # Catch up with experiences recorded meanwhile (catch_up_summaries()
+    # skipped them for the summaries that didn't exist yet)
+    catch_up_summaries()
+    for experience in experiences[count:summarized_count]:
+        tracker.observe(experience)
+        samples.observe(experience)
+    if success_tracker is None:
+        success_tracker = tracker
+    if reservoir is None:
+        reservoir = samples
+    return f"rebuilt summaries of {len(experiences)} experiences"
+
+maintenance.add_job(
+    "checkpoint", checkpoint_in_background,
+    due=lambda: store.wal_records >= IDLE_CHECKPOINT_RECORDS,
+    description=f"Fold the write-ahead log into the snapshot once it holds {IDLE_CHECKPOINT_RECORDS}+ records",
+    min_interval=10,
+)
+async def warm_up():
+    """Load the stored history and build the summaries before the first call needs them"""
+    sync_with_disk()
+    if summaries_missing():
+        await rebuild_summaries()
+
+maintenance.add_job(
+    "rebuild_summaries", rebuild_summaries,
+    due=summaries_missing,
+    description="Rebuild the success-rate summaries and samples used by weighted insights and approximate analyses",
+    min_interval=30,
+)
+
+async def maintain_shipped_log():
+    """Ship the history as a base segment (after startup, or to compact the log)"""
+    await store.lock.acquire_async()
+    try:
+        experiences = load_experiences()
+        await asyncio.to_thread(log_shipper.maintain, experiences)
+    finally:
+        store.lock.release()
+    return f"shipped a base of {len(experiences)} experiences"
+
+maintenance.add_job(
+    "maintain_shipped_log", maintain_shipped_log,
+    due=lambda: log_shipper is not None and log_shipper.maintenance_due(),
+    description="Ship the history as a base segment after startup, and compact the shipped log",
+    min_interval=5,
+)
+
 @server.list_tools()
 async def list_tools() -> list[Tool]:
     """List all available tools"""
-    return [
+    tools = [
         Tool(
             name="record_experience",
             description=(
@@ -171,7 +640,22 @@ async def list_tools() -> list[Tool]:
                         "description": "Minimum pattern confidence (0-1), defaults to 0.7",
                         "minimum": 0,
                         "maximum": 1
-                    }
+                    },
+                    "weighting": {
+                        "type": "string",
+                        "enum": ["all", "decayed", "window"],
+                        "description": (
+                            "How to weight past outcomes: 'all' counts the full history equally (default), "
+                            f"'decayed' favours recent outcomes using a {HALF_LIFE_DAYS:g}-day half-life, "
+                            "'window' only counts the most recent outcomes of each approach"
+                        )
+                    },
+                    "window_size": {
+                        "type": "integer",
+                        "enum": list(SLIDING_WINDOW_SIZES),
+                        "description": f"Outcomes per approach counted when weighting is 'window', defaults to {SLIDING_WINDOW_SIZES[0]}"
+                    },
+                    **output_schema_properties()
                 }
             }
         ),
@@ -194,19 +678,41 @@ async def list_tools() -> list[Tool]:
                         "description": "Number of days to look back, defaults to 30",
                         "minimum": 1,
                         "maximum": 365
-                    }
+                    },
+                    "approximate": {
+                        "type": "boolean",
+                        "description": (
+                            "Estimate from a random sample of the history instead of scanning all of it. "
+                            "Much faster on large histories; success rates come with 95% confidence "
+                            "intervals. Defaults to false (exact)"
+                        )
+                    },
+                    **output_schema_properties()
                 }
             }
-        )
+        ),
+        stats.tool_definition(),
+        maintenance.tool_definition()
     ]
+    if replication_role() is not None:
+        tools.append(replication_role().tool_definition())
+    return tools
 
 @server.call_tool()
+@stats.instrument
+@profile_tool_calls("learning-agent")
 async def call_tool(name: str, arguments: dict) -> list[TextContent]:
     """Handle tool calls"""
     
     if name == "record_experience":
-        # Load existing experiences
-        experiences = load_experiences()
+        if replica is not None:
+            return [TextContent(
+                type="text",
+                text=json.dumps({
+                    "status": "error",
+                    "message": "This server is a read-only replica. Record experiences through the primary server."
+                }, indent=2)
+            )]
         
         # Create new experience record
         new_experience = {
@@ -220,15 +726,18 @@ async def call_tool(name: str, arguments: dict) -> list[TextContent]:
             "metrics": arguments.get("metrics", {})
         }
         
-        # Add to collection
-        experiences.append(new_experience)
+        # Append to storage (one log line, no full rewrite)
+        total_experiences = await append_experience(new_experience)
         
-        # Save back to storage
-        if save_experiences(experiences):
+        if total_experiences is not None:
+            # The running success rates were already updated by
+            # committed_experiences(); only cached answers need dropping
+            insight_cache.invalidate(new_experience["agent_id"], new_experience["task_type"])
+
             result = {
                 "status": "recorded",
-                "experience_id": len(experiences),
-                "total_experiences": len(experiences),
+                "experience_id": total_experiences,
+                "total_experiences": total_experiences,
                 "message": f"Experience recorded for {arguments['agent_id']} on {arguments['task_type']} task"
             }
         else:
@@ -243,32 +752,66 @@ async def call_tool(name: str, arguments: dict) -> list[TextContent]:
         )]
     
     elif name == "get_learning_insights":
-        # Load experiences
-        experiences = load_experiences()
-        
-        # Apply filters
-        filtered = experiences
-        
-        if "agent_id" in arguments and arguments["agent_id"]:
-            filtered = [e for e in filtered if e.get("agent_id") == arguments["agent_id"]]
-        
-        if "task_type" in arguments and arguments["task_type"]:
-            filtered = [e for e in filtered if e.get("task_type") == arguments["task_type"]]
-        
         # Get minimum confidence threshold
         min_confidence = arguments.get("min_confidence", 0.7)
+        weighting = arguments.get("weighting") or "all"
         
-        # Identify patterns
-        patterns = identify_patterns(filtered, min_confidence)
+        # Repeat questions are answered from the cache. Decayed rates keep
+        # changing as time passes, so those are always computed fresh.
+        sync_with_disk()
+        cache_key = None
+        if weighting != "decayed":
+            cache_key = InsightCache.make_key(
+                arguments.get("agent_id"), arguments.get("task_type"),
+                min_confidence, weighting, arguments.get("window_size")
+            )
+            cached = insight_cache.get(cache_key)
+            if cached is not None:
+                return [TextContent(type="text", text=render_result(cached, arguments, "insights", summarize_insights))]
+            cache_generation = insight_cache.generation(cache_key)
+        
+        if weighting in ("decayed", "window"):
+            # Answer from the running summaries, no history scan needed
+            try:
+                patterns = get_success_tracker().insights(
+                    agent_id=arguments.get("agent_id"),
+                    task_type=arguments.get("task_type"),
+                    min_confidence=min_confidence,
+                    weighting=weighting,
+                    window_size=arguments.get("window_size")
+                )
+            except ValueError as e:
+                return [TextContent(
+                    type="text",
+                    text=json.dumps({"status": "error", "message": str(e)}, indent=2)
+                )]
+        else:
+            # Load experiences, then filter them and identify patterns in a
+            # thread so other calls keep being served meanwhile
+            experiences = load_experiences()
+            try:
+                patterns = await scheduler.run(
+                    filter_and_identify_patterns, experiences,
+                    arguments.get("agent_id"), arguments.get("task_type"), min_confidence,
+                    timeout=TOOL_TIMEOUT_SECONDS
+                )
+            except SchedulerError as e:
+                return [TextContent(
+                    type="text",
+                    text=json.dumps({"status": "error", "message": str(e)}, indent=2)
+                )]
         
         # Format insights for readability
         if patterns["insights"]:
             result = {
                 "status": "success",
+                "weighting": weighting,
                 "total_experiences_analyzed": patterns["total_experiences"],
                 "patterns_found": len(patterns["insights"]),
                 "insights": patterns["insights"]
             }
+            if weighting == "decayed":
+                result["half_life_days"] = HALF_LIFE_DAYS
         else:
             result = {
                 "status": "insufficient_data",
@@ -277,56 +820,67 @@ async def call_tool(name: str, arguments: dict) -> list[TextContent]:
                 "suggestion": "Record more experiences to build stronger patterns"
             }
         
+        # The result itself is cached, so any output format can be served from it
+        if cache_key is not None:
+            insight_cache.put(cache_key, result, cache_generation)
+        
         return [TextContent(
             type="text",
-            text=json.dumps(result, indent=2)
+            text=render_result(result, arguments, "insights", summarize_insights)
         )]
     
     elif name == "analyze_learning_patterns":
-        # Load experiences
-        experiences = load_experiences()
-        
-        # Apply agent filter if specified
-        if "agent_id" in arguments and arguments["agent_id"]:
-            experiences = [e for e in experiences if e.get("agent_id") == arguments["agent_id"]]
-        
-        # Apply time range filter
+        # Apply agent and time range filters while counting outcomes
         time_range_days = arguments.get("time_range_days", 30)
         cutoff_date = datetime.now() - timedelta(days=time_range_days)
+        approximate = bool(arguments.get("approximate", False))
+        sync_with_disk()
         
-        filtered_experiences = []
-        for exp in experiences:
+        if approximate:
+            # Estimate from the stratified samples: bounded cost, no history scan
+            aggregate = get_reservoir().estimate(cutoff_date, arguments.get("agent_id"))
+        else:
             try:
-                exp_date = datetime.fromisoformat(exp.get("timestamp", ""))
-                if exp_date >= cutoff_date:
-                    filtered_experiences.append(exp)
-            except (ValueError, TypeError):
-                continue
+                aggregate = await aggregate_learning_history(
+                    load_experiences(), cutoff_date, arguments.get("agent_id")
+                )
+            except SchedulerError as e:
+                return [TextContent(
+                    type="text",
+                    text=json.dumps({"status": "error", "message": str(e)}, indent=2)
+                )]
         
-        if not filtered_experiences:
+        if not aggregate["total"]:
             result = {
                 "status": "no_data",
                 "message": f"No experiences found in the last {time_range_days} days"
             }
         else:
             # Calculate overall success rate
-            overall_success = calculate_success_rate(filtered_experiences)
-            
-            # Group by task type
-            task_type_stats = defaultdict(list)
-            for exp in filtered_experiences:
-                task_type = exp.get("task_type", "unknown")
-                task_type_stats[task_type].append(exp)
+            overall_success = aggregate["successes"] / aggregate["total"]
             
+            # Break down by task type
             task_analysis = {}
-            for task_type, exps in task_type_stats.items():
+            for task_type, (attempts, successes) in aggregate["task_types"].items():
                 task_analysis[task_type] = {
-                    "attempts": len(exps),
-                    "success_rate": round(calculate_success_rate(exps), 2)
+                    "attempts": round(attempts),
+                    "success_rate": round(successes / attempts, 2)
                 }
             
             # Identify best and worst approaches
-            all_patterns = identify_patterns(filtered_experiences, min_confidence=0.5)
+            all_patterns = insights_from_counts(
+                aggregate["approaches"], aggregate["total"], min_confidence=0.5
+            )
+            
+            if approximate:
+                # Estimated counts are fractional; report them as whole numbers
+                # and attach a confidence interval to every success rate
+                intervals = aggregate["confidence_intervals"]
+                for task_type, task_stats in task_analysis.items():
+                    task_stats["success_rate_ci"] = intervals["task_types"][task_type]
+                for insight in all_patterns.get("insights", []):
+                    insight["attempts"] = round(insight["attempts"])
+                    insight["success_rate_ci"] = intervals["approaches"][insight["approach"]]
             
             best_approaches = [
                 p for p in all_patterns.get("insights", [])
@@ -341,7 +895,7 @@ async def call_tool(name: str, arguments: dict) -> list[TextContent]:
             result = {
                 "status": "success",
                 "time_range_days": time_range_days,
-                "total_experiences": len(filtered_experiences),
+                "total_experiences": round(aggregate["total"]),
                 "overall_success_rate": round(overall_success, 2),
                 "task_type_breakdown": task_analysis,
                 "best_approaches": best_approaches,
@@ -351,27 +905,97 @@ async def call_tool(name: str, arguments: dict) -> list[TextContent]:
                     "Consider experimenting with new strategies in low-risk scenarios."
                 )
             }
+            
+            if approximate:
+                result["approximate"] = True
+                result["overall_success_rate_ci"] = aggregate["confidence_intervals"]["overall"]
+                result["sample_size"] = aggregate["sample_size"]
         
         return [TextContent(
             type="text",
-            text=json.dumps(result, indent=2)
+            text=render_result(result, arguments, "task_type_breakdown", summarize_analysis)
         )]
     
+    elif name == "server_stats":
+        return stats.tool_result()
+    
+    elif name == "maintenance_status":
+        return maintenance.tool_result()
+    
+    elif name == "replication_status" and replication_role() is not None:
+        return replication_role().tool_result()
+    
     else:
         return [TextContent(
             type="text",
             text=f"Unknown tool: {name}"
         )]
 
-async def main():
-    """Run the MCP server"""
-    async with stdio_server() as (read_stream, write_stream):
-        await server.run(
-            read_stream,
-            write_stream,
-            server.create_initialization_options()
+async def main(transport="stdio", host="127.0.0.1", port=8108, warm_up_store=False,
+               ship_log=None, replica_of=None):
+    """
+    Run the MCP server
+    
+    The stored history is loaded by the first tool call that needs it, or
+    with warm_up_store in the background right after the handshake.
+    
+    With ship_log, every recorded batch is also published to that folder for
+    read replicas. With replica_of, this server is one of those replicas: it
+    follows the segments in that folder and answers from them.
+    """
+    global store, log_shipper, replica
+    if ship_log:
+        log_shipper = LogShipper(ship_log)
+        stats.watch_counters(log_shipper.counters)
+    elif replica_of:
+        replica = LogReplica(
+            replica_of, on_append=apply_replicated_experiences, on_reset=reset_replicated_experiences
         )
+        store = ReplicaStore(replica)
+        stats.watch_counters(replica.counters)
+    
+    startup.watch(server, warm_up=warm_up if warm_up_store else None)
+    stats.start_prometheus_export()
+    # Background upkeep (and following the primary's log, on a replica)
+    # runs for as long as the server does; analysis workers stop with it
+    async with (
+        maintenance.running(),
+        analysis_workers.running(),
+        replica.running() if replica is not None else nullcontext(),
+    ):
+        startup.serving()
+        if transport != "stdio":
+            # One process for every client: they all share the loaded history,
+            # cached insights and summaries
+            await serve_http(server, server.create_initialization_options(), transport, host, port)
+            return
+        async with stdio_server() as (read_stream, write_stream):
+            await server.run(
+                read_stream,
+                write_stream,
+                server.create_initialization_options()
+            )
 
 if __name__ == "__main__":
-    import asyncio
-    asyncio.run(main())
+    parser = argparse.ArgumentParser(description="Learning agent MCP server")
+    parser.add_argument("--import-json", metavar="PATH",
+                        help="Replace the stored experiences with a JSON export, then exit")
+    parser.add_argument("--export-json", metavar="PATH",
+                        help="Write all experiences to a JSON file, then exit")
+    parser.add_argument("--checkpoint", action="store_true",
+                        help="Fold the write-ahead log into the snapshot, then exit")
+    parser.add_argument("--warm-up", action="store_true",
+                        help="Load the stored history in the background right after the handshake")
+    add_transport_arguments(parser, default_port=8108)
+    add_replication_arguments(parser)
+    args = parser.parse_args()
+    
+    if args.import_json:
+        print(f"Imported {store.import_json(args.import_json)} experiences")
+    elif args.export_json:
+        print(f"Exported {store.export_json(args.export_json)} experiences")
+    elif args.checkpoint:
+        store.checkpoint()
+        print(f"Checkpointed {len(store.load())} experiences")
+    else:
+        asyncio.run(main(args.transport, args.host, args.port, args.warm_up, args.ship_log, args.replica_of))
@@ -8,9 +8,15 @@ If you see errors, make sure you:
 1. Activated the virtual environment
 2. Ran 'pip install -r requirements.txt'
 3. Are using Python 3.10 or higher
+
+Run with --perf to also measure this machine's import time, disk sync
+latency, JSON parse speed and how long the stored history takes to load,
+and get a storage recommendation.
 """
 
+import os
 import sys
+from pathlib import Path
 
 # Check Python version
 python_version = sys.version_info
@@ -44,3 +50,19 @@ except ImportError as e:
     print("  2. Ran: pip install -r requirements.txt")
     print("  3. Are using Python 3.10 or higher")
     sys.exit(1)
+
+if "--perf" in sys.argv:
+    # The check itself lives in the repository's mcp_shared folder; the
+    # server and its data are one folder up from this tools folder
+    LESSON_DIR = Path(__file__).resolve().parent.parent
+    sys.path.insert(0, str(LESSON_DIR.parent))
+    from mcp_shared.perf_check import run_perf_check
+    DATA_DIR = Path(os.environ.get("MCP_LEARNING_DIR") or LESSON_DIR)
+    run_perf_check(
+        LESSON_DIR,
+        [DATA_DIR / "learning_data.snapshot", DATA_DIR / "learning_data.wal"],
+        store_load=(
+            "import sys; sys.path.insert(0, '..'); from learning_store import LearningStore",
+            f"LearningStore({str(DATA_DIR)!r}).load()",
+        ),
+    )
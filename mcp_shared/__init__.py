@@ -0,0 +1,11 @@
+"""
+Shared helpers for the lesson MCP servers
+
+Each lesson folder stays a complete, runnable server. The pieces in this
+package are infrastructure several servers need in exactly the same form,
+such as safe file access when more than one process uses the same data.
+
+Servers make the package importable by adding the repository root to
+sys.path before importing from it, so they keep working when Claude
+Desktop launches them directly.
+"""
@@ -0,0 +1,92 @@
+"""
+One memory budget for the caches of several servers in one process
+
+Each lesson server limits its own caches, but when several of them run in
+one process (see combined-server/server.py), limits set one cache at a
+time either waste memory (every cache may fill up at once) or leave a busy
+server short while an idle one sits on its share.
+
+CacheBudget puts every cache under one limit instead, counted in entries:
+one listed note file, one parsed memory, one recorded experience, one
+sampled experience, one cached answer. A cache may grow as far as the whole
+budget allows; when the entries held together go over the limit, enforce()
+drops whole caches, starting with those of the server used least recently,
+until they fit again. A dropped cache is filled again from disk the next
+time its server needs it.
+
+Some entries can't be dropped (the learning agent's loaded history is its
+storage, not a cache); they still count, so the caches around them get
+less room.
+"""
+
+import threading
+
+
+class CacheBudget:
+    """
+    Tracks the entries a group of caches hold, and drops caches when
+    together they hold more than `limit` entries.
+
+    Register each cache with track(owner, name, size, drop): `size()`
+    returns the entries it holds now and `drop()` empties it (None for
+    entries that can't be dropped). Call touch(owner) whenever an owner's
+    caches are used and enforce() after they may have grown.
+    """
+
+    def __init__(self, limit):
+        self.limit = limit
+        self.caches_dropped = 0
+        self.entries_dropped = 0
+        # owner -> [(name, size, drop)], least recently used owner first
+        self._owners = {}
+        self._lock = threading.Lock()
+
+    def track(self, owner, name, size, drop=None):
+        """Count the entries `size()` reports against the budget, dropping them with `drop()`"""
+        with self._lock:
+            self._owners.setdefault(owner, []).append((name, size, drop))
+
+    def touch(self, owner):
+        """Mark `owner`'s caches as the most recently used"""
+        with self._lock:
+            if owner in self._owners:
+                self._owners[owner] = self._owners.pop(owner)
+
+    def usage(self):
+        """Entries held right now, by "owner.name" """
+        with self._lock:
+            return {
+                f"{owner}.{name}": size()
+                for owner, caches in self._owners.items() for name, size, _ in caches
+            }
+
+    def enforce(self):
+        """Drop caches, least recently used owner first, until the entries fit; returns the entries dropped"""
+        with self._lock:
+            caches = [cache for owner_caches in self._owners.values() for cache in owner_caches]
+            used = sum(size() for _, size, _ in caches)
+            dropped = 0
+            for _, size, drop in caches:
+                if used <= self.limit:
+                    break
+                held = size()
+                if drop is None or held == 0:
+                    continue
+                drop()
+                # A cache busy refilling itself may keep its entries this time
+                freed = held - size()
+                if freed > 0:
+                    used -= freed
+                    dropped += freed
+                    self.caches_dropped += 1
+            self.entries_dropped += dropped
+            return dropped
+
+    def counters(self):
+        """Totals, in the form ServerStats.watch_counters() expects"""
+        return {
+            "cache_budget_limit": self.limit,
+            "cache_budget_used": sum(self.usage().values()),
+            "cache_budget_caches_dropped": self.caches_dropped,
+            "cache_budget_entries_dropped": self.entries_dropped,
+        }
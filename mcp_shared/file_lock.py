@@ -0,0 +1,142 @@
+"""
+Cross-process file locking
+
+Several Claude Desktop windows can run the same server at once, and all of
+them read and write the same data files. Without coordination, two
+processes can both load a file, each add a record, and each write their
+own version back: one of the two records is lost.
+
+FileLock gives one process at a time exclusive access. It locks a separate
+"<data file>.lock" file, so the data file itself can still be replaced
+atomically while the lock is held.
+
+Async code waits for the lock with acquire_async(). The wait runs on a
+thread pool of its own rather than asyncio's default one: a thread waiting
+for another process to let go of a file does no work, and four of them
+would otherwise use up every thread of a small default pool, stalling
+unrelated tool calls (in the combined server, those of every other
+server) until the lock is free.
+"""
+
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+# Threads that do nothing but wait for file locks, shared by every FileLock
+# in the process (see acquire_async)
+LOCK_WAIT_THREADS = 16
+_lock_waiters = ThreadPoolExecutor(max_workers=LOCK_WAIT_THREADS, thread_name_prefix="file-lock-wait")
+
+
+class FileLock:
+    """
+    Exclusive lock shared by every process that uses the same data file.
+
+    Use it as a context manager:
+
+        with FileLock(MEMORY_FILE):
+            memories = load_memories()
+            memories.append(new_memory)
+            save_memories(memories)
+
+    Threads of one process also exclude each other. The lock is not
+    re-entrant: acquiring it twice from the same thread deadlocks.
+    """
+
+    def __init__(self, path, timeout=None):
+        self.lock_path = f"{os.fspath(path)}.lock"
+        self.timeout = timeout
+        self._thread_lock = threading.Lock()
+        self._fd = None
+
+    def acquire(self):
+        """Block until this process holds the lock (TimeoutError after `timeout` seconds)"""
+        deadline = None if self.timeout is None else time.monotonic() + self.timeout
+        if not self._thread_lock.acquire(timeout=-1 if self.timeout is None else self.timeout):
+            raise TimeoutError(f"Timed out waiting for {self.lock_path}")
+
+        try:
+            fd = os.open(self.lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                _lock_fd(fd, deadline, self.lock_path)
+            except BaseException:
+                os.close(fd)
+                raise
+            self._fd = fd
+        except BaseException:
+            self._thread_lock.release()
+            raise
+
+    async def acquire_async(self):
+        """
+        acquire() without blocking the event loop, waiting on the lock-wait
+        threads. If the waiting call is cancelled, a lock taken after that
+        is released again rather than left held by nobody.
+        """
+        waiting = asyncio.get_running_loop().run_in_executor(_lock_waiters, self.acquire)
+        try:
+            await asyncio.shield(waiting)
+        except asyncio.CancelledError:
+            waiting.add_done_callback(self._release_if_acquired)
+            raise
+
+    def _release_if_acquired(self, waiting):
+        if not waiting.cancelled() and waiting.exception() is None:
+            self.release()
+
+    def release(self):
+        """Let the next waiting process or thread in"""
+        fd, self._fd = self._fd, None
+        try:
+            _unlock_fd(fd)
+        finally:
+            os.close(fd)
+            self._thread_lock.release()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.release()
+
+
+def _lock_fd(fd, deadline, name):
+    if fcntl is not None:
+        if deadline is None:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            return
+        while True:
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                return
+            except BlockingIOError:
+                if time.monotonic() >= deadline:
+                    raise TimeoutError(f"Timed out waiting for {name}")
+                time.sleep(0.005)
+    else:
+        # msvcrt has no blocking wait without a 10 second limit, so poll
+        while True:
+            try:
+                msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+                return
+            except OSError:
+                if deadline is not None and time.monotonic() >= deadline:
+                    raise TimeoutError(f"Timed out waiting for {name}")
+                time.sleep(0.005)
+
+
+def _unlock_fd(fd):
+    if fcntl is not None:
+        fcntl.flock(fd, fcntl.LOCK_UN)
+    else:
+        os.lseek(fd, 0, os.SEEK_SET)
+        msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
@@ -0,0 +1,93 @@
+"""
+Group commit for shared data files
+
+When many writes arrive close together, doing one locked read-modify-write
+per write makes every writer wait for every other one, and the disk is
+rewritten once per record. GroupCommitter queues writes instead: while one
+batch waits for (or holds) the file lock, new writes pile up, and they are
+all flushed together by a single rewrite or append the next time round.
+"""
+
+import asyncio
+import sys
+
+from mcp_shared import profiling
+
+
+class GroupCommitter:
+    """
+    Batches concurrent writes into one flush under a FileLock.
+
+    `flush_batch(items)` is called with the lock held and must return one
+    result per item, in order. submit() returns that item's result, or
+    raises the exception the flush raised.
+
+    Waiting for the lock (see FileLock.acquire_async) and the flush itself
+    both happen in worker threads, so the event loop keeps serving (and queueing) other calls
+    while a large file is rewritten; only handing the results back to the
+    waiting calls happens on the loop. flush_batch must therefore be safe
+    to run next to the server's other threads.
+
+    `after_flush(items, results)`, if given, runs on the event loop after
+    each successful flush, for in-memory state that only the loop may
+    touch. The results are handed back first, so an error in after_flush
+    can't make writes that did reach the disk look failed; it is printed
+    and counted in `after_flush_errors` instead. The waiting calls only
+    resume once after_flush has returned, so they see the state it
+    updated.
+    """
+
+    def __init__(self, lock, flush_batch, after_flush=None):
+        self.lock = lock
+        self.flush_batch = flush_batch
+        self.after_flush = after_flush
+        self.flushes = 0
+        self.items_flushed = 0
+        self.after_flush_errors = 0
+        self._pending = []
+        self._flusher = None
+
+    async def submit(self, item):
+        """Queue one item and wait until it has been written"""
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((item, future))
+        if self._flusher is None:
+            self._flusher = asyncio.create_task(self._flush_pending())
+        return await future
+
+    async def _flush_pending(self):
+        try:
+            while self._pending:
+                await self.lock.acquire_async()
+                # Everything that arrived while waiting goes in this batch
+                batch, self._pending = self._pending, []
+                items = [item for item, _ in batch]
+                try:
+                    # The thread releases the lock itself, so it stays held
+                    # until the flush is over even if this task is cancelled
+                    results = await asyncio.to_thread(profiling.profile_in_worker(self._flush_locked), items)
+                except Exception as e:
+                    for _, future in batch:
+                        if not future.done():
+                            future.set_exception(e)
+                    continue
+                for (_, future), result in zip(batch, results):
+                    if not future.done():
+                        future.set_result(result)
+                self.flushes += 1
+                self.items_flushed += len(batch)
+                if self.after_flush is not None:
+                    try:
+                        self.after_flush(items, results)
+                    except Exception as e:
+                        self.after_flush_errors += 1
+                        print(f"Group commit: after_flush failed after a successful write: {e!r}", file=sys.stderr)
+        finally:
+            self._flusher = None
+
+    def _flush_locked(self, items):
+        """Run flush_batch in a worker thread, then release the lock taken for it"""
+        try:
+            return self.flush_batch(items)
+        finally:
+            self.lock.release()
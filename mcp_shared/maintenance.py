@@ -0,0 +1,266 @@
+"""
+Background maintenance for long-running servers
+
+Some upkeep is too slow to do inside a tool call without the caller
+noticing: folding a write-ahead log into a snapshot, rebuilding summaries
+or indexes, re-parsing a data file another process changed. A
+MaintenanceScheduler runs jobs like these in a background task for as
+long as the server runs, and only when the server is otherwise quiet:
+
+- Each job has a due() check, usually a threshold such as "more than 1,000
+  records in the log", and an optional minimum gap between runs.
+- A due job waits until no tool call is running and none has finished in
+  the last `idle_seconds`. A job that has been due for `max_wait_seconds`
+  runs anyway, so a server that is never quiet still gets maintained.
+- Jobs are async functions that do their heavy lifting in threads, so the
+  event loop keeps answering tool calls even while a job runs.
+- Each job's history (runs, failures, last duration and result) is saved
+  to a small JSON file, so it survives restarts, and the
+  maintenance_status tool reports it.
+"""
+
+import asyncio
+import json
+import os
+import sys
+import time
+from contextlib import asynccontextmanager
+from pathlib import Path
+
+from mcp.types import TextContent, Tool
+
+# How long the server must be quiet before a due job starts
+IDLE_SECONDS = 2.0
+
+# A job due for this long runs even if the server never goes quiet
+MAX_WAIT_SECONDS = 60.0
+
+# How often due() checks run; they should be cheap (no file reads)
+POLL_SECONDS = 1.0
+
+
+class MaintenanceJob:
+    """One kind of background upkeep and its history"""
+
+    def __init__(self, name, run, due, description="", min_interval=0.0):
+        self.name = name
+        self.run = run
+        self.due = due
+        self.description = description
+        self.min_interval = min_interval
+
+        # Saved to the state file
+        self.runs = 0
+        self.failures = 0
+        self.last_started = None
+        self.last_duration_s = None
+        self.last_result = None
+        self.last_error = None
+
+        # When due() first returned True (time.monotonic()), until the job runs
+        self.due_since = None
+
+    def state(self):
+        return {
+            "runs": self.runs,
+            "failures": self.failures,
+            "last_started": self.last_started,
+            "last_duration_s": self.last_duration_s,
+            "last_result": self.last_result,
+            "last_error": self.last_error,
+        }
+
+    def restore(self, state):
+        for key, value in self.state().items():
+            setattr(self, key, state.get(key, value))
+
+
+class MaintenanceScheduler:
+    """
+    Runs registered maintenance jobs in the background while `stats` (the
+    server's ServerStats) shows no tool calls in progress.
+
+    Register jobs with add_job(), then wrap the server's lifetime in
+    `async with maintenance.running():`.
+    """
+
+    def __init__(self, stats, state_file, idle_seconds=IDLE_SECONDS,
+                 max_wait_seconds=MAX_WAIT_SECONDS, poll_seconds=POLL_SECONDS):
+        self.server_name = stats.server_name
+        self.state_file = Path(state_file)
+        self.idle_seconds = idle_seconds
+        self.max_wait_seconds = max_wait_seconds
+        self.poll_seconds = poll_seconds
+        self.jobs = {}
+        self.current_job = None
+        self._activity = [stats]
+        self._task = None
+
+    def add_job(self, name, run, due, description="", min_interval=0.0):
+        """
+        Register a job: `run()` is an async function doing the work (its
+        return value is reported as the job's last result) and `due()` says
+        whether it needs to run now.
+        """
+        self.jobs[name] = MaintenanceJob(name, run, due, description, min_interval)
+
+    def watch_activity(self, stats):
+        """Also wait for tool calls counted by another ServerStats to finish"""
+        if stats not in self._activity:
+            self._activity.append(stats)
+
+    def quiet(self, now=None):
+        """True when no tool call is running and none finished recently"""
+        now = time.monotonic() if now is None else now
+        for stats in self._activity:
+            if stats.in_flight:
+                return False
+            if stats.last_call_finished is not None and now - stats.last_call_finished < self.idle_seconds:
+                return False
+        return True
+
+    def start(self):
+        """Load the saved job history and start the background task"""
+        if self._task is None:
+            self._load_state()
+            self._task = asyncio.get_running_loop().create_task(self._run_forever())
+        return self._task
+
+    async def stop(self):
+        """Stop the background task, abandoning a job that is running"""
+        task, self._task = self._task, None
+        if task is not None:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+
+    @asynccontextmanager
+    async def running(self):
+        """Run maintenance for the duration of the with-block"""
+        self.start()
+        try:
+            yield self
+        finally:
+            await self.stop()
+
+    async def run_pending(self, force=False):
+        """
+        Run every job that is due and allowed to start now (with
+        `force`, every due job regardless of activity). Returns the names
+        of the jobs that ran.
+        """
+        ran = []
+        for job in list(self.jobs.values()):
+            now = time.monotonic()
+            if not self._is_due(job, now):
+                continue
+            if not force and not self.quiet(now) and now - job.due_since < self.max_wait_seconds:
+                continue
+            await self._run_job(job)
+            ran.append(job.name)
+        return ran
+
+    def counters(self):
+        """Run and failure totals, in the form ServerStats.watch_counters() expects"""
+        return {
+            "maintenance_runs": sum(job.runs for job in self.jobs.values()),
+            "maintenance_failures": sum(job.failures for job in self.jobs.values()),
+        }
+
+    def status(self):
+        """Every job's state as a JSON-friendly dictionary"""
+        return {
+            "server": self.server_name,
+            "running": self._task is not None and not self._task.done(),
+            "current_job": self.current_job,
+            "jobs": {
+                name: {
+                    "description": job.description,
+                    "due": job.due_since is not None,
+                    **job.state(),
+                }
+                for name, job in self.jobs.items()
+            },
+        }
+
+    def tool_definition(self):
+        """The maintenance_status tool, for adding to a server's list_tools result"""
+        return Tool(
+            name="maintenance_status",
+            description=(
+                "Show this server's background maintenance jobs: what each one does, "
+                "whether it is due, how often it has run and how its last run went"
+            ),
+            inputSchema={
+                "type": "object",
+                "properties": {},
+                "required": []
+            }
+        )
+
+    def tool_result(self):
+        """Response for a maintenance_status call"""
+        return [TextContent(type="text", text=json.dumps(self.status(), indent=2))]
+
+    async def _run_forever(self):
+        while True:
+            await asyncio.sleep(self.poll_seconds)
+            await self.run_pending()
+
+    def _is_due(self, job, now):
+        if job.last_started is not None and time.time() - job.last_started < job.min_interval:
+            return False
+        try:
+            due = job.due()
+        except Exception as e:
+            print(f"Maintenance check {job.name} failed: {e}", file=sys.stderr)
+            due = False
+        if not due:
+            job.due_since = None
+        elif job.due_since is None:
+            job.due_since = now
+        return due
+
+    async def _run_job(self, job):
+        self.current_job = job.name
+        job.last_started = time.time()
+        started = time.perf_counter()
+        try:
+            result = await job.run()
+            job.last_result = result if result is None or isinstance(result, (str, int, float, dict)) else str(result)
+            job.last_error = None
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            job.failures += 1
+            job.last_error = f"{type(e).__name__}: {e}"
+            print(f"Maintenance job {job.name} failed: {job.last_error}", file=sys.stderr)
+        finally:
+            job.runs += 1
+            job.last_duration_s = round(time.perf_counter() - started, 4)
+            job.due_since = None
+            self.current_job = None
+        await asyncio.to_thread(self._save_state)
+
+    def _load_state(self):
+        try:
+            with open(self.state_file, "r", encoding="utf-8") as f:
+                saved = json.load(f)
+        except (OSError, ValueError):
+            return
+        for name, state in saved.get("jobs", {}).items():
+            if name in self.jobs and isinstance(state, dict):
+                self.jobs[name].restore(state)
+
+    def _save_state(self):
+        """Write the job history atomically (temporary file, then rename)"""
+        data = {"server": self.server_name, "jobs": {name: job.state() for name, job in self.jobs.items()}}
+        temp_file = self.state_file.with_name(self.state_file.name + ".tmp")
+        try:
+            with open(temp_file, "w", encoding="utf-8") as f:
+                json.dump(data, f, indent=2)
+            os.replace(temp_file, self.state_file)
+        except OSError as e:
+            print(f"Could not save maintenance state: {e}", file=sys.stderr)
@@ -0,0 +1,243 @@
+"""
+Response formats and size budgets for tool results
+
+Every character a tool returns has to be serialized, sent and then read
+by the model, so tools that can return a lot accept two extra arguments:
+
+- format: how to write the result
+    text     the tool's usual readable output (the default)
+    json     compact JSON, without indentation or spaces
+    table    tab-separated rows under a header line
+    summary  one short line per item, or a few lines for a whole result
+- max_chars / max_tokens: an upper limit on the response size (a token
+  is counted as CHARS_PER_TOKEN characters). Items are added in order of
+  importance (newest memories first, best matches first, ...) until the
+  next one would not fit, and the response then says how many were left
+  out.
+
+OutputBuilder writes straight into one growing buffer and stops adding
+items as soon as the budget is spent, so building a response costs time
+in proportion to what is actually returned.
+"""
+
+import io
+import json
+
+FORMATS = ("text", "json", "table", "summary")
+CHARS_PER_TOKEN = 4
+
+# Smallest budget accepted, so there's always room to say what was left out
+MIN_BUDGET_CHARS = 200
+
+# Room kept free for the note saying how much was left out
+NOTE_RESERVE_CHARS = 80
+
+# Placeholders used to split a JSON document around its item list
+_ITEMS_MARKER = "\0items\0"
+_OMITTED_MARKER = "\0omitted\0"
+
+
+def output_schema_properties():
+    """The format, max_chars and max_tokens arguments, for a tool's inputSchema"""
+    return {
+        "format": {
+            "type": "string",
+            "enum": list(FORMATS),
+            "description": "text (default, readable), json (compact), table (tab-separated rows) "
+                           "or summary (one short line per item)"
+        },
+        "max_chars": {
+            "type": "integer",
+            "minimum": MIN_BUDGET_CHARS,
+            "description": "Return at most this many characters; the most relevant or most "
+                           "recent items are kept and the rest are counted as omitted"
+        },
+        "max_tokens": {
+            "type": "integer",
+            "minimum": MIN_BUDGET_CHARS // CHARS_PER_TOKEN,
+            "description": f"Like max_chars, counting {CHARS_PER_TOKEN} characters per token"
+        }
+    }
+
+
+def read_output_arguments(arguments):
+    """Return (format, max_chars or None) from a tool call's arguments"""
+    output_format = arguments.get("format") or "text"
+    if output_format not in FORMATS:
+        raise ValueError(f"Unknown format {output_format!r}; use one of {', '.join(FORMATS)}")
+
+    budgets = []
+    if arguments.get("max_chars") is not None:
+        budgets.append(int(arguments["max_chars"]))
+    if arguments.get("max_tokens") is not None:
+        budgets.append(int(arguments["max_tokens"]) * CHARS_PER_TOKEN)
+    max_chars = max(MIN_BUDGET_CHARS, min(budgets)) if budgets else None
+    return output_format, max_chars
+
+
+class OutputBuilder:
+    """
+    Builds a response within an optional character budget.
+
+    write() always appends (use it for headers and closing text, which
+    count toward the budget too). add_item() appends one item only if it
+    fits, keeping `reserve` characters free for what still has to follow;
+    once an item is refused, every later one is refused as well, so the
+    response is always a prefix of the full list.
+    """
+
+    def __init__(self, max_chars=None):
+        self.max_chars = max_chars
+        self.length = 0
+        self.items = 0
+        self.omitted = 0
+        self.full = False
+        self._buffer = io.StringIO()
+
+    def write(self, text):
+        self._buffer.write(text)
+        self.length += len(text)
+
+    def fits(self, size, reserve=0):
+        """True if `size` more characters fit, leaving `reserve` to spare"""
+        return self.max_chars is None or self.length + size + reserve <= self.max_chars
+
+    def add_item(self, text, reserve=0):
+        """Append an item if it fits; returns False (and counts it as omitted) if not"""
+        if self.full or not self.fits(len(text), reserve):
+            self.full = True
+            self.omitted += 1
+            return False
+        self.write(text)
+        self.items += 1
+        return True
+
+    def omit(self, count):
+        """Count items that were never offered to add_item() as omitted"""
+        self.omitted += count
+        self.full = self.full or count > 0
+
+    def getvalue(self):
+        return self._buffer.getvalue()
+
+
+def write_json(builder, obj, list_key=None, indent=None):
+    """
+    Write the dictionary `obj` as JSON, adding the entries of obj[list_key]
+    (a top-level list, or dictionary) one at a time while they fit the
+    budget. When a budget is set, the number of entries left out is written
+    right after it as "<list_key>_omitted".
+
+    Compact unless `indent` is given (the "text" format of JSON results).
+    The indented text is escaped exactly as the tools always wrote it; the
+    compact form leaves non-ASCII characters as they are, which is shorter.
+    """
+    separators = (",", ": ") if indent is not None else (",", ":")
+    ensure_ascii = indent is not None
+    items = obj.get(list_key) if list_key is not None else None
+    if not isinstance(items, (list, dict)):
+        builder.write(json.dumps(obj, indent=indent, separators=separators, ensure_ascii=ensure_ascii))
+        return
+
+    # Render everything except the entries once, then stream the entries
+    # into the gap left by the placeholder
+    template = dict(obj)
+    template[list_key] = _ITEMS_MARKER
+    if builder.max_chars is not None:
+        template = _insert_after(template, list_key, f"{list_key}_omitted", _OMITTED_MARKER)
+    head, tail = json.dumps(template, indent=indent, separators=separators, ensure_ascii=ensure_ascii).split(
+        json.dumps(_ITEMS_MARKER), 1
+    )
+    omitted_placeholder = json.dumps(_OMITTED_MARKER)
+    reserve = len(tail) - len(omitted_placeholder) + len(str(len(items))) + 2
+
+    # obj[list_key] is a top-level value, so its entries sit two levels deep
+    item_indent = " " * (indent * 2) if indent is not None else None
+    if isinstance(items, dict):
+        brackets = "{}"
+        entries = (
+            json.dumps(key, ensure_ascii=ensure_ascii) + separators[1]
+            + json.dumps(value, indent=indent, separators=separators, ensure_ascii=ensure_ascii)
+            for key, value in items.items()
+        )
+    else:
+        brackets = "[]"
+        entries = (
+            json.dumps(item, indent=indent, separators=separators, ensure_ascii=ensure_ascii)
+            for item in items
+        )
+
+    builder.write(head + brackets[0])
+    for index, text in enumerate(entries):
+        if item_indent is not None:
+            text = "\n" + item_indent + text.replace("\n", "\n" + item_indent)
+        if not builder.add_item(("," if index else "") + text, reserve):
+            builder.omit(len(items) - index - 1)
+            break
+    if indent is not None and builder.items:
+        builder.write("\n" + " " * indent)
+    builder.write(brackets[1] + tail.replace(omitted_placeholder, str(builder.omitted)))
+
+
+def write_table(builder, obj):
+    """
+    Write a result dictionary as tab-separated text: plain fields as
+    "field<TAB>value" lines, then each list (or dictionary) of records as
+    its own "# name" section with a header row and one row per record. An
+    empty list is written as a section with only its "# name" line, so a
+    result with no records keeps the layout it has with some.
+    """
+    sections = []
+    for key, value in obj.items():
+        if _is_records(value) or value == []:
+            sections.append((key, value))
+        else:
+            builder.write(f"{key}\t{_cell(value)}\n")
+
+    for position, (name, records) in enumerate(sections):
+        if isinstance(records, dict):
+            records = [{"name": key, **value} for key, value in records.items()]
+        columns = list(dict.fromkeys(column for record in records for column in record))
+        builder.write(f"\n# {name}\n" + ("\t".join(columns) + "\n" if columns else ""))
+        for index, record in enumerate(records):
+            row = "\t".join(_cell(record.get(column)) for column in columns) + "\n"
+            if not builder.add_item(row, NOTE_RESERVE_CHARS):
+                builder.omit(len(records) - index - 1 + sum(len(rows) for _, rows in sections[position + 1:]))
+                break
+        if builder.full:
+            break
+    if builder.omitted:
+        builder.write(f"\n# {builder.omitted} more rows omitted (max_chars {builder.max_chars})\n")
+
+
+def write_omitted_note(builder, what):
+    """End a text response with how many `what` (e.g. "older memories") were left out"""
+    if builder.omitted:
+        builder.write(f"\n... {builder.omitted} {what} omitted to stay within {builder.max_chars} characters\n")
+
+
+def _cell(value):
+    """One table cell: tabs and line breaks would break the row"""
+    if value is None:
+        return ""
+    if not isinstance(value, str):
+        value = json.dumps(value, separators=(",", ":"), ensure_ascii=False)
+    return value.replace("\t", " ").replace("\r", " ").replace("\n", " ")
+
+
+def _is_records(value):
+    if isinstance(value, list):
+        return bool(value) and all(isinstance(item, dict) for item in value)
+    if isinstance(value, dict):
+        return bool(value) and all(isinstance(item, dict) for item in value.values())
+    return False
+
+
+def _insert_after(obj, key, new_key, new_value):
+    result = {}
+    for existing, value in obj.items():
+        result[existing] = value
+        if existing == key:
+            result[new_key] = new_value
+    return result
+
@@ -0,0 +1,195 @@
+"""
+Host performance self-check, run by each lesson's `check_setup.py --perf`
+
+How quickly a lesson server starts and stores data depends a lot on the
+machine it runs on. This check measures the three things that matter most
+on the host you're actually using:
+
+- Import time: how long a fresh Python process takes to import the MCP SDK
+  and the lesson's server.py. Claude Desktop pays this every time it starts
+  a stdio server.
+- Disk sync latency: how long writing a small block and calling fsync
+  takes in the lesson folder, which is the cost of every durable save.
+- JSON parse speed: how many MB/s json.loads gets through on records
+  shaped like the lesson's data, which decides how large a single JSON
+  data file can grow before reading it gets slow.
+- Store load time (lesson 8): how long a fresh process takes to load the
+  stored history from its snapshot and log, the cost of the first call
+  that needs it.
+
+From these it recommends a way to store the data: a single JSON file
+(shared_memory.json, the default), an append-only log with a binary
+snapshot (how lesson 8's learning_store.py works), and whether to run one
+shared server over HTTP so saves are batched into fewer syncs.
+"""
+
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Sync calls timed; the first one or two are often slower than the rest
+FSYNC_SAMPLES = 30
+FSYNC_BLOCK_BYTES = 4096
+
+# Size of the sample document parsed to measure JSON speed
+JSON_SAMPLE_RECORDS = 20_000
+
+# A read that parses the whole data file should take no longer than this
+PARSE_BUDGET_SECONDS = 0.2
+
+# Sync latencies above this mean a slow, virtual or network disk
+SLOW_FSYNC_SECONDS = 0.010
+
+# Import time above this is worth keeping an eye on
+SLOW_IMPORT_SECONDS = 1.0
+
+
+def measure_import_seconds(code, cwd, setup=""):
+    """Time `code` (some imports) in a fresh Python process, after running `setup` untimed"""
+    script = (
+        "import time\n"
+        f"{setup}\n"
+        "started = time.perf_counter()\n"
+        f"{code}\n"
+        "print(time.perf_counter() - started)\n"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", script], cwd=cwd,
+        capture_output=True, text=True, timeout=120
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1] if result.stderr.strip() else "import failed")
+    return float(result.stdout.strip().splitlines()[-1])
+
+
+def measure_fsync_seconds(directory, samples=FSYNC_SAMPLES):
+    """Median and slowest time to write and fsync a small block in `directory`"""
+    timings = []
+    block = os.urandom(FSYNC_BLOCK_BYTES)
+    with tempfile.NamedTemporaryFile(dir=directory, prefix=".perf-check-") as f:
+        for _ in range(samples):
+            started = time.perf_counter()
+            f.write(block)
+            f.flush()
+            os.fsync(f.fileno())
+            timings.append(time.perf_counter() - started)
+    return statistics.median(timings), max(timings)
+
+
+def sample_records(count=JSON_SAMPLE_RECORDS):
+    """Records shaped like shared_memory.json entries (a timestamp and some text)"""
+    return [
+        {
+            "timestamp": f"2025-01-{i % 28 + 1:02d}T12:{i % 60:02d}:00.000000",
+            "content": f"Insight {i}: the retry approach worked for task type {i % 17} "
+                       "after the first attempt timed out; keep the batch size small.",
+        }
+        for i in range(count)
+    ]
+
+
+def measure_json_parse(records):
+    """JSON parse speed in MB/s, plus the size of one encoded record in bytes"""
+    data = json.dumps(records, indent=2).encode("utf-8")
+    best = None
+    for _ in range(3):
+        started = time.perf_counter()
+        json.loads(data)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return len(data) / best / 1e6, len(data) / len(records)
+
+
+def recommend_storage(fsync_median, parse_mb_per_s, record_bytes, data_bytes,
+                      log_and_snapshot=False, store_load_seconds=None):
+    """
+    Storage advice (a list of lines) for the measured host. For data already
+    kept as a log and snapshot, pass log_and_snapshot=True and the measured
+    `store_load_seconds` (None if nothing is stored yet).
+    """
+    budget_records = int(parse_mb_per_s * 1e6 * PARSE_BUDGET_SECONDS / record_bytes)
+    parse_seconds = data_bytes / (parse_mb_per_s * 1e6)
+    advice = []
+    if log_and_snapshot:
+        line = "Append-only log with a binary snapshot (this lesson's layout)"
+        if store_load_seconds is None:
+            line += ": nothing is stored yet."
+        else:
+            line += f": the stored history loads in {store_load_seconds:.2f}s."
+        if store_load_seconds is not None and store_load_seconds > PARSE_BUDGET_SECONDS:
+            line += " Start the server with --warm-up so the first call doesn't wait for it."
+        advice.append(line)
+    elif data_bytes and parse_seconds > PARSE_BUDGET_SECONDS:
+        advice.append(
+            f"Append-only log with a binary snapshot: the current data file takes about "
+            f"{parse_seconds:.2f}s to parse, and a single JSON file is re-parsed whenever it changes. "
+            "Lesson 8's learning_store.py shows the layout."
+        )
+    else:
+        advice.append(
+            f"Single JSON file (the default): this host parses about {budget_records:,} records "
+            f"within {PARSE_BUDGET_SECONDS}s. Past that, move to an append-only log with a "
+            "binary snapshot, as in lesson 8's learning_store.py."
+        )
+    if fsync_median > SLOW_FSYNC_SECONDS:
+        advice.append(
+            f"Disk syncs are slow here ({fsync_median * 1000:.1f}ms). Keep the data folder on a "
+            "local disk, and run one server with --transport http so saves from every client are "
+            "batched into fewer writes."
+        )
+    return advice
+
+
+def run_perf_check(lesson_dir, data_file=None, store_load=None):
+    """
+    Measure this host and print the results and a storage recommendation
+
+    `data_file` is the lesson's data file, or a list of them. `store_load`
+    is (setup, code): Python code that loads the stored data, timed in a
+    fresh process started in `lesson_dir` after the untimed `setup`.
+    """
+    lesson_dir = Path(lesson_dir)
+    print("\nPerformance check")
+    print("-----------------")
+
+    try:
+        sdk_seconds = measure_import_seconds("import mcp.server.stdio, mcp.types", lesson_dir)
+        server_seconds = measure_import_seconds("import server", lesson_dir)
+        print(f"Import time:      MCP SDK {sdk_seconds * 1000:.0f}ms, server.py {server_seconds * 1000:.0f}ms")
+        if server_seconds > SLOW_IMPORT_SECONDS:
+            print("                  (slow: check for an antivirus scan or a slow Python install)")
+    except (RuntimeError, OSError, ValueError, subprocess.TimeoutExpired) as e:
+        print(f"Import time:      could not measure ({e})")
+
+    fsync_median, fsync_max = measure_fsync_seconds(lesson_dir)
+    print(f"Disk sync:        {fsync_median * 1000:.2f}ms median, {fsync_max * 1000:.2f}ms slowest "
+          f"({FSYNC_BLOCK_BYTES // 1024} KiB write + fsync)")
+
+    parse_mb_per_s, record_bytes = measure_json_parse(sample_records())
+    print(f"JSON parse:       {parse_mb_per_s:.0f} MB/s")
+
+    data_bytes = 0
+    data_files = data_file if isinstance(data_file, (list, tuple)) else [data_file]
+    for path in data_files:
+        if path is not None and Path(path).exists():
+            size = Path(path).stat().st_size
+            data_bytes += size
+            print(f"Data file:        {Path(path).name}, {size / 1e6:.2f} MB")
+
+    store_load_seconds = None
+    if store_load is not None and data_bytes:
+        try:
+            store_load_seconds = measure_import_seconds(store_load[1], lesson_dir, setup=store_load[0])
+            print(f"Store load:       {store_load_seconds * 1000:.0f}ms")
+        except (RuntimeError, OSError, ValueError, subprocess.TimeoutExpired) as e:
+            print(f"Store load:       could not measure ({e})")
+
+    print("\nRecommended storage:")
+    for line in recommend_storage(fsync_median, parse_mb_per_s, record_bytes, data_bytes,
+                                  store_load is not None, store_load_seconds):
+        print(f"  - {line}")
@@ -0,0 +1,267 @@
+"""
+Opt-in profiling of tool calls
+
+A slow call is much easier to fix once you can see where it spent its time.
+When turned on with environment variables, this module runs selected tool
+calls under cProfile (and optionally tracemalloc) and writes the results to
+a folder, one set of files per profiled call:
+
+    MCP_PROFILE_TOOLS   Comma-separated tool names to profile, or * for all.
+                        Profiling is off when this is not set.
+    MCP_PROFILE_EVERY   Profile the first call and then every Nth call of
+                        each tool (default: 1, every call)
+    MCP_PROFILE_MEMORY  Set to 1 to also record memory allocations
+    MCP_PROFILE_DIR     Output folder (default: mcp-profiles in the system
+                        temp folder)
+    MCP_PROFILE_KEEP    Newest profiles kept per server; older ones are
+                        deleted (default: 50)
+
+File names carry the server, time, tool name and a hash of the call's
+arguments, so repeated calls with the same arguments are easy to group
+without writing the arguments (which may be private) to disk.
+
+Most of a tool's real work runs in worker threads (ToolScheduler, group
+commits, chunked analyses), and cProfile only sees the thread that turned
+it on. Functions handed to a thread through profile_in_worker() are
+profiled in that thread too, and their profiles are merged into the
+call's. Work done in worker processes (the parallel analysis of very large
+learning histories) is not profiled; the report says when to look there.
+
+When MCP_PROFILE_TOOLS is not set, profile_tool_calls() hands the handler
+back untouched and profile_in_worker() hands functions back without
+looking for a profiled call, so a server pays nothing for having
+profiling available.
+"""
+
+import contextvars
+import cProfile
+import functools
+import hashlib
+import io
+import json
+import os
+import pstats
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from pathlib import Path
+
+PROFILE_TOOLS_ENV = "MCP_PROFILE_TOOLS"
+PROFILE_EVERY_ENV = "MCP_PROFILE_EVERY"
+PROFILE_MEMORY_ENV = "MCP_PROFILE_MEMORY"
+PROFILE_DIR_ENV = "MCP_PROFILE_DIR"
+PROFILE_KEEP_ENV = "MCP_PROFILE_KEEP"
+
+DEFAULT_KEEP = 50
+
+# Lines of each text report
+REPORT_LINES = 30
+
+# The profiled tool call the current task belongs to, if any. Tasks and
+# asyncio.to_thread() copy it, so work a call starts can find its profile.
+_current_call = contextvars.ContextVar("mcp_profiled_call", default=None)
+
+
+def profile_in_worker(func):
+    """
+    Return `func`, wrapped so that when it runs in a worker thread on behalf
+    of a profiled tool call, it is profiled there and added to that call's
+    profile. Returns `func` itself when no profiled call is running.
+
+    Until profiling is turned on this is the plain version below, which
+    hands `func` straight back; the first ToolProfiler swaps in
+    _profile_in_worker(). Look it up through the module
+    (profiling.profile_in_worker) so callers see the swap.
+    """
+    return func
+
+
+def _profile_in_worker(func):
+    call = _current_call.get()
+    if call is None:
+        return func
+    return functools.partial(call.run_in_worker, func)
+
+
+class _ProfiledCall:
+    """The worker-thread profiles collected for one profiled tool call"""
+
+    def __init__(self):
+        self.worker_profiles = []
+        self.unprofiled_workers = 0
+        self.finished = False
+        self._lock = threading.Lock()
+
+    def run_in_worker(self, func, *args):
+        if self.finished:
+            return func(*args)
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            # Python 3.12+ allows one profiler at a time per process; there
+            # the call's own profile already records every thread
+            with self._lock:
+                self.unprofiled_workers += 1
+            return func(*args)
+        try:
+            return func(*args)
+        finally:
+            profile.disable()
+            with self._lock:
+                if not self.finished:
+                    self.worker_profiles.append(profile)
+
+
+def profile_tool_calls(server_name):
+    """
+    Decorator for a call_tool handler that profiles the calls selected by
+    the MCP_PROFILE_* environment variables.
+
+    Returns the handler itself when profiling is off.
+    """
+    tools = os.environ.get(PROFILE_TOOLS_ENV, "").strip()
+
+    def decorator(handler):
+        if not tools:
+            return handler
+        profiler = ToolProfiler(
+            server_name,
+            tools=None if tools == "*" else {t.strip() for t in tools.split(",") if t.strip()},
+            every=int(os.environ.get(PROFILE_EVERY_ENV, 1)),
+            memory=os.environ.get(PROFILE_MEMORY_ENV, "") not in ("", "0"),
+            directory=os.environ.get(PROFILE_DIR_ENV) or Path(tempfile.gettempdir()) / "mcp-profiles",
+            keep=int(os.environ.get(PROFILE_KEEP_ENV, DEFAULT_KEEP)),
+        )
+        return profiler.wrap(handler)
+
+    return decorator
+
+
+class ToolProfiler:
+    """Profiles sampled calls of a call_tool handler and writes the results"""
+
+    def __init__(self, server_name, tools=None, every=1, memory=False, directory=None, keep=DEFAULT_KEEP):
+        self.server_name = server_name
+        self.tools = tools
+        self.every = max(1, every)
+        self.memory = memory
+        self.directory = Path(directory)
+        self.keep = keep
+        self.calls_seen = {}
+        self._busy = False
+        # Worker threads only need to look for a profiled call from now on
+        global profile_in_worker
+        profile_in_worker = _profile_in_worker
+
+    def wrap(self, handler):
+        @functools.wraps(handler)
+        async def profiled(name, arguments):
+            if not self._should_profile(name):
+                return await handler(name, arguments)
+            return await self._profile_call(handler, name, arguments)
+        return profiled
+
+    def _should_profile(self, name):
+        if self.tools is not None and name not in self.tools:
+            return False
+        seen = self.calls_seen.get(name, 0)
+        self.calls_seen[name] = seen + 1
+        # Only one call at a time: Python allows a single active profiler,
+        # so a call that overlaps a profiled one runs normally
+        return seen % self.every == 0 and not self._busy
+
+    async def _profile_call(self, handler, name, arguments):
+        self._busy = True
+        started_tracing = self.memory and not tracemalloc.is_tracing()
+        if started_tracing:
+            tracemalloc.start()
+        before = tracemalloc.take_snapshot() if self.memory else None
+        if self.memory:
+            tracemalloc.reset_peak()
+
+        # The profile covers the call from start to finish, including any
+        # other requests the event loop serves while this one awaits, plus
+        # the worker threads it hands work to through profile_in_worker()
+        call = _ProfiledCall()
+        token = _current_call.set(call)
+        profile = cProfile.Profile()
+        started = time.perf_counter()
+        profile.enable()
+        try:
+            return await handler(name, arguments)
+        finally:
+            profile.disable()
+            _current_call.reset(token)
+            with call._lock:
+                call.finished = True
+            elapsed = time.perf_counter() - started
+            after = peak = None
+            if self.memory:
+                after = tracemalloc.take_snapshot()
+                peak = tracemalloc.get_traced_memory()[1]
+                if started_tracing:
+                    tracemalloc.stop()
+            self._busy = False
+            try:
+                self._write(name, arguments, elapsed, profile, call, before, after, peak)
+            except OSError as e:
+                print(f"Could not write profile for {name}: {e}", file=sys.stderr)
+
+    def _write(self, name, arguments, elapsed, profile, call, before, after, peak):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        now = time.time_ns()
+        stem = "-".join([
+            self.server_name,
+            time.strftime("%Y%m%d-%H%M%S", time.localtime(now // 1_000_000_000)),
+            f"{now % 1_000_000_000:09d}",
+            name,
+            arguments_hash(arguments),
+        ])
+
+        report = io.StringIO()
+        stats = pstats.Stats(profile, stream=report)
+        for worker_profile in call.worker_profiles:
+            stats.add(worker_profile)
+
+        # Open the .prof file with snakeviz, or pstats.Stats(path) in Python
+        stats.dump_stats(self.directory / f"{stem}.prof")
+
+        report.write(f"{self.server_name}.{name} took {elapsed * 1000:.1f} ms\n")
+        report.write(
+            f"Includes {len(call.worker_profiles)} worker thread runs. Work done in worker "
+            "processes is not profiled: a slow call with little time listed here may have "
+            "spent it there.\n"
+        )
+        if call.unprofiled_workers:
+            report.write(
+                f"{call.unprofiled_workers} worker thread runs are in the main profile instead "
+                "(this Python allows only one profiler at a time).\n"
+            )
+        report.write("\n")
+        stats.sort_stats("cumulative").print_stats(REPORT_LINES)
+        (self.directory / f"{stem}.txt").write_text(report.getvalue(), encoding="utf-8")
+
+        if after is not None:
+            lines = [f"Peak traced memory: {peak / 1024:.1f} KiB", "", "Largest allocation changes:"]
+            for difference in after.compare_to(before, "lineno")[:REPORT_LINES]:
+                lines.append(str(difference))
+            (self.directory / f"{stem}.memory.txt").write_text("\n".join(lines) + "\n", encoding="utf-8")
+
+        self._rotate()
+
+    def _rotate(self):
+        """Delete this server's oldest profiles beyond the `keep` newest"""
+        files = sorted(self.directory.glob(f"{self.server_name}-*.prof"))
+        for old in files[:max(0, len(files) - self.keep)]:
+            stem = old.name[:-len(".prof")]
+            for path in (old, old.with_name(f"{stem}.txt"), old.with_name(f"{stem}.memory.txt")):
+                path.unlink(missing_ok=True)
+
+
+def arguments_hash(arguments):
+    """Short stable hash of a tool call's arguments"""
+    encoded = json.dumps(arguments, sort_keys=True, default=str).encode("utf-8")
+    return hashlib.sha1(encoded).hexdigest()[:10]
@@ -0,0 +1,64 @@
+"""
+Progress notifications for long tool calls
+
+A tool call normally says nothing until its result is ready. A client that
+would like to hear how a long call is going sends a progress token with its
+request, and the server may then send MCP progress notifications for it:
+how far along the call is, out of what total, plus a short message. The
+lesson servers use the message for partial results, such as the success
+rate over the part of the history scanned so far.
+
+ProgressReporter does nothing for clients that didn't send a token (but
+still gives a cancelled call the chance to stop), and sends at most one
+notification every MIN_INTERVAL_SECONDS so a fast loop can't flood the
+connection.
+"""
+
+import asyncio
+import time
+
+MIN_INTERVAL_SECONDS = 0.1
+
+
+class ProgressReporter:
+    """Sends progress notifications for the tool call being handled"""
+
+    def __init__(self, server, total=None, min_interval=MIN_INTERVAL_SECONDS):
+        try:
+            context = server.request_context
+        except LookupError:
+            # Not inside a request (for example, a handler called directly)
+            context = None
+        self._context = context
+        self._token = context.meta.progressToken if context is not None and context.meta else None
+        self.total = total
+        self.min_interval = min_interval
+        self.notifications_sent = 0
+        self._last_sent = None
+
+    @property
+    def enabled(self):
+        """True when the client asked for progress notifications"""
+        return self._token is not None
+
+    async def report(self, progress, message=None, total=None, force=False):
+        """
+        Report `progress` (out of `total`, if known). Skipped when another
+        notification went out less than `min_interval` seconds ago, unless
+        `force` is set (use it for the first and last report).
+
+        Always yields to the event loop, so a long loop that calls this
+        between steps can be cancelled there.
+        """
+        if total is not None:
+            self.total = total
+        now = time.monotonic()
+        if (self._token is None
+                or not force and self._last_sent is not None and now - self._last_sent < self.min_interval):
+            await asyncio.sleep(0)
+            return
+        self._last_sent = now
+        await self._context.session.send_progress_notification(
+            self._token, progress, self.total, message, related_request_id=self._context.request_id
+        )
+        self.notifications_sent += 1
@@ -0,0 +1,541 @@
+"""
+Log shipping to read replicas
+
+A memory or learning server on one machine can only answer so many reads.
+To spread read-heavy tools (search_memory, get_learning_insights, ...)
+over several machines, one server stays the primary, which takes every
+write, and the others run as read replicas, which keep a copy of its data
+and answer reads from it.
+
+The primary publishes its writes with a LogShipper: each batch of
+appended records becomes one segment file in a directory every machine
+can reach (a network share, or any local folder when trying it out on one
+machine):
+
+    segment-000000000042.jsonl
+        {"seq": 42, "base": false, "first": 1040, "count": 3, "bytes": 512, "sha256": "...", ...}
+        {...record 1040...}
+        {...record 1041...}
+        {...record 1042...}
+
+- Segments are numbered 1, 2, 3, ... and `first` is the position of the
+  segment's first record in the whole history.
+- A base segment holds the whole history. One is written when the shipped
+  log doesn't line up with the primary's data (the first start, a history
+  replaced by an import, records saved by a process that isn't shipping),
+  and by compaction once the segments since the last base add up to more
+  than the base itself. Segments older than the previous base are then
+  deleted.
+- Each segment is written under a hidden temporary name, synced to disk
+  and renamed, so readers never see half a segment. The SHA-256 checksum
+  in the first line catches segments damaged on the way (on a network
+  share, say).
+
+A replica's LogReplica polls the directory, reads the segments it hasn't
+applied yet in order, checks them, and applies them to its in-memory copy
+of the history: a base replaces it, any other segment is appended. A
+replica that falls so far behind that a segment it needs was deleted
+simply starts again from the newest base, and one that finds a damaged
+segment waits for the next base (compaction writes one eventually). Replicas report how far behind
+they are, in segments, records and seconds.
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import sys
+import time
+from contextlib import asynccontextmanager
+from pathlib import Path
+
+from mcp.types import TextContent, Tool
+
+SEGMENT_PREFIX = "segment-"
+SEGMENT_SUFFIX = ".jsonl"
+
+# How often a replica looks for new segments
+POLL_SECONDS = 0.5
+
+# Segments applied per poll at most, so catching up on a long backlog
+# happens in steps instead of one long pause
+MAX_SEGMENTS_PER_POLL = 256
+
+# Compaction writes a new base once the segments since the last one hold
+# more bytes than the base itself, and at least this many
+MIN_COMPACT_BYTES = 1_000_000
+
+
+class SegmentError(ValueError):
+    """A segment file that is damaged or doesn't fit the history"""
+
+
+def segment_name(seq):
+    return f"{SEGMENT_PREFIX}{seq:012d}{SEGMENT_SUFFIX}"
+
+
+def list_segments(directory):
+    """(seq, path) of every published segment in `directory`, oldest first"""
+    segments = []
+    with os.scandir(directory) as scan:
+        for entry in scan:
+            name = entry.name
+            if name.startswith(SEGMENT_PREFIX) and name.endswith(SEGMENT_SUFFIX):
+                seq = name[len(SEGMENT_PREFIX):-len(SEGMENT_SUFFIX)]
+                if seq.isdigit():
+                    segments.append((int(seq), Path(entry.path)))
+    segments.sort()
+    return segments
+
+
+def encode_record(record):
+    return json.dumps(record, ensure_ascii=False, separators=(",", ":"))
+
+
+def record_fingerprint(record):
+    """Short hash of one record, used to check that a history still ends the way the log does"""
+    return hashlib.sha256(encode_record(record).encode("utf-8")).hexdigest()[:16]
+
+
+def encode_segment(seq, base, first, records):
+    """A segment file's bytes: the header line, then one JSON record per line"""
+    payload = "".join(encode_record(record) + "\n" for record in records).encode("utf-8")
+    header = {
+        "seq": seq,
+        "base": base,
+        "first": first,
+        "count": len(records),
+        "bytes": len(payload),
+        "sha256": hashlib.sha256(payload).hexdigest(),
+        "tail": record_fingerprint(records[-1]) if records else None,
+        "created": time.time(),
+    }
+    return json.dumps(header).encode("utf-8") + b"\n" + payload
+
+
+def decode_segment(data):
+    """Return (header, records) from a segment file's bytes, checking the checksum"""
+    newline = data.find(b"\n")
+    if newline < 0:
+        raise SegmentError("segment has no header line")
+    header = json.loads(data[:newline])
+    payload = data[newline + 1:]
+    if len(payload) != header["bytes"] or hashlib.sha256(payload).hexdigest() != header["sha256"]:
+        raise SegmentError(f"checksum mismatch in segment {header.get('seq')}")
+    records = [json.loads(line) for line in payload.splitlines() if line.strip()]
+    if len(records) != header["count"]:
+        raise SegmentError(f"segment {header['seq']} holds {len(records)} records, expected {header['count']}")
+    return header, records
+
+
+def read_header(path):
+    with open(path, "rb") as f:
+        return json.loads(f.readline())
+
+
+def segment_end(header):
+    """Number of records in the history up to and including this segment"""
+    return header["first"] + header["count"]
+
+
+def add_replication_arguments(parser):
+    """Add the --ship-log and --replica-of options to a server's argument parser"""
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument("--ship-log", metavar="DIR",
+                       help="Publish every write to DIR as log segments that read replicas can follow")
+    group.add_argument("--replica-of", metavar="DIR",
+                       help="Run as a read-only replica of the primary that ships its log to DIR")
+
+
+class _ReplicationRole:
+    """The replication_status tool, shared by both sides"""
+
+    def tool_definition(self):
+        return Tool(
+            name="replication_status",
+            description=(
+                "Show this server's part in log shipping: as a primary, the segments it has "
+                "published; as a read replica, what it has applied and how far behind it is"
+            ),
+            inputSchema={
+                "type": "object",
+                "properties": {},
+                "required": []
+            }
+        )
+
+    def tool_result(self):
+        return [TextContent(type="text", text=json.dumps(self.status(), indent=2))]
+
+
+class LogShipper(_ReplicationRole):
+    """
+    Publishes a primary's appended records as segments in `directory`.
+
+    Call ship(), sync(), compact() and maintain() with the data file's
+    lock held, so several primary processes sharing one data file also
+    share one numbered log. Failures are reported, not raised: the data itself is
+    already saved, and the next call ships a new base if one is needed.
+    """
+
+    def __init__(self, directory):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.segments_written = 0
+        self.bases_written = 0
+        self.records_shipped = 0
+        self.bytes_shipped = 0
+        self.failures = 0
+        self.last_error = None
+
+        # True once the shipped log is known to match the store; until then
+        # (right after startup) maintenance_due() asks for a sync
+        self.synced = False
+
+        # The newest segment's header, the newest base's seq and size, and
+        # the bytes shipped since it, valid while the folder is unchanged
+        # since we last looked (another process may have shipped since)
+        self._head = None
+        self._base_seq = None
+        self._base_bytes = 0
+        self._bytes_since_base = 0
+        self._folder_signature = None
+
+    def ship(self, records, new_count):
+        """Publish the last `new_count` of `records` (the full history, just appended to)"""
+        def publish():
+            first = len(records) - new_count
+            if self._log_ends_at(records, first):
+                self._write(False, first, records[first:])
+            else:
+                self._write(True, 0, records)
+        self._guarded(publish)
+
+    def sync(self, records):
+        """Publish a base unless the shipped log already ends exactly at `records`"""
+        def publish():
+            if not self._log_ends_at(records, len(records)):
+                self._write(True, 0, records)
+        self._guarded(publish)
+
+    def compaction_due(self):
+        """True when the segments since the last base outweigh it (no disk access)"""
+        return self._base_seq is not None and self._bytes_since_base > max(MIN_COMPACT_BYTES, self._base_bytes)
+
+    def compact(self, records):
+        """Publish `records` as a new base so older segments can be deleted"""
+        self._guarded(lambda: self._write(True, 0, records))
+
+    def maintenance_due(self):
+        """True when maintain() has work to do; cheap enough for a maintenance due() check"""
+        return not self.synced or self.compaction_due()
+
+    def maintain(self, records):
+        """
+        Background upkeep, with the lock held: after startup, sync the log
+        with the store (so replicas can start before the first save), and
+        later compact it
+        """
+        if not self.synced:
+            self.sync(records)
+        elif self.compaction_due():
+            self.compact(records)
+
+    def status(self):
+        return {
+            "role": "primary",
+            "directory": str(self.directory),
+            "synced": self.synced,
+            "head_seq": self._head["seq"] if self._head else 0,
+            "head_records": segment_end(self._head) if self._head else 0,
+            "base_seq": self._base_seq,
+            "segments_written": self.segments_written,
+            "bases_written": self.bases_written,
+            "records_shipped": self.records_shipped,
+            "bytes_shipped": self.bytes_shipped,
+            "failures": self.failures,
+            "last_error": self.last_error,
+        }
+
+    def counters(self):
+        """Totals, in the form ServerStats.watch_counters() expects"""
+        return {
+            "replication_segments_shipped": self.segments_written,
+            "replication_records_shipped": self.records_shipped,
+            "replication_ship_failures": self.failures,
+        }
+
+    def _log_ends_at(self, records, count):
+        """True when the shipped log holds exactly records[:count]"""
+        head = self._head
+        if head is None or segment_end(head) != count:
+            return False
+        # Same length isn't enough: the history may have been replaced by
+        # another one as long, so the last record must match too
+        return count == 0 or head["tail"] == record_fingerprint(records[count - 1])
+
+    def _guarded(self, publish):
+        """Run publish() on up-to-date log state, reporting failures instead of raising"""
+        try:
+            self._refresh()
+            publish()
+            self.synced = True
+        except (OSError, ValueError) as e:
+            self.failures += 1
+            self.last_error = f"{type(e).__name__}: {e}"
+            self.synced = False
+            self._folder_signature = None
+            print(f"Log shipping failed: {self.last_error}", file=sys.stderr)
+
+    def _refresh(self):
+        """Re-read the newest segments if the folder changed since we last wrote"""
+        signature = _folder_signature(self.directory)
+        if signature == self._folder_signature:
+            return
+        self._head = None
+        self._base_seq = None
+        self._base_bytes = 0
+        self._bytes_since_base = 0
+        for seq, path in reversed(list_segments(self.directory)):
+            header = read_header(path)
+            if self._head is None:
+                self._head = header
+            if header["base"]:
+                self._base_seq = seq
+                self._base_bytes = header["bytes"]
+                break
+            self._bytes_since_base += header["bytes"]
+        self._folder_signature = signature
+
+    def _write(self, base, first, records):
+        seq = self._head["seq"] + 1 if self._head else 1
+        data = encode_segment(seq, base, first, records)
+        path = self.directory / segment_name(seq)
+        temp_path = self.directory / f".{path.name}.tmp"
+        with open(temp_path, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, path)
+
+        self._head = json.loads(data[:data.index(b"\n")])
+        self.segments_written += 1
+        self.records_shipped += len(records)
+        self.bytes_shipped += len(data)
+        if base:
+            self.bases_written += 1
+            previous_base, self._base_seq = self._base_seq, seq
+            self._base_bytes = self._head["bytes"]
+            self._bytes_since_base = 0
+            if previous_base is not None:
+                self._prune(previous_base)
+        else:
+            self._bytes_since_base += self._head["bytes"]
+        self._folder_signature = _folder_signature(self.directory)
+
+    def _prune(self, keep_from):
+        """Delete segments older than `keep_from` (replicas still reading them restart from a base)"""
+        for seq, path in list_segments(self.directory):
+            if seq >= keep_from:
+                break
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+
+
+class LogReplica(_ReplicationRole):
+    """
+    Follows the segments a LogShipper publishes in `directory`.
+
+    `records` is the replicated history. Applying a segment happens on the
+    event loop: a base replaces `records` with a new list and calls
+    on_reset(records); any other segment extends it in place and calls
+    on_append(new_records). Treat `records` as read-only.
+    """
+
+    def __init__(self, directory, on_append=None, on_reset=None, poll_seconds=POLL_SECONDS):
+        self.directory = Path(directory)
+        self.on_append = on_append
+        self.on_reset = on_reset
+        self.poll_seconds = poll_seconds
+        self.records = []
+        self.applied_seq = 0
+        self.resets = 0
+        self.segments_applied = 0
+        self.checksum_errors = 0
+        self.bytes_read = 0
+        self.last_error = None
+        self.last_poll = None
+
+        # What the newest published segment says, and when the oldest
+        # segment not applied yet was published (None when caught up)
+        self.head_seq = 0
+        self.head_records = 0
+        self.oldest_pending_created = None
+        self._task = None
+
+        # Set when a segment couldn't be applied (damaged, or not fitting
+        # the history): the replica then waits for the next base instead
+        self._needs_base = False
+
+    def fetch(self):
+        """
+        Read and check the segments to apply next, in order; call from a
+        worker thread and pass the result to apply() on the event loop
+        """
+        applied_seq = self.applied_seq
+        count = len(self.records)
+        segments = list_segments(self.directory)
+        if not segments:
+            return []
+        head = read_header(segments[-1][1])
+        self.head_seq = head["seq"]
+        self.head_records = segment_end(head)
+
+        pending = [(seq, path) for seq, path in segments if seq > applied_seq]
+        restarted = self.head_seq < applied_seq
+        if restarted:
+            # The primary's log was started over: follow the new one
+            pending = segments
+        if pending and (restarted or self._needs_base or pending[0][0] != applied_seq + 1):
+            # Segments we need were deleted, or one was damaged: start again
+            # from the newest base
+            start = None
+            for i in range(len(pending) - 1, -1, -1):
+                if read_header(pending[i][1])["base"]:
+                    start = i
+                    break
+            if start is None:
+                if not self._needs_base:
+                    self.last_error = f"segment {applied_seq + 1} is missing and no base follows it"
+                self.oldest_pending_created = read_header(pending[0][1])["created"]
+                return []
+            pending = pending[start:]
+            self._needs_base = False
+
+        fetched = []
+        expected_seq = None
+        for seq, path in pending[:MAX_SEGMENTS_PER_POLL]:
+            if expected_seq is not None and seq != expected_seq:
+                break
+            try:
+                data = path.read_bytes()
+                header, records = decode_segment(data)
+            except FileNotFoundError:
+                # Deleted by compaction while we were reading; the next
+                # poll starts from the new base
+                break
+            except (SegmentError, ValueError, KeyError) as e:
+                self.checksum_errors += 1
+                self.last_error = f"{path.name}: {e}"
+                self._needs_base = True
+                break
+            if not header["base"] and header["first"] != count:
+                self.last_error = f"{path.name} starts at record {header['first']}, expected {count}"
+                self._needs_base = True
+                break
+            self.bytes_read += len(data)
+            count = segment_end(header)
+            fetched.append((header, records))
+            expected_seq = seq + 1
+
+        remaining = pending[len(fetched):]
+        self.oldest_pending_created = read_header(remaining[0][1])["created"] if remaining else None
+        return fetched
+
+    def apply(self, fetched):
+        """Apply segments returned by fetch(); returns the number applied"""
+        for header, records in fetched:
+            if header["base"]:
+                self.records = records
+                self.resets += 1
+                if self.on_reset is not None:
+                    self.on_reset(self.records)
+            else:
+                self.records.extend(records)
+                if self.on_append is not None:
+                    self.on_append(records)
+            self.applied_seq = header["seq"]
+            self.segments_applied += 1
+        if fetched:
+            self.last_error = None
+        return len(fetched)
+
+    async def poll(self):
+        """Fetch new segments in a worker thread and apply them"""
+        fetched = await asyncio.to_thread(self.fetch)
+        self.last_poll = time.time()
+        return self.apply(fetched)
+
+    @asynccontextmanager
+    async def running(self):
+        """Follow the primary's log for the duration of the with-block"""
+        self._task = asyncio.get_running_loop().create_task(self._follow())
+        try:
+            yield self
+        finally:
+            task, self._task = self._task, None
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+
+    def lag(self):
+        """How far behind the primary's newest segment this replica is"""
+        behind = max(0, self.head_seq - self.applied_seq)
+        return {
+            "segments": behind,
+            "records": max(0, self.head_records - len(self.records)),
+            "seconds": round(max(0.0, time.time() - self.oldest_pending_created), 3)
+            if behind and self.oldest_pending_created is not None else 0.0,
+        }
+
+    def status(self):
+        lag = self.lag()
+        return {
+            "role": "replica",
+            "directory": str(self.directory),
+            "records": len(self.records),
+            "applied_seq": self.applied_seq,
+            "head_seq": self.head_seq,
+            "lag_segments": lag["segments"],
+            "lag_records": lag["records"],
+            "lag_seconds": lag["seconds"],
+            "segments_applied": self.segments_applied,
+            "resets": self.resets,
+            "checksum_errors": self.checksum_errors,
+            "last_poll_age_s": round(time.time() - self.last_poll, 3) if self.last_poll else None,
+            "last_error": self.last_error,
+        }
+
+    def counters(self):
+        """Lag and totals, in the form ServerStats.watch_counters() expects"""
+        lag = self.lag()
+        return {
+            "replication_lag_segments": lag["segments"],
+            "replication_lag_records": lag["records"],
+            "replication_lag_seconds": lag["seconds"],
+            "replication_segments_applied": self.segments_applied,
+            "replication_checksum_errors": self.checksum_errors,
+        }
+
+    async def _follow(self):
+        while True:
+            try:
+                applied = await self.poll()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.last_error = f"{type(e).__name__}: {e}"
+                print(f"Replication poll failed: {self.last_error}", file=sys.stderr)
+                applied = 0
+            # Keep going straight away while there's a backlog to catch up on
+            if applied < MAX_SEGMENTS_PER_POLL:
+                await asyncio.sleep(self.poll_seconds)
+
+
+def _folder_signature(directory):
+    info = os.stat(directory)
+    return info.st_ino, info.st_mtime_ns
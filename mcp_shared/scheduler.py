@@ -0,0 +1,269 @@
+"""
+Bounded, lock-aware execution of tool work
+
+A tool handler is an async function, but reading a file or scanning a
+large history inside it blocks the event loop: every other request waits,
+and a long analysis holds up even the cheapest read. ToolScheduler runs
+that work in threads instead, and adds the rules a busy server needs:
+
+- Lanes: each kind of work (for example quick "interactive" calls and
+  heavy "analysis" calls) has its own limit on how many calls run at once
+  and how many may wait. A call that would exceed the waiting limit is
+  rejected straight away with ServerBusy, instead of queueing forever.
+- Resource locks: a call names the files it reads and writes. Any number
+  of readers may share a file, but a writer gets it alone, so only calls
+  that actually conflict wait for each other.
+- Timeouts and cancellation: a call can be given a time limit, and a call
+  cancelled by the client stops waiting immediately. A thread can't be
+  interrupted, so the call's locks and slot are only handed back once its
+  thread has finished; nothing ever writes a file someone else now owns.
+"""
+
+import asyncio
+import functools
+from collections import deque
+
+from mcp_shared import profiling
+
+# Default lanes: (calls running at once, calls allowed to wait)
+DEFAULT_LANES = {
+    "interactive": (8, 64),
+    "analysis": (1, 4),
+}
+
+
+class SchedulerError(Exception):
+    """Base class for calls the scheduler refused or gave up on"""
+
+
+class ServerBusy(SchedulerError):
+    """Raised when a lane's waiting limit is reached"""
+
+
+class ToolTimeout(SchedulerError):
+    """Raised when a call runs past its time limit"""
+
+
+class AsyncRWLock:
+    """
+    Readers-writer lock for asyncio tasks.
+
+    Waiters are served in arrival order, with consecutive readers let in
+    together, so a steady stream of readers can't starve a writer. Releasing
+    is a plain method, so it can be done from a callback.
+    """
+
+    def __init__(self):
+        self._readers = 0
+        self._writer = False
+        self._waiters = deque()
+
+    async def acquire_read(self):
+        if not self._writer and not self._waiters:
+            self._readers += 1
+            return
+        await self._wait(writer=False)
+
+    async def acquire_write(self):
+        if not self._writer and not self._readers and not self._waiters:
+            self._writer = True
+            return
+        await self._wait(writer=True)
+
+    def release_read(self):
+        self._readers -= 1
+        self._wake()
+
+    def release_write(self):
+        self._writer = False
+        self._wake()
+
+    @property
+    def idle(self):
+        return not self._readers and not self._writer and not self._waiters
+
+    async def _wait(self, writer):
+        waiter = (writer, asyncio.get_running_loop().create_future())
+        self._waiters.append(waiter)
+        try:
+            await waiter[1]
+        except asyncio.CancelledError:
+            if waiter[1].done() and not waiter[1].cancelled():
+                # Granted just as we were cancelled: hand it straight back
+                self.release_write() if writer else self.release_read()
+            else:
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+                self._wake()
+            raise
+
+    def _wake(self):
+        while self._waiters:
+            writer, future = self._waiters[0]
+            if future.done():
+                self._waiters.popleft()
+                continue
+            if writer:
+                if self._writer or self._readers:
+                    return
+                self._waiters.popleft()
+                self._writer = True
+                future.set_result(None)
+                return
+            if self._writer:
+                return
+            self._waiters.popleft()
+            self._readers += 1
+            future.set_result(None)
+
+
+class Lane:
+    """Concurrency and queue limits for one kind of work"""
+
+    def __init__(self, name, max_running, max_waiting):
+        self.name = name
+        self.max_running = max_running
+        self.max_waiting = max_waiting
+        self.running = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.timeouts = 0
+        self._queue = deque()
+
+    @property
+    def waiting(self):
+        """Admitted calls that are not running yet"""
+        return max(0, self.admitted - self.max_running)
+
+    async def acquire_slot(self):
+        if self.running < self.max_running and not self._queue:
+            self.running += 1
+            return
+        future = asyncio.get_running_loop().create_future()
+        self._queue.append(future)
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                self.release_slot()
+            else:
+                self._queue.remove(future)
+            raise
+
+    def release_slot(self):
+        # Hand the slot straight to the next waiting call, if any
+        while self._queue:
+            future = self._queue.popleft()
+            if not future.done():
+                future.set_result(None)
+                return
+        self.running -= 1
+
+
+class ToolScheduler:
+    """
+    Runs tool work in bounded lanes with per-resource read/write locks.
+
+    Blocking functions go through run(), which executes them on the event
+    loop's default thread pool; async work that should obey the same limits
+    goes through run_async().
+    """
+
+    def __init__(self, lanes=None):
+        self.lanes = {
+            name: Lane(name, running, waiting)
+            for name, (running, waiting) in (lanes or DEFAULT_LANES).items()
+        }
+        self._locks = {}
+
+    async def run(self, func, *args, lane="interactive", reads=(), writes=(), timeout=None):
+        """Run blocking `func(*args)` in a thread and return its result"""
+        lane = self._admit(lane)
+        try:
+            return await asyncio.wait_for(self._run_in_thread(lane, func, args, reads, writes), timeout)
+        except asyncio.TimeoutError:
+            lane.timeouts += 1
+            raise ToolTimeout(f"Gave up after {timeout:g} seconds; try a narrower request") from None
+        finally:
+            lane.admitted -= 1
+
+    async def run_async(self, coroutine_function, *args, lane="interactive", reads=(), writes=(), timeout=None):
+        """Await `coroutine_function(*args)` under the same lane limits and locks"""
+        lane = self._admit(lane)
+        try:
+            return await asyncio.wait_for(
+                self._run_coroutine(lane, coroutine_function, args, reads, writes), timeout
+            )
+        except asyncio.TimeoutError:
+            lane.timeouts += 1
+            raise ToolTimeout(f"Gave up after {timeout:g} seconds; try a narrower request") from None
+        finally:
+            lane.admitted -= 1
+
+    def counters(self):
+        """Per-lane totals, in the form ServerStats.watch_counters() expects"""
+        counters = {}
+        for lane in self.lanes.values():
+            counters[f"scheduler_{lane.name}_rejected"] = lane.rejected
+            counters[f"scheduler_{lane.name}_timeouts"] = lane.timeouts
+        return counters
+
+    def _admit(self, lane_name):
+        lane = self.lanes[lane_name]
+        if lane.waiting >= lane.max_waiting:
+            lane.rejected += 1
+            raise ServerBusy(
+                f"Server busy: {lane.waiting} {lane_name} calls already waiting; try again shortly"
+            )
+        lane.admitted += 1
+        return lane
+
+    async def _acquire(self, lane, reads, writes):
+        """Take the resource locks (in a fixed order, so two calls can't deadlock) and a lane slot"""
+        writes = {str(resource) for resource in writes}
+        reads = {str(resource) for resource in reads} - writes
+        held = []
+        try:
+            for resource in sorted(reads | writes):
+                lock = self._locks.setdefault(resource, AsyncRWLock())
+                if resource in writes:
+                    await lock.acquire_write()
+                    held.append((resource, lock.release_write))
+                else:
+                    await lock.acquire_read()
+                    held.append((resource, lock.release_read))
+            await lane.acquire_slot()
+        except BaseException:
+            self._release(held)
+            raise
+        return held
+
+    def _release(self, held, lane=None):
+        for resource, release in reversed(held):
+            release()
+            lock = self._locks.get(resource)
+            if lock is not None and lock.idle:
+                del self._locks[resource]
+        if lane is not None:
+            lane.release_slot()
+
+    async def _run_in_thread(self, lane, func, args, reads, writes):
+        held = await self._acquire(lane, reads, writes)
+        future = asyncio.get_running_loop().run_in_executor(None, functools.partial(profiling.profile_in_worker(func), *args))
+        try:
+            return await asyncio.shield(future)
+        except asyncio.CancelledError:
+            # The thread keeps going; give back locks and slot when it ends
+            release_later, held = held, None
+            future.add_done_callback(lambda _: self._release(release_later, lane))
+            raise
+        finally:
+            if held is not None:
+                self._release(held, lane)
+
+    async def _run_coroutine(self, lane, coroutine_function, args, reads, writes):
+        held = await self._acquire(lane, reads, writes)
+        try:
+            return await coroutine_function(*args)
+        finally:
+            self._release(held, lane)
@@ -0,0 +1,105 @@
+"""
+Startup timing and warm-up for stdio servers
+
+Claude Desktop starts a stdio server when a conversation first needs it,
+so every moment the server spends starting up is a moment the user waits.
+StartupTimer measures where that time goes, phase by phase:
+
+    imports      from the first line of server.py until the timer is
+                 created (mostly importing the MCP SDK)
+    setup        from then until the server starts reading requests
+    handshake    from then until the client has finished the MCP handshake
+                 (its "initialized" notification)
+    store_load   the first load of the server's data, during the first tool
+                 call that needs it (or during the warm-up)
+    warm_up      how long the optional warm-up took
+
+The server_stats tool reports each phase as a startup_<phase>_seconds
+counter. With MCP_STARTUP_LOG=1 the phases are also written to stderr as
+soon as the handshake is done (Claude Desktop keeps a server's stderr in
+its log files).
+
+The memory and learning servers load their data lazily, on the first tool
+call that needs it, so a large data file never holds up the handshake.
+Start them with --warm-up to load it in the background right after the
+handshake instead, so that the first call doesn't wait either.
+"""
+
+import asyncio
+import os
+import sys
+import time
+from contextlib import contextmanager
+
+from mcp.types import InitializedNotification
+
+STARTUP_LOG_ENV = "MCP_STARTUP_LOG"
+
+
+class StartupTimer:
+    """
+    Records how long each startup phase of one server took.
+
+    Create it right after the server's imports, passing the
+    time.perf_counter() value taken on the first line of server.py, and
+    call watch(server) so the handshake is timed too.
+    """
+
+    def __init__(self, server_name, started):
+        self.server_name = server_name
+        self.phases = {}
+        self._last_mark = started
+        self._warm_up = None
+        self._warm_up_task = None
+        self.mark("imports")
+
+    def mark(self, phase):
+        """Record the time since the previous mark as `phase` (once)"""
+        now = time.perf_counter()
+        self.phases.setdefault(phase, now - self._last_mark)
+        self._last_mark = now
+
+    @contextmanager
+    def first(self, phase):
+        """Time the with-block as `phase`, but only the first time it succeeds"""
+        if phase in self.phases:
+            yield
+            return
+        started = time.perf_counter()
+        yield
+        self.phases.setdefault(phase, time.perf_counter() - started)
+
+    def watch(self, server, warm_up=None):
+        """
+        Time the handshake of `server` (a low-level mcp Server), and run the
+        async function `warm_up` in the background once it is done.
+        """
+        self._warm_up = warm_up
+        server.notification_handlers[InitializedNotification] = self._handshake_done
+
+    def serving(self):
+        """Call just before the server starts reading requests"""
+        self.mark("setup")
+
+    def counters(self):
+        """The phases, in the form ServerStats.watch_counters() expects"""
+        return {f"startup_{phase}_seconds": seconds for phase, seconds in self.phases.items()}
+
+    async def _handshake_done(self, notification):
+        # Over HTTP every client has its own handshake; the first one counts
+        if "handshake" in self.phases:
+            return
+        self.mark("handshake")
+        if os.environ.get(STARTUP_LOG_ENV) == "1":
+            phases = ", ".join(f"{phase} {seconds * 1000:.0f}ms" for phase, seconds in self.phases.items())
+            print(f"{self.server_name} started: {phases}", file=sys.stderr)
+        if self._warm_up is not None and self._warm_up_task is None:
+            self._warm_up_task = asyncio.get_running_loop().create_task(self._run_warm_up())
+
+    async def _run_warm_up(self):
+        try:
+            with self.first("warm_up"):
+                await self._warm_up()
+        except Exception as e:
+            # The data is simply loaded on first use instead
+            print(f"{self.server_name} warm-up failed: {e}", file=sys.stderr)
@@ -0,0 +1,322 @@
+"""
+Per-tool latency and I/O statistics for the lesson servers
+
+When a tool feels slow it helps to know whether every call is slow or only
+a few, and whether the time goes into reading files, parsing JSON or the
+tool's own logic. ServerStats keeps that information in memory:
+
+- a call count, error count and latency histogram for every tool
+- counters the server bumps itself (bytes read and written, JSON parse time)
+- hit rates of the server's caches
+
+The numbers are returned by a `server_stats` tool and can also be written
+to a Prometheus text file every few seconds by setting MCP_STATS_FILE.
+Recording one call costs two clock reads and a few dictionary updates,
+which is tiny next to even the cheapest MCP request.
+"""
+
+import asyncio
+import functools
+import json
+import os
+import sys
+import time
+from contextlib import contextmanager
+
+from mcp.types import TextContent, Tool
+
+# Latency buckets per power of two. 16 keeps every reported percentile
+# within about 6% of the true value (the same idea as an HDR histogram).
+SUB_BUCKETS = 16
+_SUB_BUCKET_BITS = SUB_BUCKETS.bit_length() - 1
+
+PERCENTILES = (50, 90, 95, 99, 99.9)
+
+# Environment variables that turn on the Prometheus text file
+STATS_FILE_ENV = "MCP_STATS_FILE"
+STATS_INTERVAL_ENV = "MCP_STATS_INTERVAL"
+DEFAULT_EXPORT_INTERVAL = 15.0
+
+
+class LatencyHistogram:
+    """
+    Log-linear histogram of latencies, counted in whole microseconds.
+
+    Values below SUB_BUCKETS microseconds get a bucket each; above that,
+    every power of two is split into SUB_BUCKETS equal buckets. Memory use
+    only grows with the number of distinct buckets actually hit.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.total_us = 0
+        self.min_us = None
+        self.max_us = 0
+        self._buckets = {}
+
+    def record(self, seconds):
+        value = int(seconds * 1_000_000)
+        self.count += 1
+        self.total_us += value
+        if self.min_us is None or value < self.min_us:
+            self.min_us = value
+        if value > self.max_us:
+            self.max_us = value
+        index = _bucket_index(value)
+        self._buckets[index] = self._buckets.get(index, 0) + 1
+
+    def percentile(self, percent):
+        """Latency (microseconds) that `percent`% of calls finished within"""
+        if not self.count:
+            return 0
+        rank = max(1, -(-self.count * percent // 100))
+        seen = 0
+        for index in sorted(self._buckets):
+            seen += self._buckets[index]
+            if seen >= rank:
+                return min(_bucket_upper_bound(index), self.max_us)
+        return self.max_us
+
+    def cumulative_buckets(self):
+        """(upper bound in microseconds, calls at or below it) pairs, ascending"""
+        seen = 0
+        for index in sorted(self._buckets):
+            seen += self._buckets[index]
+            yield _bucket_upper_bound(index), seen
+
+    def summary(self):
+        """Latency summary in milliseconds"""
+        summary = {
+            "count": self.count,
+            "mean_ms": round(self.total_us / self.count / 1000, 3) if self.count else 0,
+            "min_ms": round((self.min_us or 0) / 1000, 3),
+            "max_ms": round(self.max_us / 1000, 3),
+        }
+        for percent in PERCENTILES:
+            summary[f"p{percent:g}_ms"] = round(self.percentile(percent) / 1000, 3)
+        return summary
+
+
+def _bucket_index(value):
+    if value < SUB_BUCKETS:
+        return value
+    shift = value.bit_length() - _SUB_BUCKET_BITS - 1
+    return SUB_BUCKETS * (shift + 1) + (value >> shift) - SUB_BUCKETS
+
+
+def _bucket_upper_bound(index):
+    if index < SUB_BUCKETS:
+        return index
+    shift, offset = divmod(index - SUB_BUCKETS, SUB_BUCKETS)
+    return ((SUB_BUCKETS + offset + 1) << shift) - 1
+
+
+class ToolCounters:
+    """Calls, errors and latencies of one tool"""
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.latency = LatencyHistogram()
+
+
+class ServerStats:
+    """
+    Statistics registry for one MCP server.
+
+    Wrap the call_tool handler with instrument() to time every tool, call
+    count() and timer() where the server reads, writes or parses data, and
+    register caches with watch_cache(). Objects that keep their own totals
+    (such as a storage class) can be reported with watch_counters().
+    """
+
+    def __init__(self, server_name):
+        self.server_name = server_name
+        self.started_at = time.time()
+        self.tools = {}
+        self.counters = {}
+        self._counter_sources = []
+        self._caches = {}
+        self._included = []
+        self._export_task = None
+
+        # Tool calls running right now, and when the last one finished
+        # (time.monotonic()), so background work can wait for a quiet moment
+        self.in_flight = 0
+        self.last_call_finished = None
+
+    def instrument(self, handler):
+        """Decorator for a call_tool handler that records every call"""
+        @functools.wraps(handler)
+        async def instrumented(name, arguments):
+            started = time.perf_counter()
+            failed = True
+            self.in_flight += 1
+            try:
+                result = await handler(name, arguments)
+                failed = False
+                return result
+            finally:
+                self.in_flight -= 1
+                self.last_call_finished = time.monotonic()
+                tool = self.tools.get(name)
+                if tool is None:
+                    tool = self.tools[name] = ToolCounters()
+                tool.calls += 1
+                tool.errors += failed
+                tool.latency.record(time.perf_counter() - started)
+        return instrumented
+
+    def count(self, counter, amount=1):
+        """Add `amount` to a named counter such as bytes_read"""
+        self.counters[counter] = self.counters.get(counter, 0) + amount
+
+    @contextmanager
+    def timer(self, counter):
+        """Add the time spent inside the with-block to a seconds counter"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.count(counter, time.perf_counter() - started)
+
+    def watch_counters(self, read_counters):
+        """Also report the counters in the dictionary `read_counters()` returns"""
+        self._counter_sources.append(read_counters)
+
+    def all_counters(self):
+        """Counters bumped through count() plus every watched source"""
+        counters = dict(self.counters)
+        for read_counters in self._counter_sources:
+            for name, value in read_counters().items():
+                counters[name] = counters.get(name, 0) + value
+        return counters
+
+    def watch_cache(self, name, read_counts):
+        """Report a cache's hit rate; `read_counts()` returns (hits, misses)"""
+        self._caches[name] = read_counts
+
+    def include(self, other):
+        """
+        Report another server's statistics as part of this one's, for a
+        process that hosts several servers (see combined-server/server.py)
+        """
+        self._included.append(other)
+
+    def snapshot(self):
+        """All statistics as a JSON-friendly dictionary"""
+        caches = {}
+        for name, read_counts in self._caches.items():
+            hits, misses = read_counts()
+            lookups = hits + misses
+            caches[name] = {
+                "hits": hits,
+                "misses": misses,
+                "hit_rate": round(hits / lookups, 4) if lookups else None,
+            }
+        snapshot = {
+            "server": self.server_name,
+            "uptime_s": round(time.time() - self.started_at, 1),
+            "tools": {
+                name: {"calls": tool.calls, "errors": tool.errors, "latency": tool.latency.summary()}
+                for name, tool in sorted(self.tools.items())
+            },
+            "counters": {name: _round_counter(value) for name, value in sorted(self.all_counters().items())},
+            "caches": caches,
+        }
+        if self._included:
+            snapshot["servers"] = {other.server_name: other.snapshot() for other in self._included}
+        return snapshot
+
+    def tool_definition(self):
+        """The server_stats tool, for adding to a server's list_tools result"""
+        return Tool(
+            name="server_stats",
+            description=(
+                "Show this server's performance statistics: calls, errors and latency "
+                "percentiles for every tool, bytes read and written, and cache hit rates"
+            ),
+            inputSchema={
+                "type": "object",
+                "properties": {},
+                "required": []
+            }
+        )
+
+    def tool_result(self):
+        """Response for a server_stats call"""
+        return [TextContent(type="text", text=json.dumps(self.snapshot(), indent=2))]
+
+    def prometheus_text(self):
+        """All statistics (including included servers') in the Prometheus text format"""
+        samples = {}
+        for stats in [self] + self._included:
+            stats._add_prometheus_samples(samples)
+
+        lines = []
+        for (metric, kind), metric_samples in samples.items():
+            lines.append(f"# TYPE {metric} {kind}")
+            lines.extend(metric_samples)
+        return "\n".join(lines) + "\n"
+
+    def _add_prometheus_samples(self, samples):
+        """Add this server's samples to `samples`, grouped by (metric, type)"""
+        def add(metric, kind, line):
+            samples.setdefault((metric, kind), []).append(line)
+
+        label = f'server="{self.server_name}"'
+        for name, tool in sorted(self.tools.items()):
+            labels = f'{label},tool="{name}"'
+            add("mcp_tool_calls_total", "counter", f"mcp_tool_calls_total{{{labels}}} {tool.calls}")
+            add("mcp_tool_errors_total", "counter", f"mcp_tool_errors_total{{{labels}}} {tool.errors}")
+            histogram = [
+                f'mcp_tool_latency_seconds_bucket{{{labels},le="{upper_us / 1e6:g}"}} {seen}'
+                for upper_us, seen in tool.latency.cumulative_buckets()
+            ]
+            histogram.append(f'mcp_tool_latency_seconds_bucket{{{labels},le="+Inf"}} {tool.latency.count}')
+            histogram.append(f"mcp_tool_latency_seconds_sum{{{labels}}} {tool.latency.total_us / 1e6:g}")
+            histogram.append(f"mcp_tool_latency_seconds_count{{{labels}}} {tool.latency.count}")
+            for line in histogram:
+                add("mcp_tool_latency_seconds", "histogram", line)
+
+        for name, value in sorted(self.all_counters().items()):
+            add(f"mcp_{name}_total", "counter", f"mcp_{name}_total{{{label}}} {value:g}")
+
+        for name, read_counts in sorted(self._caches.items()):
+            hits, misses = read_counts()
+            add("mcp_cache_hits_total", "counter", f'mcp_cache_hits_total{{{label},cache="{name}"}} {hits}')
+            add("mcp_cache_misses_total", "counter", f'mcp_cache_misses_total{{{label},cache="{name}"}} {misses}')
+
+    def write_prometheus_file(self, path):
+        """Write prometheus_text() to `path`, replacing it atomically"""
+        temp_path = f"{path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            f.write(self.prometheus_text())
+        os.replace(temp_path, path)
+
+    def start_prometheus_export(self):
+        """
+        Start writing the Prometheus file in the background if MCP_STATS_FILE
+        is set (every MCP_STATS_INTERVAL seconds, default 15). Call from the
+        server's main(); returns the background task, or None when disabled.
+        """
+        path = os.environ.get(STATS_FILE_ENV)
+        if not path:
+            return None
+        interval = float(os.environ.get(STATS_INTERVAL_ENV, DEFAULT_EXPORT_INTERVAL))
+        # Keep a reference: the event loop only holds tasks weakly
+        self._export_task = asyncio.create_task(self._export_forever(path, interval))
+        return self._export_task
+
+    async def _export_forever(self, path, interval):
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                self.write_prometheus_file(path)
+            except OSError as e:
+                # Stats must never take the server down; stderr shows up in Claude Desktop's logs
+                print(f"Could not write {path}: {e}", file=sys.stderr)
+
+
+def _round_counter(value):
+    return round(value, 6) if isinstance(value, float) else value
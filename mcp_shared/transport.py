@@ -0,0 +1,120 @@
+"""
+HTTP transports for the lesson servers
+
+Over stdio, every Claude client starts its own copy of a server: its own
+cold caches, its own full load of the data files, and its own writes racing
+the other copies. Serving over HTTP instead lets one long-lived process
+answer many clients at once. They all share the process's warm in-memory
+data, and its writes are already serialized by the event loop (and the
+group committers in the memory and learning servers).
+
+Two HTTP transports are supported:
+
+- "http": Streamable HTTP, the current MCP transport, at /mcp
+- "sse": the older HTTP + Server-Sent Events transport, at /sse (with
+  messages POSTed to /messages/), for clients that don't speak Streamable
+  HTTP yet
+
+The server only ever listens on the local machine, and requests whose Host
+or Origin header isn't local are refused (this blocks DNS rebinding, where
+a web page in your browser tries to talk to local servers).
+
+The HTTP libraries are imported only when an HTTP transport is chosen, so
+stdio keeps working with any MCP SDK version; HTTP needs mcp 1.8 or newer.
+"""
+
+import argparse
+
+TRANSPORTS = ("stdio", "http", "sse")
+LOCAL_HOSTS = ("127.0.0.1", "localhost", "::1")
+DEFAULT_HOST = "127.0.0.1"
+
+STREAMABLE_HTTP_PATH = "/mcp"
+SSE_PATH = "/sse"
+SSE_MESSAGES_PATH = "/messages/"
+
+
+def add_transport_arguments(parser, default_port):
+    """Add --transport, --host and --port options to an ArgumentParser"""
+    parser.add_argument("--transport", choices=TRANSPORTS, default="stdio",
+                        help="How clients connect: stdio (default, one client per process), "
+                             "http (Streamable HTTP) or sse (HTTP + Server-Sent Events)")
+    parser.add_argument("--host", type=local_host, default=DEFAULT_HOST,
+                        help=f"Local address to listen on for http/sse (default: {DEFAULT_HOST})")
+    parser.add_argument("--port", type=int, default=default_port,
+                        help=f"Port to listen on for http/sse (default: {default_port})")
+
+
+def local_host(host):
+    """argparse type that only accepts addresses on this machine"""
+    if host not in LOCAL_HOSTS:
+        raise argparse.ArgumentTypeError(
+            f"{host!r} is not a local address; use one of {', '.join(LOCAL_HOSTS)}"
+        )
+    return host
+
+
+def local_security_settings():
+    """Only accept requests addressed to, and coming from, this machine"""
+    from mcp.server.transport_security import TransportSecuritySettings
+
+    return TransportSecuritySettings(
+        enable_dns_rebinding_protection=True,
+        allowed_hosts=["127.0.0.1:*", "localhost:*", "[::1]:*"],
+        allowed_origins=["http://127.0.0.1:*", "http://localhost:*", "http://[::1]:*"],
+    )
+
+
+def build_http_app(server, initialization_options, transport="http"):
+    """The Starlette application serving `server` over an HTTP transport"""
+    from starlette.applications import Starlette
+    from starlette.responses import Response
+    from starlette.routing import Mount, Route
+
+    if transport == "http":
+        from mcp.server.streamable_http_manager import StreamableHTTPSessionManager
+
+        # Streamable HTTP sessions always use the server's own
+        # create_initialization_options(), so initialization_options is unused here
+        session_manager = StreamableHTTPSessionManager(app=server, security_settings=local_security_settings())
+        return Starlette(
+            routes=[Route(STREAMABLE_HTTP_PATH, endpoint=_SessionManagerApp(session_manager))],
+            lifespan=lambda app: session_manager.run(),
+        )
+
+    if transport == "sse":
+        from mcp.server.sse import SseServerTransport
+
+        sse = SseServerTransport(SSE_MESSAGES_PATH, security_settings=local_security_settings())
+
+        async def handle_sse(request):
+            async with sse.connect_sse(request.scope, request.receive, request._send) as streams:
+                await server.run(streams[0], streams[1], initialization_options)
+            return Response()
+
+        return Starlette(routes=[
+            Route(SSE_PATH, endpoint=handle_sse, methods=["GET"]),
+            Mount(SSE_MESSAGES_PATH, app=sse.handle_post_message),
+        ])
+
+    raise ValueError(f"Unknown HTTP transport: {transport}")
+
+
+async def serve_http(server, initialization_options, transport="http", host=DEFAULT_HOST, port=8000):
+    """Serve `server` to any number of local clients until the process is stopped"""
+    import uvicorn
+
+    host = local_host(host)
+    app = build_http_app(server, initialization_options, transport)
+    config = uvicorn.Config(app, host=host, port=port, log_level="warning")
+    await uvicorn.Server(config).serve()
+
+
+class _SessionManagerApp:
+    """ASGI adapter, so Starlette passes raw requests to the session manager"""
+
+    def __init__(self, session_manager):
+        self.session_manager = session_manager
+
+    async def __call__(self, scope, receive, send):
+        await self.session_manager.handle_request(scope, receive, send)
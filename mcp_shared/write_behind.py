@@ -0,0 +1,257 @@
+"""
+Write-behind saving for files that are rewritten whole
+
+Writing a file directly has two problems. If the process dies halfway
+through, the file is left cut short. And an agent that saves the same
+file several times in a row pays for every one of those writes, even
+though only the last version matters.
+
+WriteBehindBuffer fixes both:
+
+- Each file is written to a temporary file in the same folder, which is
+  then renamed over the old one, so the file on disk is always either the
+  old version or the new one, never half of each.
+- Saves of the same file that arrive before it is written replace each
+  other, so a burst of saves becomes a single write ("coalescing").
+- Reads in this process check the buffer first, so they always see the
+  latest save even before it reaches the disk.
+- flush() writes everything staged right away, and everything is flushed
+  when the server shuts down.
+
+The durability level decides when save() returns, and how hard each write
+tries to survive a power cut:
+
+    none       save() returns as soon as the save is staged; a background
+               task writes it after a short delay (rename only). Fastest,
+               but a save is lost if the process dies before that write
+    fsync      save() returns once the file's data is on disk and renamed
+               into place. Saves made while an earlier write is under way
+               are written together by the next one
+    fsync-dir  fsync, and also sync the folder so the rename itself is on
+               disk (the slowest, and the only level that fully survives
+               a power cut on every file system)
+"""
+
+import asyncio
+import os
+import sys
+import time
+from contextlib import asynccontextmanager
+from pathlib import Path
+
+DURABILITY_LEVELS = ("none", "fsync", "fsync-dir")
+DEFAULT_DURABILITY = "fsync"
+
+# How long a staged save waits before it is written, so saves that follow
+# it closely are written together
+FLUSH_DELAY_SECONDS = 0.5
+
+
+def write_file_atomically(path, data, durability=DEFAULT_DURABILITY):
+    """Replace `path` with `data` via a temporary file and a rename"""
+    if durability not in DURABILITY_LEVELS:
+        raise ValueError(f"Unknown durability {durability!r}; use one of {', '.join(DURABILITY_LEVELS)}")
+    path = Path(path)
+    # One temporary name per process, so two servers saving the same file
+    # don't write into each other's temporary file
+    temp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    try:
+        with open(temp_path, "wb") as f:
+            f.write(data)
+            if durability != "none":
+                f.flush()
+                os.fsync(f.fileno())
+        os.replace(temp_path, path)
+    except BaseException:
+        try:
+            temp_path.unlink()
+        except OSError:
+            pass
+        raise
+    if durability == "fsync-dir":
+        sync_directory(path.parent)
+
+
+def sync_directory(directory):
+    """fsync a folder, so renames inside it are on disk (a no-op on Windows)"""
+    if sys.platform == "win32":
+        return
+    fd = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def add_write_behind_arguments(parser, default_delay=FLUSH_DELAY_SECONDS):
+    """Add the --durability and --flush-delay options to a server's argument parser"""
+    parser.add_argument("--durability", choices=DURABILITY_LEVELS, default=DEFAULT_DURABILITY,
+                        help="How carefully saved files are written to disk (default: %(default)s)")
+    parser.add_argument("--flush-delay", type=float, default=default_delay, metavar="SECONDS",
+                        help="With --durability none, how long a save waits in memory so later "
+                             "saves of the same file can replace it (default: %(default)s)")
+
+
+class WriteBehindBuffer:
+    """
+    Staged whole-file saves, written to disk in the background.
+
+    Writes go through `scheduler` (a ToolScheduler) as writers of their
+    file, so reads that go through it too never see a file mid-rename.
+    Bytes written are counted in `stats` (a ServerStats) as bytes_written.
+    """
+
+    def __init__(self, scheduler, stats, durability=DEFAULT_DURABILITY,
+                 delay=FLUSH_DELAY_SECONDS, timeout=None):
+        if durability not in DURABILITY_LEVELS:
+            raise ValueError(f"Unknown durability {durability!r}; use one of {', '.join(DURABILITY_LEVELS)}")
+        self.scheduler = scheduler
+        self.stats = stats
+        self.durability = durability
+        self.delay = delay
+        self.timeout = timeout
+
+        self.saves = 0
+        self.saves_coalesced = 0
+        self.flushes = 0
+        self.files_written = 0
+        self.failures = 0
+        self.last_error = None
+        self.last_flush_seconds = None
+
+        # Saves not written yet, and saves being written right now, by path
+        self._staged = {}
+        self._writing = {}
+        self._flush_lock = asyncio.Lock()
+        self._flusher = None
+
+    async def save(self, path, data):
+        """
+        Save `data` as the new content of `path`
+
+        With durability "none" the save is only staged and False is
+        returned; it is written after the delay. Otherwise this waits until
+        it (or a later save of the same file) is on disk, returns True, and
+        raises if that write failed (the save stays staged and is retried).
+        """
+        path = Path(path)
+        self.write(path, data)
+        if self.durability == "none":
+            return False
+        try:
+            # Saves staged while an earlier flush runs all go in the next one
+            await self.flush()
+        except Exception:
+            # The error may be about another file; only ours matters here
+            if path in self._staged:
+                raise
+        return True
+
+    def write(self, path, data):
+        """Stage `data` as the new content of `path`; it is written after the delay"""
+        path = Path(path)
+        self.saves += 1
+        if path in self._staged:
+            self.saves_coalesced += 1
+        self._staged[path] = data
+        self._schedule_flush()
+
+    def read(self, path):
+        """The latest acknowledged content of `path` not on disk yet, or None"""
+        path = Path(path)
+        data = self._staged.get(path)
+        if data is None:
+            data = self._writing.get(path)
+        return data
+
+    def pending(self):
+        """Number of files with saves that are not on disk yet"""
+        return len(self._staged.keys() | self._writing.keys())
+
+    async def flush(self):
+        """
+        Write every staged save now. Returns (files written, bytes written);
+        raises the first write error, leaving the failed saves staged
+        """
+        async with self._flush_lock:
+            batch, self._staged = self._staged, {}
+            if not batch:
+                return 0, 0
+            self._writing.update(batch)
+            started = time.perf_counter()
+            results = await asyncio.gather(
+                *(self._write_one(path, data) for path, data in batch.items()),
+                return_exceptions=True
+            )
+            self.last_flush_seconds = time.perf_counter() - started
+            self.flushes += 1
+
+            error = None
+            files = written = 0
+            for (path, data), result in zip(batch.items(), results):
+                if self._writing.get(path) is data:
+                    del self._writing[path]
+                if isinstance(result, BaseException):
+                    # Try again next time, unless a newer save replaced it
+                    self._staged.setdefault(path, data)
+                    error = error or result
+                else:
+                    files += 1
+                    written += len(data)
+            self.files_written += files
+            if error is not None:
+                self.failures += 1
+                self.last_error = f"{type(error).__name__}: {error}"
+                self._schedule_flush()
+                raise error
+            self.last_error = None
+            return files, written
+
+    @asynccontextmanager
+    async def running(self):
+        """Flush whatever is still staged when the with-block ends"""
+        try:
+            yield self
+        finally:
+            # Waits for a flush already under way, then writes the rest
+            try:
+                await self.flush()
+            except Exception as e:
+                print(f"Could not write saved files on shutdown: {e}", file=sys.stderr)
+            if self._flusher is not None:
+                self._flusher.cancel()
+
+    def counters(self):
+        """Totals, in the form ServerStats.watch_counters() expects"""
+        return {
+            "write_behind_saves": self.saves,
+            "write_behind_saves_coalesced": self.saves_coalesced,
+            "write_behind_flushes": self.flushes,
+            "write_behind_files_written": self.files_written,
+            "write_behind_failures": self.failures,
+            "write_behind_pending_files": self.pending(),
+        }
+
+    async def _write_one(self, path, data):
+        await self.scheduler.run(
+            write_file_atomically, path, data, self.durability, writes=[path], timeout=self.timeout
+        )
+        self.stats.count("bytes_written", len(data))
+
+    def _schedule_flush(self):
+        if self._flusher is None:
+            self._flusher = asyncio.get_running_loop().create_task(self._flush_later())
+
+    async def _flush_later(self):
+        try:
+            while True:
+                await asyncio.sleep(self.delay)
+                try:
+                    await self.flush()
+                except Exception as e:
+                    # The saves stay staged; retry after the next delay
+                    print(f"Writing saved files failed: {e}", file=sys.stderr)
+                if not self._staged:
+                    break
+        finally:
+            self._flusher = None
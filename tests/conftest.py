@@ -0,0 +1,15 @@
+"""
+Shared setup for the tests
+
+Run them from the repository folder with:
+
+    python -m pytest -q
+"""
+
+import sys
+from pathlib import Path
+
+REPO_DIR = Path(__file__).resolve().parent.parent
+
+# The shared helpers, and the benchmark script's store builders and server loader
+sys.path[:0] = [str(REPO_DIR), str(REPO_DIR / "benchmarks")]
@@ -0,0 +1,66 @@
+"""Parallel analysis must count exactly what the single-thread scan counts, with one long-lived pool"""
+
+import asyncio
+from datetime import datetime, timedelta
+
+from bench_servers import load_server
+
+
+class SilentProgress:
+    async def report(self, *args, **kwargs):
+        pass
+
+
+def history(count, now):
+    experiences = [
+        {
+            "timestamp": (now - timedelta(hours=i)).isoformat(),
+            "agent_id": f"agent-{i % 3}",
+            "task_type": f"task-{i % 4}",
+            "context": "context",
+            "approach": f"approach-{i % 5}",
+            "outcome": "outcome",
+            "success": i % 3 != 0,
+            "metrics": {},
+        }
+        for i in range(count)
+    ]
+    # Records the scan has to skip, or count under "unknown"
+    experiences[1]["timestamp"] = "not a date"
+    experiences[2]["timestamp"] = "2026-01-01T00:00:00+00:00"
+    del experiences[3]["approach"]
+    return experiences
+
+
+def test_workers_match_the_thread_scan_and_are_started_once(tmp_path):
+    module = load_server("learning-agent", tmp_path)
+    workers = module.analysis_workers
+    workers.max_workers = 2
+    now = datetime.now()
+    experiences = history(2_000, now)
+    cutoff = now - timedelta(days=30)
+
+    async def main():
+        results = []
+        async with workers.running():
+            for agent_id in (None, "agent-1", "nobody"):
+                results.append(await module.aggregate_in_workers(
+                    experiences, cutoff, agent_id, workers.max_workers, SilentProgress()
+                ))
+            # Experiences recorded after the first analysis are picked up too
+            experiences.extend(history(10, now))
+            results.append(await module.aggregate_in_workers(
+                experiences, cutoff, None, workers.max_workers, SilentProgress()
+            ))
+            assert workers.pool()._mp_context.get_start_method() != "fork"
+        return results
+
+    results = asyncio.run(main())
+    expected = [
+        module.aggregate_experiences(experiences[:2_000], cutoff, agent_id)
+        for agent_id in (None, "agent-1", "nobody")
+    ] + [module.aggregate_experiences(experiences, cutoff)]
+    assert results == expected
+    assert workers.counters() == {"analysis_worker_pools_started": 1, "analysis_shards": 8}
+    # Stopped with the server
+    assert workers._pool is None
@@ -0,0 +1,25 @@
+"""The benchmark drives real servers whose data folders are set through the environment"""
+
+import asyncio
+import json
+import os
+
+from bench_servers import SERVERS, build_store, load_server, run_case
+
+
+def test_load_server_uses_the_data_folder_variable(tmp_path):
+    build_store("memory-server", tmp_path, 10)
+    module = load_server("memory-server", tmp_path)
+    assert module.MEMORY_FILE == tmp_path / "shared_memory.json"
+    # The variable is only set while the server is imported
+    assert SERVERS["memory-server"]["data_env"] not in os.environ
+
+
+def test_concurrent_calls(tmp_path):
+    build_store("memory-server", tmp_path, 100)
+    result = asyncio.run(run_case("memory-server", tmp_path, 0, iterations=40, max_seconds=30, concurrency=8))
+    assert result["concurrency"] == 8
+    assert result["calls"] == 40
+    # Every save reached the file in the benchmark folder: 100 + the untimed first call + 40
+    memories = json.loads((tmp_path / "shared_memory.json").read_text(encoding="utf-8"))
+    assert len(memories) == 141
@@ -0,0 +1,146 @@
+"""Every cache the combined server shares its budget between must respect its limit"""
+
+import asyncio
+import importlib.util
+import sys
+
+from bench_servers import build_store, load_server
+from conftest import REPO_DIR
+from mcp.shared.memory import create_connected_server_and_client_session
+from mcp_shared.cache_budget import CacheBudget
+
+sys.path.insert(0, str(REPO_DIR / "lesson-05"))
+from note_index import DirectoryIndex  # noqa: E402
+
+
+def test_directory_index_keeps_only_folders_within_its_limit(tmp_path):
+    for name in ("a.txt", "b.txt", "c.txt"):
+        (tmp_path / name).write_text(name * 10, encoding="utf-8")
+
+    index = DirectoryIndex(max_entries=3)
+    index.query(tmp_path)
+    assert index.query(tmp_path, sort="size") == (3, list(index.entries(tmp_path)))
+    assert index.hits == 2
+
+    (tmp_path / "d.txt").write_text("d", encoding="utf-8")
+    total, page = index.query(tmp_path, sort="size")
+    assert total == 4 and page[0].name == "d.txt"
+    index.query(tmp_path)
+    # Too many files to keep: every call lists the folder again
+    assert index.hits == 2 and index.misses == 3
+
+
+def test_memory_cache_keeps_only_files_within_its_limit(tmp_path):
+    build_store("memory-server", tmp_path, 50)
+    module = load_server("memory-server", tmp_path)
+    module.memory_cache.max_entries = 50
+
+    async def main():
+        async with create_connected_server_and_client_session(module.server) as client:
+            await client.call_tool("read_memory", {})
+            await client.call_tool("read_memory", {})
+            assert module.memory_cache.hits == 1
+            await client.call_tool("save_memory", {"content": "One too many"})
+            hits = module.memory_cache.hits
+            await client.call_tool("read_memory", {})
+            result = await client.call_tool("read_memory", {"format": "summary"})
+            return hits, result
+
+    hits, result = asyncio.run(main())
+    # 51 memories: parsed again on every read, and reads still see all of them
+    assert module.memory_cache.memories is None
+    assert module.memory_cache.hits == hits
+    assert "51" in result.content[0].text
+    assert not module.memory_file_changed()
+
+
+class FakeCache:
+    def __init__(self, entries):
+        self.entries = entries
+
+    def count(self):
+        return self.entries
+
+    def drop(self):
+        self.entries = 0
+
+
+def test_budget_drops_the_least_recently_used_caches_first():
+    budget = CacheBudget(100)
+    notes, memories, answers = FakeCache(10), FakeCache(55), FakeCache(5)
+    budget.track("notes", "listing", notes.count, notes.drop)
+    budget.track("memory", "parsed", memories.count, memories.drop)
+    budget.track("learning", "history", lambda: 30)
+    budget.track("learning", "answers", answers.count, answers.drop)
+
+    # Any cache may take what the others leave free
+    budget.touch("memory")
+    assert budget.enforce() == 0 and memories.entries == 55
+
+    # 130 entries: the notes were used least recently, so they go first
+    budget.touch("learning")
+    notes.entries = 40
+    assert budget.enforce() == 40
+    assert (notes.entries, memories.entries, answers.entries) == (0, 55, 5)
+    assert budget.counters()["cache_budget_used"] == 90
+
+    # The history can't be dropped, but it still takes room from the rest
+    budget.track("learning", "samples", lambda: 80)
+    budget.enforce()
+    assert memories.entries == 0 and answers.entries == 0
+    assert budget.counters()["cache_budget_caches_dropped"] == 3
+
+
+def load_combined_server(tmp_path, monkeypatch):
+    for variable, folder in (
+        ("MCP_NOTES_DIR", "notes"), ("MCP_HUB_DIR", "hub"),
+        ("MCP_MEMORY_DIR", "memory"), ("MCP_LEARNING_DIR", "learning"),
+    ):
+        (tmp_path / folder).mkdir()
+        monkeypatch.setenv(variable, str(tmp_path / folder))
+    path = REPO_DIR / "combined-server" / "server.py"
+    spec = importlib.util.spec_from_file_location("combined_server_budget_test", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def test_combined_server_shares_one_budget(tmp_path, monkeypatch):
+    module = load_combined_server(tmp_path, monkeypatch)
+    budgeted = {
+        f"{mount.prefix}.{name}" for mount in module.mounts.values() for name, _, _ in mount.budgeted_entries()
+    }
+    assert budgeted == {
+        "notes.note_index", "memory.memory_cache", "learning.insight_cache",
+        "learning.history", "learning.analysis_columns", "learning.reservoir",
+    }
+    # No fixed shares: each cache may use the whole budget
+    for mount in module.mounts.values():
+        for cache in mount.bounded_caches().values():
+            assert cache.max_entries == module.CACHE_BUDGET_ENTRIES
+
+
+def test_combined_server_drops_the_caches_of_the_idle_server(tmp_path, monkeypatch):
+    module = load_combined_server(tmp_path, monkeypatch)
+    build_store("memory-server", tmp_path / "memory", 50)
+    build_store("learning-agent", tmp_path / "learning", 50)
+    for i in range(30):
+        (tmp_path / "notes" / f"note-{i}.txt").write_text("note", encoding="utf-8")
+    memory = module.mounts["memory"].module
+    learning = module.mounts["learning"].module
+    notes = module.mounts["notes"].module
+    module.cache_budget.limit = 120
+
+    async def main():
+        async with create_connected_server_and_client_session(module.server) as client:
+            await client.call_tool("memory__read_memory", {})
+            await client.call_tool("learning__get_learning_insights", {})
+            assert memory.memory_cache.memories is not None
+            # 50 memories + 50 experiences + 1 answer + 30 notes is too many
+            await client.call_tool("notes__list_notes", {})
+
+    asyncio.run(main())
+    assert memory.memory_cache.memories is None
+    assert notes.note_index.entry_count() == 30
+    assert len(learning.store.loaded_experiences) == 50
+    assert sum(module.cache_budget.usage().values()) <= 120
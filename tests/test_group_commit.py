@@ -0,0 +1,190 @@
+"""
+Group commits must not stall the event loop
+
+A flush rewrites (or appends to, and sometimes checkpoints) a store that
+can hold hundreds of thousands of records. These tests run a flush while a
+task that wakes every few milliseconds measures how late it was woken.
+"""
+
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from bench_servers import build_store, load_server
+from mcp.shared.memory import create_connected_server_and_client_session
+from mcp_shared.file_lock import FileLock
+from mcp_shared.group_commit import GroupCommitter
+
+# A tick later than this means the loop was blocked
+MAX_LOOP_STALL_SECONDS = 0.2
+
+
+async def largest_loop_stall(work, interval=0.005):
+    """Run the coroutine `work` and return (its result, the longest stall seen meanwhile)"""
+    done = asyncio.Event()
+    largest = 0.0
+
+    async def watch():
+        nonlocal largest
+        last = time.perf_counter()
+        while not done.is_set():
+            await asyncio.sleep(interval)
+            now = time.perf_counter()
+            largest = max(largest, now - last - interval)
+            last = now
+
+    watcher = asyncio.create_task(watch())
+    try:
+        result = await work
+    finally:
+        done.set()
+        await watcher
+    return result, largest
+
+
+def test_flush_runs_off_the_event_loop(tmp_path):
+    flushed_on = []
+
+    def slow_flush(items):
+        flushed_on.append(threading.current_thread())
+        time.sleep(0.5)
+        return [item * 2 for item in items]
+
+    async def main():
+        committer = GroupCommitter(FileLock(tmp_path / "data"), slow_flush)
+        return await largest_loop_stall(asyncio.gather(*(committer.submit(i) for i in range(5))))
+
+    results, stall = asyncio.run(main())
+    assert results == [0, 2, 4, 6, 8]
+    assert flushed_on and threading.main_thread() not in flushed_on
+    assert stall < MAX_LOOP_STALL_SECONDS
+
+
+def test_after_flush_runs_on_the_event_loop(tmp_path):
+    seen = []
+
+    def after_flush(items, results):
+        seen.append((threading.current_thread(), items, results))
+
+    async def main():
+        committer = GroupCommitter(FileLock(tmp_path / "data"), lambda items: list(items), after_flush)
+        return await committer.submit("a")
+
+    assert asyncio.run(main()) == "a"
+    assert seen == [(threading.main_thread(), ["a"], ["a"])]
+
+
+def test_after_flush_error_does_not_fail_a_written_batch(tmp_path, capsys):
+    written = []
+
+    def flush(items):
+        written.extend(items)
+        return [len(written)] * len(items)
+
+    def failing_after_flush(items, results):
+        raise RuntimeError("summary update failed")
+
+    async def main():
+        committer = GroupCommitter(FileLock(tmp_path / "data"), flush, failing_after_flush)
+        results = await asyncio.gather(committer.submit("a"), committer.submit("b"))
+        return committer, results
+
+    committer, results = asyncio.run(main())
+    assert results == [2, 2] and written == ["a", "b"]
+    assert committer.after_flush_errors == 1 and committer.flushes == 1
+    assert "summary update failed" in capsys.readouterr().err
+
+
+def test_flush_error_reaches_every_caller(tmp_path):
+    def failing_flush(items):
+        raise OSError("disk full")
+
+    async def main():
+        committer = GroupCommitter(FileLock(tmp_path / "data"), failing_flush)
+        return await asyncio.gather(committer.submit(1), committer.submit(2), return_exceptions=True)
+
+    results = asyncio.run(main())
+    assert [str(result) for result in results] == ["disk full", "disk full"]
+
+
+def test_lock_waits_leave_the_default_threads_free(tmp_path):
+    lock = FileLock(tmp_path / "data")
+    lock.acquire()
+
+    async def main():
+        loop = asyncio.get_running_loop()
+        loop.set_default_executor(ThreadPoolExecutor(max_workers=1))
+        committer = GroupCommitter(lock, lambda items: list(items))
+        waiting = [asyncio.create_task(committer.submit(i)) for i in range(3)]
+        waiting.append(asyncio.create_task(lock.acquire_async()))
+        await asyncio.sleep(0.05)
+        # Other work still gets the only default thread while both wait
+        assert await asyncio.wait_for(asyncio.to_thread(lambda: "free"), 1) == "free"
+
+        # A cancelled wait gives the lock back as soon as it gets it
+        waiting[-1].cancel()
+        await asyncio.gather(waiting[-1], return_exceptions=True)
+        lock.release()
+        return await asyncio.gather(*waiting[:-1])
+
+    assert asyncio.run(main()) == [0, 1, 2]
+    with lock:
+        pass
+
+
+def test_save_memory_keeps_the_loop_responsive(tmp_path):
+    build_store("memory-server", tmp_path, 100_000)
+    module = load_server("memory-server", tmp_path)
+
+    async def main():
+        # Parse the file first, so only the save itself is measured
+        await asyncio.to_thread(module.cached_memories)
+        async with create_connected_server_and_client_session(module.server) as client:
+            return await largest_loop_stall(client.call_tool("save_memory", {"content": "Loop stays free"}))
+
+    result, stall = asyncio.run(main())
+    assert "100001" in result.content[0].text
+    assert stall < MAX_LOOP_STALL_SECONDS
+
+
+def test_record_experience_checkpoint_keeps_the_loop_responsive(tmp_path):
+    build_store("learning-agent", tmp_path, 100_000)
+    module = load_server("learning-agent", tmp_path)
+
+    async def main():
+        await asyncio.to_thread(module.store.load)
+        # The next record folds the log into a fresh snapshot inline
+        module.store.checkpoint_every = 1
+        async with create_connected_server_and_client_session(module.server) as client:
+            return await largest_loop_stall(client.call_tool("record_experience", {
+                "agent_id": "researcher", "task_type": "research", "context": "Loop test",
+                "approach": "checkpoint", "outcome": "Done", "success": True,
+            }))
+
+    result, stall = asyncio.run(main())
+    assert '"total_experiences": 100001' in result.content[0].text
+    assert module.store.wal_records == 0
+    assert stall < MAX_LOOP_STALL_SECONDS
+
+
+def test_running_summaries_count_each_recorded_experience_once(tmp_path):
+    build_store("learning-agent", tmp_path, 1_000)
+    module = load_server("learning-agent", tmp_path)
+
+    async def main():
+        module.sync_with_disk()
+        module.get_success_tracker()
+        module.get_reservoir()
+        async with create_connected_server_and_client_session(module.server) as client:
+            await asyncio.gather(*(
+                client.call_tool("record_experience", {
+                    "agent_id": "writer", "task_type": "writing", "context": f"Task {i}",
+                    "approach": "outline first", "outcome": "Done", "success": True,
+                })
+                for i in range(50)
+            ))
+
+    asyncio.run(main())
+    assert module.get_success_tracker().total_experiences == 1_050
+    assert module.summarized_count == 1_050
@@ -0,0 +1,197 @@
+"""Running success rates behind get_learning_insights' decayed and window weightings"""
+
+import asyncio
+import json
+import sys
+from datetime import datetime, timedelta
+
+import pytest
+from bench_servers import build_store, load_server
+from conftest import REPO_DIR
+from mcp.shared.memory import create_connected_server_and_client_session
+
+sys.path.insert(0, str(REPO_DIR / "lesson-08"))
+from learning_store import LearningStore  # noqa: E402
+from learning_stats import (  # noqa: E402
+    DECAY_HALF_LIFE_DAYS,
+    HALF_LIFE_ENV,
+    RESERVOIR_SIZE,
+    OnlineSuccessTracker,
+    StratifiedReservoir,
+    aggregate_experiences,
+    half_life_days_setting,
+)
+
+
+def experience(agent, approach, success, days_ago=0.0, task="research"):
+    return {
+        "timestamp": (datetime.now() - timedelta(days=days_ago)).isoformat(),
+        "agent_id": agent, "task_type": task, "approach": approach, "success": success,
+    }
+
+
+def test_window_is_per_approach_across_agents():
+    # Six agents used the same approach, twenty times each: old successes,
+    # then recent failures from agent-0 only
+    history = [
+        experience(f"agent-{agent}", "search", True, days_ago=30 + i)
+        for agent in range(6) for i in range(20)
+    ]
+    history += [experience("agent-0", "search", False, days_ago=i / 100) for i in range(10)]
+    tracker = OnlineSuccessTracker.from_experiences(history)
+
+    insight, = tracker.insights(weighting="window", window_size=10, min_confidence=0)["insights"]
+    assert insight["window_attempts"] == 10
+    assert insight["attempts"] == 130
+    # The ten newest outcomes are agent-0's failures
+    assert insight["success_rate"] == 0
+
+    # Filtered to one other agent, the window is that agent's own last ten
+    insight, = tracker.insights(agent_id="agent-1", weighting="window", window_size=10, min_confidence=0)["insights"]
+    assert insight["window_attempts"] == 10
+    assert insight["success_rate"] == 1
+
+
+def test_window_keeps_only_the_newest_outcomes_by_time():
+    # agent-a's outcomes are all older than agent-b's
+    history = [experience("agent-a", "outline", True, days_ago=20 + i) for i in range(10)]
+    history += [experience("agent-b", "outline", i < 5, days_ago=i) for i in range(10)]
+    tracker = OnlineSuccessTracker.from_experiences(history)
+
+    insight, = tracker.insights(weighting="window", window_size=10, min_confidence=0)["insights"]
+    assert insight["window_attempts"] == 10
+    assert insight["success_rate"] == 0.5
+
+
+def decayed_rate(half_life_days):
+    # A success two weeks ago and a failure today
+    history = [
+        experience("writer", "draft", True, days_ago=14),
+        experience("writer", "draft", True, days_ago=14),
+        experience("writer", "draft", False),
+        experience("writer", "draft", False),
+    ]
+    tracker = OnlineSuccessTracker.from_experiences(history, half_life_days=half_life_days)
+    insight, = tracker.insights(weighting="decayed", min_confidence=0)["insights"]
+    return insight["success_rate"]
+
+
+def test_half_life_changes_decayed_rates():
+    # With a 14-day half-life the old successes count half: 1 / (1 + 2)
+    assert decayed_rate(14) == pytest.approx(0.33, abs=0.01)
+    # With a much longer one they count almost fully
+    assert decayed_rate(1400) == pytest.approx(0.5, abs=0.01)
+
+
+def test_half_life_setting(monkeypatch):
+    monkeypatch.delenv(HALF_LIFE_ENV, raising=False)
+    assert half_life_days_setting() == DECAY_HALF_LIFE_DAYS
+
+    monkeypatch.setenv(HALF_LIFE_ENV, "30")
+    assert half_life_days_setting() == 30.0
+
+    for value in ("0", "-3", "soon", "inf"):
+        monkeypatch.setenv(HALF_LIFE_ENV, value)
+        with pytest.raises(ValueError):
+            half_life_days_setting()
+
+
+@pytest.mark.parametrize("setting, expected", [(None, DECAY_HALF_LIFE_DAYS), ("30", 30.0)])
+def test_server_uses_half_life_setting(tmp_path, monkeypatch, setting, expected):
+    if setting is None:
+        monkeypatch.delenv(HALF_LIFE_ENV, raising=False)
+    else:
+        monkeypatch.setenv(HALF_LIFE_ENV, setting)
+    build_store("learning-agent", tmp_path, 500)
+    module = load_server("learning-agent", tmp_path)
+
+    async def main():
+        async with create_connected_server_and_client_session(module.server) as client:
+            return await client.call_tool("get_learning_insights", {"weighting": "decayed", "min_confidence": 0})
+
+    result = json.loads(asyncio.run(main()).content[0].text)
+    assert result["half_life_days"] == expected
+    assert module.get_success_tracker().half_life_days == expected
+
+
+def test_reservoir_estimates_a_recent_window_of_a_long_history():
+    # Two years of one agent's history, 300 experiences a day. The last 30
+    # days went much better than the rest.
+    now = datetime.now()
+    history = [
+        {
+            "timestamp": (now - timedelta(days=day, minutes=minute * 4)).isoformat(),
+            "agent_id": "researcher", "task_type": "research", "approach": "search",
+            "success": (minute % 10 < 9) if day < 30 else (minute % 10 < 3),
+        }
+        for day in range(730) for minute in range(300)
+    ]
+    reservoir = StratifiedReservoir.from_experiences(history, seed=1)
+
+    estimate = reservoir.estimate(now - timedelta(days=30))
+    # Every week in range has its own full sample, not a sliver of one
+    # 512-experience sample spread over two years
+    assert estimate["sample_size"] >= 4 * RESERVOIR_SIZE
+    assert estimate["total"] == pytest.approx(30 * 300, rel=0.05)
+    assert estimate["successes"] / estimate["total"] == pytest.approx(0.9, abs=0.03)
+    low, high = estimate["confidence_intervals"]["overall"]
+    assert low <= 0.9 <= high
+
+    # The whole history still reads one sample per week
+    estimate = reservoir.estimate(now - timedelta(days=800))
+    assert estimate["total"] == pytest.approx(730 * 300, rel=0.01)
+    assert estimate["successes"] / estimate["total"] == pytest.approx(0.3 + 0.6 * 30 / 730, abs=0.02)
+
+
+def test_reservoir_skips_the_timestamps_exact_analysis_skips():
+    now = datetime.now()
+    history = [experience("researcher", "search", i % 2 == 0, days_ago=i / 10) for i in range(40)]
+    history[1]["timestamp"] = "not a date"
+    history[2]["timestamp"] = (now - timedelta(hours=1)).astimezone().isoformat()
+    history[3]["timestamp"] = "2026-01-01T00:00:00+00:00"
+    cutoff = now - timedelta(days=30)
+
+    exact = aggregate_experiences(history, cutoff)
+    estimate = StratifiedReservoir.from_experiences(history, seed=1).estimate(cutoff)
+    assert exact["total"] == 37
+    assert (estimate["total"], estimate["successes"]) == (exact["total"], exact["successes"])
+
+
+def test_experiences_appended_by_another_process_update_the_summaries(tmp_path):
+    build_store("learning-agent", tmp_path, 300)
+    module = load_server("learning-agent", tmp_path)
+    other_process = LearningStore(tmp_path)
+    new_experience = {
+        "timestamp": datetime.now().isoformat(),
+        "agent_id": "researcher",
+        "task_type": "research",
+        "context": "appended elsewhere",
+        "approach": "elsewhere",
+        "outcome": "worked",
+        "success": True,
+        "metrics": {},
+    }
+
+    async def analyze(client):
+        result = await client.call_tool("analyze_learning_patterns", {"approximate": True, "time_range_days": 365})
+        return json.loads(result.content[0].text)["total_experiences"]
+
+    async def main():
+        async with create_connected_server_and_client_session(module.server) as client:
+            await client.call_tool("get_learning_insights", {"weighting": "decayed"})
+            before = await analyze(client)
+            tracker, reservoir = module.success_tracker, module.reservoir
+
+            # Only the log grew: the summaries read the new record, no replay
+            other_process.append(new_experience)
+            await client.call_tool("get_learning_insights", {"weighting": "decayed"})
+            assert await analyze(client) == before + 1
+            assert module.success_tracker is tracker and module.reservoir is reservoir
+            assert tracker.total_experiences == 301
+
+            # A new snapshot means a full reload, and summaries of the new list
+            other_process.checkpoint()
+            assert await analyze(client) == before + 1
+            assert module.reservoir is not reservoir
+
+    asyncio.run(main())
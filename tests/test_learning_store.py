@@ -0,0 +1,73 @@
+"""
+Migrating an old learning_data.json must not race other processes sharing
+the folder, and loading a snapshot must give every record its own fields
+"""
+
+import gc
+import json
+import sys
+import threading
+
+from conftest import REPO_DIR
+
+sys.path.insert(0, str(REPO_DIR / "lesson-08"))
+from learning_store import LearningStore  # noqa: E402
+
+
+def experience(n):
+    return {
+        "timestamp": f"2026-01-01T00:00:{n:02d}",
+        "agent_id": "researcher",
+        "task_type": "research",
+        "context": f"context {n}",
+        "approach": "search",
+        "outcome": "found it",
+        "success": n % 2 == 0,
+        "metrics": {},
+    }
+
+
+def test_legacy_json_is_served_until_a_locked_write_migrates_it(tmp_path):
+    legacy = [experience(n) for n in range(5)]
+    (tmp_path / "learning_data.json").write_text(json.dumps(legacy), encoding="utf-8")
+    first = LearningStore(tmp_path)
+    second = LearningStore(tmp_path)
+
+    # Reading writes nothing, so it needs no lock
+    assert first.load() == legacy and second.load() == legacy
+    assert first.wal_records == 5
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["learning_data.json"]
+
+    # Both write at once; the first to get the lock migrates, the other
+    # then loads that snapshot and appends after it
+    threads = [
+        threading.Thread(target=store.append, args=(experience(10 + i),))
+        for i, store in enumerate((first, second))
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    stored = LearningStore(tmp_path).load()
+    assert stored[:5] == legacy
+    assert sorted(stored[5:], key=lambda exp: exp["context"]) == [experience(10), experience(11)]
+    assert not [path.name for path in tmp_path.iterdir() if path.name.endswith(".tmp")]
+
+
+def test_snapshot_records_do_not_share_their_metrics(tmp_path):
+    store = LearningStore(tmp_path)
+    records = [dict(experience(n), metrics={"sources": [1, 2]}) for n in range(3)]
+    records[2]["notes"] = {"tags": ["a"]}
+    records.append(dict(experience(3), notes={"tags": ["a"]}))
+    store.replace_all(records)
+    frozen = gc.get_freeze_count()
+
+    loaded = LearningStore(tmp_path).load()
+    assert loaded == records
+    loaded[0]["metrics"]["sources"] = []
+    loaded[2]["notes"]["tags"].append("b")
+    assert loaded[1]["metrics"] == {"sources": [1, 2]}
+    assert loaded[3]["notes"] == {"tags": ["a"]}
+    # Loading leaves the garbage collector as it was
+    assert gc.get_freeze_count() == frozen and gc.isenabled()
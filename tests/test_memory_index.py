@@ -0,0 +1,107 @@
+"""Filtered memory reads must find exactly the memories a full scan would, without rebuilding the index each time"""
+
+import json
+import random
+import sys
+
+import pytest
+from bench_servers import load_server
+from conftest import REPO_DIR
+
+sys.path.insert(0, str(REPO_DIR / "lesson-07"))
+from memory_index import MemoryIndex, normalize_agent, normalize_tags  # noqa: E402
+
+TAGS = ["api", "retry", "cache", "docs", "python"]
+AGENTS = ["researcher", "writer", "reviewer", None]
+
+
+def random_memories(count, seed=0):
+    rng = random.Random(seed)
+    memories = []
+    for i in range(count):
+        memory = {"content": f"memory {i}"}
+        tags = rng.sample(TAGS, rng.randint(0, 3))
+        if tags:
+            memory["tags"] = tags
+        agent = rng.choice(AGENTS)
+        if agent:
+            memory["agent"] = agent
+        memories.append(memory)
+    return memories
+
+
+def scan(memories, tags=(), agent=None):
+    """The positions a filtered read should return, by checking every memory"""
+    tags = normalize_tags(tags)
+    agent = normalize_agent(agent)
+    return [
+        position for position, memory in enumerate(memories)
+        if set(tags) <= set(normalize_tags(memory.get("tags")))
+        and (agent is None or normalize_agent(memory.get("agent")) == agent)
+    ]
+
+
+@pytest.mark.parametrize("tags, agent", [
+    (["api"], None),
+    (["api", "retry"], None),
+    (["api", "retry", "cache"], "writer"),
+    ([], "reviewer"),
+    (["docs"], "nobody"),
+    (["unknown"], None),
+])
+def test_lookup_matches_a_full_scan(tags, agent):
+    memories = random_memories(2_000)
+    index = MemoryIndex(memories)
+    assert index.lookup(tags, agent) == scan(memories, tags, agent)
+    # Positions past the caller's copy of the list are left out
+    assert index.lookup(tags, agent, limit=500) == [p for p in scan(memories, tags, agent) if p < 500]
+
+
+def test_incremental_adds_build_the_same_index():
+    memories = random_memories(1_000)
+    built = MemoryIndex(memories)
+    grown = MemoryIndex(memories[:10])
+    for start in range(10, len(memories), 97):
+        grown.add(memories[start:start + 97])
+
+    assert grown.count == built.count == 1_000
+    for tag in TAGS:
+        for agent in AGENTS:
+            assert grown.lookup([tag], agent) == built.lookup([tag], agent)
+
+
+def test_tags_and_agents_are_normalized():
+    assert normalize_tags([" API ", "api", "Retry", ""]) == ["api", "retry"]
+    assert normalize_tags("Docs") == ["docs"]
+    assert normalize_agent("  Writer ") == "writer" and normalize_agent("  ") is None
+
+    index = MemoryIndex([
+        {"tags": ["API", "retry "], "agent": "Writer"},
+        {"tags": "api", "agent": " writer"},
+        {"tags": ["docs"]},
+    ])
+    assert index.lookup(["api"], "WRITER") == [0, 1]
+    assert index.lookup([" Retry", "API"]) == [0]
+    with pytest.raises(ValueError):
+        index.lookup([], "  ")
+
+
+def test_index_outlives_a_parsed_file_too_large_to_keep(tmp_path):
+    memories = random_memories(200)
+    (tmp_path / "shared_memory.json").write_text(json.dumps(memories), encoding="utf-8")
+    module = load_server("memory-server", tmp_path)
+    module.memory_cache.max_entries = 100
+
+    expected = [memories[p] for p in scan(memories, ["api"], "writer")]
+    assert module.load_filtered_memories(["api"], "writer") == expected
+    index = module.memory_index
+    # The memories are parsed again, but the index is reused
+    assert module.memory_cache.memories is None
+    assert module.load_filtered_memories(["api"], "writer") == expected
+    assert module.memory_index is index
+
+    # A save extends it rather than starting over
+    new_memory = {"content": "new", "tags": ["api"], "agent": "writer"}
+    module.append_memories([new_memory])
+    assert module.load_filtered_memories(["api"], "writer") == expected + [new_memory]
+    assert module.memory_index is index and index.count == 201
@@ -0,0 +1,95 @@
+"""list_notes must see every added, removed or renamed note, and filter and sort like a fresh listing"""
+
+import asyncio
+import os
+import sys
+
+import pytest
+from bench_servers import load_server
+from conftest import REPO_DIR
+from mcp.shared.memory import create_connected_server_and_client_session
+
+sys.path.insert(0, str(REPO_DIR / "lesson-05"))
+from note_index import DirectoryIndex  # noqa: E402
+
+# (name, size, modification time) of the notes each test starts with
+NOTES = [
+    ("alpha.txt", 30, 1_700_000_300),
+    ("beta.md", 10, 1_700_000_100),
+    ("gamma.txt", 20, 1_700_000_200),
+    ("meeting-1.txt", 50, 1_700_000_500),
+    ("meeting-2.TXT", 40, 1_700_000_400),
+]
+
+
+def write_notes(folder):
+    for name, size, mtime in NOTES:
+        path = folder / name
+        path.write_bytes(b"x" * size)
+        os.utime(path, (mtime, mtime))
+
+
+def names(page):
+    return [entry.name for entry in page]
+
+
+def test_listing_refreshes_when_a_note_is_added_removed_or_renamed(tmp_path):
+    write_notes(tmp_path)
+    index = DirectoryIndex()
+    assert len(index.entries(tmp_path)) == 5
+    assert index.entries(tmp_path) is index.entries(tmp_path) and index.hits == 2
+
+    (tmp_path / "delta.txt").write_text("new", encoding="utf-8")
+    assert "delta.txt" in names(index.entries(tmp_path))
+
+    (tmp_path / "alpha.txt").unlink()
+    assert "alpha.txt" not in names(index.entries(tmp_path))
+
+    (tmp_path / "beta.md").rename(tmp_path / "epsilon.md")
+    listed = names(index.entries(tmp_path))
+    assert "beta.md" not in listed and "epsilon.md" in listed
+    assert index.misses == 4
+
+
+def test_only_note_files_are_listed(tmp_path):
+    write_notes(tmp_path)
+    for name in ("server.py", "config.json.example", ".hidden.txt", "README.md"):
+        (tmp_path / name).write_text("not a note", encoding="utf-8")
+    (tmp_path / "folder.txt").mkdir()
+
+    listed = names(DirectoryIndex(exclude=["README.md"]).entries(tmp_path))
+    assert listed == sorted(name for name, _, _ in NOTES)
+
+
+@pytest.mark.parametrize("filters, expected", [
+    ({}, ["alpha.txt", "beta.md", "gamma.txt", "meeting-1.txt", "meeting-2.TXT"]),
+    ({"sort": "size"}, ["beta.md", "gamma.txt", "alpha.txt", "meeting-2.TXT", "meeting-1.txt"]),
+    ({"sort": "mtime", "descending": True}, ["meeting-1.txt", "meeting-2.TXT", "alpha.txt", "gamma.txt", "beta.md"]),
+    ({"pattern": "meeting-*", "sort": "size"}, ["meeting-2.TXT", "meeting-1.txt"]),
+    ({"pattern": "*.txt", "descending": True}, ["meeting-1.txt", "gamma.txt", "alpha.txt"]),
+    ({"min_size": 20, "max_size": 40, "sort": "mtime"}, ["gamma.txt", "alpha.txt", "meeting-2.TXT"]),
+    ({"modified_after": 1_700_000_200, "modified_before": 1_700_000_400, "sort": "name", "descending": True},
+     ["meeting-2.TXT", "gamma.txt", "alpha.txt"]),
+])
+def test_filters_and_sort_orders_combine(tmp_path, filters, expected):
+    write_notes(tmp_path)
+    index = DirectoryIndex()
+    total, page = index.query(tmp_path, **filters)
+    assert total == len(expected) and names(page) == expected
+    # A limit only shortens the page, not the total
+    total, page = index.query(tmp_path, limit=2, **filters)
+    assert total == len(expected) and names(page) == expected[:2]
+
+
+def test_list_notes_tool_hides_the_lesson_files(tmp_path):
+    write_notes(tmp_path)
+    module = load_server("note-reader", tmp_path)
+
+    async def main():
+        async with create_connected_server_and_client_session(module.server) as client:
+            return await client.call_tool("list_notes", {"format": "summary"})
+
+    text = asyncio.run(main()).content[0].text
+    assert "Found 5 notes" in text
+    listed = names(module.DirectoryIndex(exclude=module.LESSON_FILES).entries(REPO_DIR / "lesson-05"))
+    assert listed == ["sample_note.txt"]
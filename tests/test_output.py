@@ -0,0 +1,41 @@
+"""
+The text format must stay byte-for-byte what the tools returned before
+output formats existed, and the table format must keep its layout
+"""
+
+import json
+
+from mcp_shared.output import OutputBuilder, write_json, write_table
+
+RESULT = {"status": "success", "memories": [{"content": "café ✓"}, {"content": "naïve résumé"}]}
+
+
+def render(indent, max_chars=None):
+    builder = OutputBuilder(max_chars)
+    write_json(builder, RESULT, "memories", indent=indent)
+    return builder.getvalue()
+
+
+def test_text_format_matches_plain_json_dumps():
+    assert render(2) == json.dumps(RESULT, indent=2)
+    assert "\\u00e9" in render(2, max_chars=10_000)
+
+
+def test_compact_json_keeps_non_ascii_characters():
+    assert render(None) == json.dumps(RESULT, separators=(",", ":"), ensure_ascii=False)
+    assert json.loads(render(None, max_chars=10_000))["memories"] == RESULT["memories"]
+
+
+def table(result):
+    builder = OutputBuilder(None)
+    write_table(builder, result)
+    return builder.getvalue()
+
+
+def test_empty_record_lists_are_empty_sections():
+    full = {"total": 1, "best_approaches": [{"approach": "search", "rate": 1.0}], "worst_approaches": []}
+    empty = {"total": 0, "best_approaches": [], "worst_approaches": []}
+    assert table(full) == "total\t1\n\n# best_approaches\napproach\trate\nsearch\t1.0\n\n# worst_approaches\n"
+    assert table(empty) == "total\t0\n\n# best_approaches\n\n# worst_approaches\n"
+    # Lists of plain values are still fields
+    assert table({"tags": ["api", "retry"]}) == 'tags\t["api","retry"]\n'
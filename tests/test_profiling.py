@@ -0,0 +1,52 @@
+"""Profiles must include the work a tool call hands to worker threads"""
+
+import asyncio
+
+from bench_servers import build_store, load_server
+from mcp.shared.memory import create_connected_server_and_client_session
+from mcp_shared import profiling
+from mcp_shared.profiling import PROFILE_DIR_ENV, PROFILE_TOOLS_ENV, ToolProfiler
+
+
+def test_profile_includes_worker_threads(tmp_path, monkeypatch):
+    monkeypatch.setenv(PROFILE_TOOLS_ENV, "analyze_learning_patterns,record_experience")
+    monkeypatch.setenv(PROFILE_DIR_ENV, str(tmp_path / "profiles"))
+    build_store("learning-agent", tmp_path, 2_000)
+    module = load_server("learning-agent", tmp_path)
+
+    async def main():
+        async with create_connected_server_and_client_session(module.server) as client:
+            await client.call_tool("analyze_learning_patterns", {"time_range_days": 30})
+            await client.call_tool("record_experience", {
+                "agent_id": "writer", "task_type": "writing", "context": "Profiled",
+                "approach": "outline", "outcome": "Done", "success": True,
+            })
+
+    asyncio.run(main())
+    analysis, record = sorted(
+        (tmp_path / "profiles").glob("*.txt"), key=lambda path: "record_experience" in path.name
+    )
+    # The history is counted in a worker thread, and the append happens in
+    # the group committer's thread
+    assert "aggregate_experiences" in analysis.read_text()
+    assert "append_many" in record.read_text()
+    assert "worker thread runs" in analysis.read_text()
+    assert "worker processes is not profiled" in analysis.read_text()
+
+
+def test_worker_wrapper_is_chosen_once_profiling_is_on(tmp_path, monkeypatch):
+    # As in a server that never turned profiling on
+    monkeypatch.setattr(profiling, "profile_in_worker", lambda func: func)
+    call = profiling._ProfiledCall()
+    token = profiling._current_call.set(call)
+    try:
+        # Off: functions come back as they are, without looking for a call
+        assert profiling.profile_in_worker(len) is len
+
+        ToolProfiler("test", directory=tmp_path)
+        wrapped = profiling.profile_in_worker(len)
+        assert wrapped is not len and wrapped([1, 2]) == 2
+        assert call.worker_profiles or call.unprofiled_workers
+    finally:
+        profiling._current_call.reset(token)
+    assert profiling.profile_in_worker(len) is len
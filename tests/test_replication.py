@@ -0,0 +1,130 @@
+"""Read replicas must end up with exactly the primary's history, whatever happens to the shipped log"""
+
+import asyncio
+
+from bench_servers import build_store, load_server
+from mcp_shared.replication import LogReplica, LogShipper, list_segments
+
+
+def record(n):
+    return {"n": n, "text": f"record {n}"}
+
+
+class Primary:
+    """A history plus the shipper publishing it, as a primary server keeps them"""
+
+    def __init__(self, directory):
+        self.records = []
+        self.shipper = LogShipper(directory)
+
+    def append(self, *numbers):
+        self.records.extend(record(n) for n in numbers)
+        self.shipper.ship(self.records, len(numbers))
+
+
+def poll(replica):
+    return asyncio.run(replica.poll())
+
+
+def test_replica_matches_the_primary_after_every_append(tmp_path):
+    primary = Primary(tmp_path)
+    appended = []
+    replica = LogReplica(tmp_path, on_append=appended.extend)
+
+    for n in range(20):
+        primary.append(n)
+        assert poll(replica) == 1
+        assert replica.records == primary.records
+        assert replica.lag() == {"segments": 0, "records": 0, "seconds": 0.0}
+
+    # The first segment is a base (the shipped log was empty), the rest are appends
+    assert replica.resets == 1 and appended == primary.records[1:]
+
+
+def test_lag_counts_segments_and_records_not_applied_yet(tmp_path):
+    primary = Primary(tmp_path)
+    replica = LogReplica(tmp_path)
+    primary.append(0)
+    poll(replica)
+    primary.append(1, 2)
+    primary.append(3)
+
+    replica.fetch()
+    assert replica.lag()["segments"] == 2 and replica.lag()["records"] == 3
+    poll(replica)
+    assert replica.lag()["segments"] == 0 and replica.records == primary.records
+
+
+def test_damaged_segment_is_rejected_until_the_next_base(tmp_path):
+    primary = Primary(tmp_path)
+    replica = LogReplica(tmp_path)
+    primary.append(0, 1)
+    poll(replica)
+    primary.append(2)
+
+    _, path = list_segments(tmp_path)[-1]
+    path.write_bytes(path.read_bytes().replace(b"record 2", b"record X"))
+    assert poll(replica) == 0
+    assert replica.checksum_errors == 1 and "checksum" in replica.last_error
+    assert replica.records == primary.records[:2]
+
+    # Later appends don't help: the replica waits for a base
+    primary.append(3)
+    assert poll(replica) == 0 and len(replica.records) == 2
+
+    primary.shipper.compact(primary.records)
+    poll(replica)
+    assert replica.records == primary.records and replica.last_error is None
+
+
+def test_replica_restarts_from_a_base_after_its_segments_were_pruned(tmp_path):
+    primary = Primary(tmp_path)
+    resets = []
+    replica = LogReplica(tmp_path, on_reset=resets.append)
+    primary.append(0)
+    poll(replica)
+
+    # Two compactions: the second deletes every segment before the first
+    primary.append(1)
+    primary.append(2)
+    primary.shipper.compact(primary.records)
+    primary.append(3)
+    primary.shipper.compact(primary.records)
+    primary.append(4)
+    assert list_segments(tmp_path)[0][0] > replica.applied_seq + 1
+
+    poll(replica)
+    assert replica.records == primary.records
+    assert replica.resets == 2 and resets[-1] is replica.records
+
+
+def test_learning_replica_drops_its_summaries_when_a_base_replaces_the_history(tmp_path):
+    data_dir, log_dir = tmp_path / "data", tmp_path / "log"
+    data_dir.mkdir()
+    build_store("learning-agent", data_dir, 50)
+    module = load_server("learning-agent", data_dir)
+    history = list(module.store.load())
+    shipper = LogShipper(log_dir)
+    shipper.sync(history)
+
+    module.replica = LogReplica(
+        log_dir,
+        on_append=module.apply_replicated_experiences,
+        on_reset=module.reset_replicated_experiences,
+    )
+    module.store = module.ReplicaStore(module.replica)
+    poll(module.replica)
+    tracker = module.get_success_tracker()
+    assert tracker.total_experiences == 50
+
+    # Appends are fed to the same tracker
+    history.append(dict(history[0], context="one more"))
+    shipper.ship(history, 1)
+    poll(module.replica)
+    assert module.get_success_tracker() is tracker and tracker.total_experiences == 51
+
+    # A new base (say the primary imported a shorter history) starts them over
+    shipper.compact(history[:10])
+    poll(module.replica)
+    assert module.success_tracker is None
+    assert module.get_success_tracker().total_experiences == 10
@@ -0,0 +1,81 @@
+"""Saves must coalesce, survive a failed write, and be readable before they reach the disk"""
+
+import asyncio
+
+import pytest
+from mcp_shared.scheduler import ToolScheduler
+from mcp_shared.tool_stats import ServerStats
+from mcp_shared.write_behind import WriteBehindBuffer
+
+
+def make_buffer(durability, delay=0.05):
+    return WriteBehindBuffer(ToolScheduler(), ServerStats("test"), durability=durability, delay=delay)
+
+
+def test_staged_saves_coalesce_and_are_read_before_the_write(tmp_path):
+    path = tmp_path / "notes.txt"
+
+    async def main():
+        buffer = make_buffer("none")
+        for version in (b"one", b"two", b"three"):
+            assert await buffer.save(path, version) is False
+        # Read your writes: the newest save, though nothing is on disk yet
+        assert buffer.read(path) == b"three" and not path.exists()
+        await asyncio.sleep(0.2)
+        return buffer
+
+    buffer = asyncio.run(main())
+    assert path.read_bytes() == b"three" and buffer.read(path) is None
+    assert buffer.files_written == 1 and buffer.saves_coalesced == 2
+
+
+@pytest.mark.parametrize("durability", ["fsync", "fsync-dir"])
+def test_durable_save_returns_once_the_file_is_on_disk(tmp_path, durability):
+    path = tmp_path / "draft.txt"
+
+    async def main():
+        buffer = make_buffer(durability, delay=60)
+        assert await buffer.save(path, b"first") is True
+        assert path.read_bytes() == b"first" and buffer.pending() == 0
+
+        # Saves arriving together share writes, and the last one wins
+        await asyncio.gather(*(buffer.save(path, f"v{i}".encode()) for i in range(10)))
+        return buffer
+
+    buffer = asyncio.run(main())
+    assert path.read_bytes() == b"v9"
+    assert buffer.files_written < 11
+
+
+def test_failed_write_stays_staged_and_is_retried(tmp_path):
+    folder = tmp_path / "not-yet"
+    path = folder / "research.txt"
+
+    async def main():
+        buffer = make_buffer("fsync", delay=60)
+        with pytest.raises(OSError):
+            await buffer.save(path, b"findings")
+        # Still readable, still waiting to be written
+        assert buffer.read(path) == b"findings" and buffer.pending() == 1
+        assert buffer.failures == 1 and buffer.last_error
+
+        folder.mkdir()
+        assert await buffer.flush() == (1, len(b"findings"))
+        return buffer
+
+    buffer = asyncio.run(main())
+    assert path.read_bytes() == b"findings"
+    assert buffer.pending() == 0 and buffer.last_error is None
+
+
+def test_failure_of_another_file_does_not_fail_a_durable_save(tmp_path):
+    good = tmp_path / "good.txt"
+    bad = tmp_path / "missing" / "bad.txt"
+
+    async def main():
+        buffer = make_buffer("fsync", delay=60)
+        buffer.write(bad, b"never written")
+        assert await buffer.save(good, b"written") is True
+
+    asyncio.run(main())
+    assert good.read_bytes() == b"written"